@@ -1,17 +1,38 @@
 import os
 import json
-from datetime import datetime, timedelta, timezone
+from datetime import datetime
 import threading
 import time
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify
 from pathlib import Path
 from dotenv import load_dotenv
 
-from steamdt_client import SteamDTClient
-from job_bp import create_job_blueprint, create_dual_job_blueprint
-from sqlalchemy import func, or_, and_
-from sqlalchemy.orm import joinedload
-from db import SessionLocal, init_db, Item, Platform, Price
+from steamdt_client import SteamDTClient, KeyPool, RateLimitError
+from steamdt_async import SyncSteamDTClient
+from job_bp import (
+    create_job_blueprint, create_dual_job_blueprint, create_multi_job_blueprint, create_retention_blueprint,
+)
+from retention import RetentionRunner
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
+from db import (
+    SessionLocal, ReadSessionLocal, init_db, STARTUP_REPORT, Item, Platform, LatestPrice, PriceRollupHourly, PriceRollupDaily,
+    HOUR_MS, DAY_MS, hour_bucket, day_bucket, canonical_platform, normalize_platforms, refresh_item_min_sell_for,
+)
+from price_ingest import ingest_price_response, StagedPriceImport
+from price_normalizer import normalize_price_items
+from catalog_loader import load_catalog, CatalogLoader
+from json_stream import iter_json_items, iter_chunks, spool_stream, JSONStreamError
+from write_queue import ingest_writer, IMPORT_WAIT_SEC
+from exports import (
+    iter_items, iter_price_rows, parse_time_ms, stream_base_csv, stream_json_array,
+    stream_prices_csv, stream_prices_ndjson,
+)
+from item_search import (
+    keyword_filter, keyword_count, platform_filter, min_price_page, encode_cursor, decode_cursor, ItemTotalsCache,
+)
+from price_cache import PriceCache
+from columnar import export_columnar, load_price_columns, cross_platform_stats, top_spreads
 
 # 加载 .env 环境变量
 load_dotenv()
@@ -23,31 +44,86 @@ def create_app():
     # 配置与客户端
     api_key = os.getenv("STEAMDT_API_KEY")
     client = SteamDTClient(api_key=api_key)
+    # 请求处理线程用的客户端：与后台任务共用同一 key 的令牌桶，但最多等待 REQUEST_MAX_WAIT 秒，取不到令牌返回 429
+    REQUEST_MAX_WAIT = float(os.getenv("STEAMDT_REQUEST_MAX_WAIT_SEC", "2"))
+    proxy_client = SteamDTClient(api_key=api_key, max_wait=REQUEST_MAX_WAIT)
+    # 并发批量请求（asyncio 连接池，在途数由 STEAMDT_MAX_CONCURRENCY 控制）
+    async_client = SyncSteamDTClient(api_key=api_key, max_concurrency=int(os.getenv("STEAMDT_MAX_CONCURRENCY", "4")),
+                                     max_wait=REQUEST_MAX_WAIT)
     # 测试页面用：两把不同的 API key（优先使用 _1/_2，其次 A/B）
     api_key_1 = os.getenv("STEAMDT_API_KEY_1") or os.getenv("STEAMDT_API_KEY_A")
     api_key_2 = os.getenv("STEAMDT_API_KEY_2") or os.getenv("STEAMDT_API_KEY_B")
     client1 = SteamDTClient(api_key=api_key_1) if api_key_1 else None
     client2 = SteamDTClient(api_key=api_key_2) if api_key_2 else None
+    test_clients = {
+        i: SteamDTClient(api_key=k, max_wait=REQUEST_MAX_WAIT) if k else None
+        for i, k in ((1, api_key_1), (2, api_key_2))
+    }
+    # 多 key 并行任务：STEAMDT_API_KEY_1..N
+    key_pool = KeyPool.from_env()
 
     data_dir = Path("data")
     data_dir.mkdir(parents=True, exist_ok=True)
     base_info_path = data_dir / "base.json"
+    # 流式导入时每块交给加载器的条目数
+    STREAM_CHUNK_ITEMS = 2000
+    # 管理列表各筛选条件的总数缓存（目录写入后失效）
+    item_totals = ItemTotalsCache()
+    # 价格代理缓存：相同饰品的重复查询不再消耗上游配额
+    price_cache = PriceCache.from_env()
 
     # 初始化数据库
     init_db()
 
-    def _format_beijing_text(ms: int | None) -> str | None:
-        try:
-            if ms is None:
-                return None
-            dt = datetime.fromtimestamp(ms / 1000, tz=timezone(timedelta(hours=8)))
-            return dt.strftime('%Y-%m-%d %H:%M:%S')
-        except Exception:
-            return None
+    def rate_limited(e: RateLimitError):
+        resp = jsonify({"success": False, "error": str(e), "retryAfter": round(e.retry_after, 1)})
+        resp.headers["Retry-After"] = str(int(e.retry_after) + 1)
+        return resp, 429
 
     def get_session():
         return SessionLocal()
 
+    # GET 接口只读查询走独立的只读连接池
+    def get_read_session():
+        return ReadSessionLocal()
+
+    def latest_price_to_dict(r, plat_map):
+        plat_item_id = r.platform_item_id
+        if not plat_item_id and r.platform_id and r.platform_id in plat_map:
+            plat_item_id = plat_map[r.platform_id].platform_item_id
+        return {
+            "platform": r.platform,
+            "itemId": plat_item_id,
+            "sell_price": r.sell_price,
+            "bidding_price": r.bidding_price,
+            "sell_count": r.sell_count,
+            "bidding_count": r.bidding_count,
+            "update_time": r.update_time,
+            "update_time_text": r.update_time_text,
+            "created_at": r.created_at.isoformat() if r.created_at else None
+        }
+
+    def latest_prices_by_name(sess, names):
+        """按饰品批量读取各平台最新快照（每 500 个名称一次查询），返回 {marketHashName: [平台价格...]}。"""
+        out = {n: [] for n in names}
+        rows = []
+        for i in range(0, len(names), 500):
+            rows.extend(
+                sess.query(LatestPrice)
+                .filter(LatestPrice.market_hash_name.in_(names[i:i + 500]))
+                .order_by(LatestPrice.market_hash_name.asc(), LatestPrice.platform.asc())
+                .all()
+            )
+        # 快照缺少平台条目ID时，从 platforms 表补齐
+        pid_set = {r.platform_id for r in rows if r.platform_id is not None and not r.platform_item_id}
+        plat_map = {}
+        if pid_set:
+            plats = sess.query(Platform).filter(Platform.id.in_(list(pid_set))).all()
+            plat_map = {p.id: p for p in plats}
+        for r in rows:
+            out[r.market_hash_name].append(latest_price_to_dict(r, plat_map))
+        return out
+
     @app.route("/")
     def index():
         return render_template("index.html")
@@ -59,12 +135,24 @@ def create_app():
     app.register_blueprint(create_job_blueprint(client, get_session))
     # 注册双 API 顺序交替任务蓝图
     app.register_blueprint(create_dual_job_blueprint(client1, client2, get_session))
+    # 注册多 key 并行任务蓝图
+    app.register_blueprint(create_multi_job_blueprint(key_pool, get_session))
+    # 价格保留策略（降采样 / 归档 / 增量 VACUUM）
+    retention_runner = RetentionRunner()
+    app.register_blueprint(create_retention_blueprint(retention_runner))
+    retention_enabled = os.getenv("PRICE_RETENTION_ENABLED", "0").strip().lower() in ("1", "true", "yes")
+
+    # 后台执行器在首个请求时启动，避免调试模式 reloader 的父进程也启动一份
+    @app.before_request
+    def _start_background_runners():
+        if retention_enabled and not retention_runner.running:
+            retention_runner.start()
 
     # 获取 Steam 饰品基础信息并入库（同时保留本地 JSON）
     @app.route("/api/base/fetch", methods=["POST"])
     def fetch_base_info():
         try:
-            data = client.get_base_info()
+            data = proxy_client.get_base_info()
             # 保存到本地文件（便于可视检查与备份）
             with base_info_path.open("w", encoding="utf-8") as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
@@ -72,51 +160,18 @@ def create_app():
             payload_list = data.get("data") if isinstance(data, dict) else None
             items = payload_list if isinstance(payload_list, list) else []
 
-            sess = get_session()
-            upsert_count = 0
-            try:
-                for it in items:
-                    mhn = (it.get("marketHashName") or "").strip()
-                    name = (it.get("name") or "").strip()
-                    if not mhn:
-                        continue
-                    obj = sess.query(Item).filter(Item.market_hash_name == mhn).one_or_none()
-                    if obj is None:
-                        obj = Item(market_hash_name=mhn, name=name)
-                        sess.add(obj)
-                        upsert_count += 1
-                    else:
-                        # 更新名称（如有变化）
-                        obj.name = name or obj.name
-                    # 平台信息 upsert
-                    plats = it.get("platformList") or []
-                    for p in plats:
-                        pname = (p.get("name") or "").strip()
-                        pid = (p.get("itemId") or "").strip()
-                        if not pname:
-                            continue
-                        existing = (
-                            sess.query(Platform)
-                            .filter(Platform.item_id == obj.id, Platform.name == pname)
-                            .one_or_none()
-                        )
-                        if existing is None:
-                            sess.add(Platform(item_id=obj.id, name=pname, platform_item_id=pid))
-                        else:
-                            existing.platform_item_id = pid or existing.platform_item_id
-                sess.commit()
-            except Exception:
-                sess.rollback()
-                raise
-            finally:
-                sess.close()
+            counters = ingest_writer.run(lambda sess: load_catalog(sess, items, update_existing=True), IMPORT_WAIT_SEC)
+            item_totals.invalidate()
 
             return jsonify({
                 "success": True,
                 "saved": str(base_info_path),
                 "count": len(items),
-                "upserted": upsert_count
+                "upserted": counters["inserted"],
+                "updated": counters["updated"],
             })
+        except RateLimitError as e:
+            return rate_limited(e)
         except Exception as e:
             return jsonify({"success": False, "error": str(e)}), 500
 
@@ -124,134 +179,34 @@ def create_app():
     @app.route("/api/admin/price/import_payload", methods=["POST"])
     def admin_price_import_payload():
         try:
-            payload = request.get_json(silent=True, force=True) or {}
-            items = []
-            if isinstance(payload, list):
-                items = payload
-            elif isinstance(payload, dict):
-                # 支持根对象为聚合结构，例如 { responses: [...] }
-                responses = payload.get("responses")
-                if isinstance(responses, list) and responses:
-                    for resp in responses:
-                        if not isinstance(resp, dict):
-                            continue
-                        for key in ("data", "items", "results"):
-                            val = resp.get(key)
-                            if isinstance(val, list):
-                                items.extend(val)
-                                break
-                # 兼容常见根键
-                if not items:
-                    for key in ("data", "items", "results"):
-                        val = payload.get(key)
-                        if isinstance(val, list):
-                            items = val
-                            break
-                # 如果是单条目结构
-                if not items and (payload.get("marketHashName") or payload.get("platforms") or payload.get("platformList") or payload.get("dataList")):
-                    items = [payload]
-            if not items:
-                return jsonify({"success": False, "error": "payload为空或格式不正确"}), 400
+            counters = {}
+            # 请求线程先收完请求体；写线程内流式解析，按块归一化写入临时表，再以集合语句解析 ID 并替换旧价格
+            body = spool_stream(request.stream)
+
+            def import_prices(sess):
+                body.seek(0)
+                counters.clear()
+                staged = StagedPriceImport(sess)
+                for chunk in iter_chunks(iter_json_items(body), STREAM_CHUNK_ITEMS):
+                    staged.stage(normalize_price_items(chunk, counters))
+                result = staged.apply()
+                if not result["inserted"] and not counters.get("items"):
+                    raise JSONStreamError("payload为空")
+                return result
 
-            def _to_float(x):
-                try:
-                    return float(x)
-                except Exception:
-                    return None
-
-            def _to_int(x):
-                try:
-                    return int(x)
-                except Exception:
-                    return None
-
-            overwritten = 0
-            inserted = 0
-            skipped = 0
-            items_processed = 0
-            platforms_processed = 0
-
-            sess = get_session()
             try:
-                for it in items:
-                    mhn = (it.get("marketHashName") or it.get("market_hash_name") or "").strip()
-                    if not mhn:
-                        skipped += 1
-                        continue
-                    items_processed += 1
-
-                    item_rec = sess.query(Item).filter(Item.market_hash_name == mhn).one_or_none()
-                    item_id_val = item_rec.id if item_rec else None
-
-                    # 支持多种平台列表键
-                    plats = it.get("platforms") or it.get("platformList") or it.get("prices") or it.get("dataList") or []
-                    if isinstance(plats, dict):
-                        plats = [plats]
-
-                    plat_map = {}
-                    if item_id_val is not None:
-                        existing_plats = sess.query(Platform).filter(Platform.item_id == item_id_val).all()
-                        plat_map = {p.name: p for p in existing_plats}
-
-                    for p in plats:
-                        p_name_raw = (p.get("platform") or p.get("name") or p.get("plat") or "").strip()
-                        if not p_name_raw:
-                            skipped += 1
-                            continue
-                        platforms_processed += 1
-                        canon = canonical_platform_name(p_name_raw)
-
-                        # 兼容不同命名的 平台条目ID
-                        plat_item_id = p.get("itemId") or p.get("platformItemId") or p.get("platform_item_id")
-                        sell_price = _to_float(p.get("sellPrice") if p.get("sellPrice") is not None else p.get("sell_price"))
-                        bidding_price = _to_float(p.get("biddingPrice") if p.get("biddingPrice") is not None else p.get("bidding_price"))
-                        sell_count = _to_int(p.get("sellCount") if p.get("sellCount") is not None else p.get("sell_count"))
-                        bidding_count = _to_int(p.get("biddingCount") if p.get("biddingCount") is not None else p.get("bidding_count"))
-                        # 统一为毫秒时间戳：兼容 updateTime / update_time
-                        _ut_raw = p.get("updateTime") if p.get("updateTime") is not None else p.get("update_time")
-                        update_time = _to_int(_ut_raw) if _ut_raw is not None else None
-                        if update_time is not None and update_time < 1000000000000:
-                            update_time = update_time * 1000
-
-                        platform_id_val = None
-                        if item_id_val is not None:
-                            plat_rec = plat_map.get(canon)
-                            if not plat_rec and plat_item_id:
-                                plat_rec = Platform(item_id=item_id_val, name=canon, platform_item_id=str(plat_item_id))
-                                sess.add(plat_rec)
-                                sess.flush()
-                                plat_map[canon] = plat_rec
-                            platform_id_val = plat_rec.id if plat_rec else None
-
-                        if item_id_val is not None and platform_id_val is not None:
-                            cnt = sess.query(Price).filter(Price.item_id == item_id_val, Price.platform_id == platform_id_val).delete(synchronize_session=False)
-                            overwritten += cnt
-                        else:
-                            cnt = sess.query(Price).filter(Price.market_hash_name == mhn, Price.platform == canon).delete(synchronize_session=False)
-                            overwritten += cnt
-
-                        new_row = Price(
-                            market_hash_name=mhn,
-                            platform=canon,
-                            platform_item_id=str(plat_item_id) if plat_item_id is not None else None,
-                            item_id=item_id_val,
-                            platform_id=platform_id_val,
-                            sell_price=sell_price,
-                            bidding_price=bidding_price,
-                            sell_count=sell_count,
-                            bidding_count=bidding_count,
-                            update_time=update_time,
-                            update_time_text=_format_beijing_text(update_time),
-                        )
-                        sess.add(new_row)
-                        inserted += 1
-
-                sess.commit()
-            except Exception:
-                sess.rollback()
-                raise
-            finally:
-                sess.close()
+                with body:
+                    # 整份导入占用写线程，期间价格任务的批次与检查点写入排队等待
+                    result = ingest_writer.run(import_prices, IMPORT_WAIT_SEC)
+            except JSONStreamError:
+                return jsonify({"success": False, "error": "payload为空或格式不正确"}), 400
+            item_totals.invalidate()
+            overwritten = result["overwritten"]
+            inserted = result["inserted"]
+
+            items_processed = counters.get("items", 0)
+            platforms_processed = counters.get("platforms", 0)
+            skipped = counters.get("skipped", 0)
 
             return jsonify({
                 "success": True,
@@ -281,7 +236,7 @@ def create_app():
                 start_id, end_id = 101, 200
 
             # 选择客户端
-            cli = client1 if client_id == 1 else client2
+            cli = test_clients[client_id]
             if cli is None or not cli.api_key:
                 return jsonify({"success": False, "error": f"未配置 STEAMDT_API_KEY_{client_id}"}), 400
 
@@ -310,6 +265,8 @@ def create_app():
                 "count": len(names),
                 "data": data,
             })
+        except RateLimitError as e:
+            return rate_limited(e)
         except Exception as e:
             return jsonify({"success": False, "error": str(e)}), 500
     # 从本地 base.json 导入到数据库（存在则跳过，不更新）
@@ -318,49 +275,22 @@ def create_app():
         try:
             if not base_info_path.exists():
                 return jsonify({"success": False, "error": "本地基础信息文件不存在，请先刷新并下载。"}), 404
-            with base_info_path.open("r", encoding="utf-8") as f:
-                payload = json.load(f)
-            data_obj = payload.get("data") if isinstance(payload, dict) else None
-            items = data_obj if isinstance(data_obj, list) else []
+            # 流式读取：逐块交给目录加载器，内存占用不随文件大小增长
+            def import_catalog(sess):
+                loader = CatalogLoader(sess, update_existing=False)
+                with base_info_path.open("rb") as f:
+                    for chunk in iter_chunks(iter_json_items(f), STREAM_CHUNK_ITEMS):
+                        loader.load(chunk)
+                return loader.counters
 
-            sess = get_session()
-            inserted_items = 0
-            skipped_items = 0
-            inserted_platforms = 0
-            try:
-                for it in items:
-                    mhn = (it.get("marketHashName") or "").strip()
-                    name = (it.get("name") or "").strip()
-                    if not mhn:
-                        continue
-                    exists = sess.query(Item).filter(Item.market_hash_name == mhn).one_or_none()
-                    if exists is not None:
-                        skipped_items += 1
-                        # 跳过已存在的条目，不更新名称或平台
-                        continue
-                    obj = Item(market_hash_name=mhn, name=name)
-                    sess.add(obj)
-                    sess.flush()  # 获取 obj.id
-                    inserted_items += 1
-                    for p in (it.get("platformList") or []):
-                        pname = (p.get("name") or "").strip()
-                        pid = (p.get("itemId") or "").strip()
-                        if not pname:
-                            continue
-                        sess.add(Platform(item_id=obj.id, name=pname, platform_item_id=pid))
-                        inserted_platforms += 1
-                sess.commit()
-            except Exception:
-                sess.rollback()
-                raise
-            finally:
-                sess.close()
+            counters = ingest_writer.run(import_catalog, IMPORT_WAIT_SEC)
+            item_totals.invalidate()
 
             return jsonify({
                 "success": True,
-                "inserted": inserted_items,
-                "skipped": skipped_items,
-                "platforms_inserted": inserted_platforms
+                "inserted": counters["inserted"],
+                "skipped": counters["skipped"],
+                "platforms_inserted": counters["platforms_inserted"]
             })
         except Exception as e:
             return jsonify({"success": False, "error": str(e)}), 500
@@ -369,60 +299,34 @@ def create_app():
     @app.route("/api/base/import_payload", methods=["POST"])
     def import_base_from_payload():
         try:
-            # 尝试从 JSON body 读取
-            payload = request.get_json(silent=True, force=True)
-            # 若走 multipart/form-data，则尝试从文件读取
-            if payload is None and "file" in request.files:
-                try:
-                    file = request.files["file"]
-                    payload = json.load(file.stream)
-                except Exception:
-                    payload = None
-            if payload is None:
-                return jsonify({"success": False, "error": "缺少有效的 JSON 内容"}), 400
-
-            data_obj = payload.get("data") if isinstance(payload, dict) else (payload if isinstance(payload, list) else None)
-            items = data_obj if isinstance(data_obj, list) else []
-            if not isinstance(items, list):
-                return jsonify({"success": False, "error": "JSON 格式不正确，应包含 data 数组或为数组"}), 400
+            # 流式读取请求体（JSON body 或 multipart 的 file 字段，后者已由 werkzeug 落盘），在写线程内逐块交给目录加载器
+            if request.mimetype == "multipart/form-data":
+                if "file" not in request.files:
+                    return jsonify({"success": False, "error": "缺少有效的 JSON 内容"}), 400
+                stream = request.files["file"].stream
+            else:
+                stream = spool_stream(request.stream)
+
+            def import_catalog(sess):
+                stream.seek(0)
+                loader = CatalogLoader(sess, update_existing=False)
+                for chunk in iter_chunks(iter_json_items(stream), STREAM_CHUNK_ITEMS):
+                    loader.load(chunk)
+                return loader.counters
 
-            sess = get_session()
-            inserted_items = 0
-            skipped_items = 0
-            inserted_platforms = 0
             try:
-                for it in items:
-                    mhn = (it.get("marketHashName") or "").strip()
-                    name = (it.get("name") or "").strip()
-                    if not mhn:
-                        continue
-                    exists = sess.query(Item).filter(Item.market_hash_name == mhn).one_or_none()
-                    if exists is not None:
-                        skipped_items += 1
-                        continue
-                    obj = Item(market_hash_name=mhn, name=name)
-                    sess.add(obj)
-                    sess.flush()
-                    inserted_items += 1
-                    for p in (it.get("platformList") or []):
-                        pname = (p.get("name") or "").strip()
-                        pid = (p.get("itemId") or "").strip()
-                        if not pname:
-                            continue
-                        sess.add(Platform(item_id=obj.id, name=pname, platform_item_id=pid))
-                        inserted_platforms += 1
-                sess.commit()
-            except Exception:
-                sess.rollback()
-                raise
+                counters = ingest_writer.run(import_catalog, IMPORT_WAIT_SEC)
+            except JSONStreamError as e:
+                return jsonify({"success": False, "error": f"缺少有效的 JSON 内容：{e}"}), 400
             finally:
-                sess.close()
+                stream.close()
+            item_totals.invalidate()
 
             return jsonify({
                 "success": True,
-                "inserted": inserted_items,
-                "skipped": skipped_items,
-                "platforms_inserted": inserted_platforms
+                "inserted": counters["inserted"],
+                "skipped": counters["skipped"],
+                "platforms_inserted": counters["platforms_inserted"]
             })
         except Exception as e:
             return jsonify({"success": False, "error": str(e)}), 500
@@ -449,12 +353,7 @@ def create_app():
         return [x.upper() for x in PLATFORM_ALIASES.get(p, [p])]
 
     def canonical_platform_name(name: str):
-        p = (name or "").strip().upper()
-        if p == "C5":
-            return "C5GAME"
-        if p == "HALO":
-            return "HALOSKINS"
-        return p
+        return canonical_platform(name)
 
     @app.route("/api/base", methods=["GET"])
     def get_base_info():
@@ -462,14 +361,10 @@ def create_app():
         raw_platform = request.args.get("platform", "").strip()
         aliases = normalize_platform_filter(raw_platform)
         try:
-            sess = get_session()
+            sess = get_read_session()
             try:
-                query = sess.query(Item)
-                if q:
-                    like = f"%{q}%"
-                    query = query.filter((Item.name.ilike(like)) | (Item.market_hash_name.ilike(like)))
-                if aliases:
-                    query = query.join(Platform, Item.id == Platform.item_id).filter(func.upper(Platform.name).in_(aliases))
+                query = keyword_filter(sess.query(Item), q)
+                query = platform_filter(query, aliases)
                 results = query.options(joinedload(Item.platforms)).all()
                 data = [r.to_dict() for r in results]
                 return jsonify({"success": True, "data": data, "count": len(data)})
@@ -478,77 +373,91 @@ def create_app():
         except Exception as e:
             return jsonify({"success": False, "error": str(e)}), 500
 
-    # 导出 CSV（从数据库按当前筛选）
+    def base_filter(q: str, aliases):
+        """返回按关键词与平台别名筛选 Item 查询的函数。"""
+        def build(query):
+            query = keyword_filter(query, q)
+            query = platform_filter(query, aliases)
+            return query
+        return build
+
+    def attachment_headers(filename: str):
+        return {"Content-Disposition": f"attachment; filename={filename}"}
+
+    # 导出 CSV（从数据库按当前筛选，边查询边输出）
     @app.route("/api/base/export/csv", methods=["GET"]) 
     def export_base_csv():
         q = request.args.get("q", "").strip()
         raw_platform = request.args.get("platform", "").strip()
         aliases = normalize_platform_filter(raw_platform)
-        try:
-            sess = get_session()
-            try:
-                query = sess.query(Item)
-                if q:
-                    like = f"%{q}%"
-                    query = query.filter((Item.name.ilike(like)) | (Item.market_hash_name.ilike(like)))
-                if aliases:
-                    query = query.join(Platform, Item.id == Platform.item_id).filter(func.upper(Platform.name).in_(aliases))
-                results = query.options(joinedload(Item.platforms)).all()
-                filtered = [r.to_dict() for r in results]
-            finally:
-                sess.close()
-
-            # 生成 CSV
-            from io import StringIO
-            import csv
-            output = StringIO()
-            writer = csv.writer(output)
-            writer.writerow(["name", "marketHashName", "platform", "itemId"])
-            for item in filtered:
-                plats = item.get("platformList") or []
-                if not plats:
-                    writer.writerow([item.get("name"), item.get("marketHashName"), "", ""])
-                else:
-                    for p in plats:
-                        writer.writerow([item.get("name"), item.get("marketHashName"), p.get("name"), p.get("itemId")])
-
-            # 保存到临时文件
-            ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-            csv_path = data_dir / f"base_export_{ts}.csv"
-            with csv_path.open("w", encoding="utf-8", newline="") as f:
-                f.write(output.getvalue())
-            return send_file(str(csv_path), mimetype="text/csv", as_attachment=True, download_name=csv_path.name)
-        except Exception as e:
-            return jsonify({"success": False, "error": str(e)}), 500
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        items = iter_items(get_read_session, base_filter(q, aliases))
+        return Response(stream_base_csv(items), mimetype="text/csv",
+                        headers=attachment_headers(f"base_export_{ts}.csv"))
 
-    # 导出 JSON（从数据库按当前筛选）
+    # 导出 JSON（从数据库按当前筛选，边查询边输出）
     @app.route("/api/base/export/json", methods=["GET"]) 
     def export_base_json():
         q = request.args.get("q", "").strip()
         raw_platform = request.args.get("platform", "").strip()
         aliases = normalize_platform_filter(raw_platform)
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        items = iter_items(get_read_session, base_filter(q, aliases))
+        return Response(stream_json_array(items), mimetype="application/json",
+                        headers=attachment_headers(f"base_export_{ts}.json"))
+
+    # 导出价格历史：format=csv|ndjson，start/end 为时间戳或北京时间日期，可按饰品/平台筛选
+    @app.route("/api/admin/price/export", methods=["GET"])
+    def admin_price_export():
+        fmt = (request.args.get("format") or "csv").strip().lower()
+        if fmt not in ("csv", "ndjson"):
+            return jsonify({"success": False, "error": "format 仅支持 csv 或 ndjson"}), 400
         try:
-            sess = get_session()
-            try:
-                query = sess.query(Item)
-                if q:
-                    like = f"%{q}%"
-                    query = query.filter((Item.name.ilike(like)) | (Item.market_hash_name.ilike(like)))
-                if aliases:
-                    query = query.join(Platform, Item.id == Platform.item_id).filter(func.upper(Platform.name).in_(aliases))
-                results = query.options(joinedload(Item.platforms)).all()
-                filtered = [r.to_dict() for r in results]
-            finally:
-                sess.close()
-            ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-            json_path = data_dir / f"base_export_{ts}.json"
-            with json_path.open("w", encoding="utf-8") as f:
-                json.dump(filtered, f, ensure_ascii=False, indent=2)
-            return send_file(str(json_path), mimetype="application/json", as_attachment=True, download_name=json_path.name)
+            start_ms = parse_time_ms(request.args.get("start"))
+            end_ms = parse_time_ms(request.args.get("end"))
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        mhn = request.args.get("marketHashName", "").strip() or None
+        raw_platform = request.args.get("platform", "").strip()
+        plats = normalize_platform_filter(raw_platform) or None
+        rows = iter_price_rows(get_read_session, start_ms, end_ms, mhn, plats)
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if fmt == "csv":
+            return Response(stream_prices_csv(rows), mimetype="text/csv",
+                            headers=attachment_headers(f"prices_export_{ts}.csv"))
+        return Response(stream_prices_ndjson(rows), mimetype="application/x-ndjson",
+                        headers=attachment_headers(f"prices_export_{ts}.ndjson"))
+
+    # 导出价格历史为列式数据集（按北京时间日期/平台分区），format=parquet|npz，需要 pyarrow 或 numpy
+    @app.route("/api/admin/price/export/columnar", methods=["POST"])
+    def admin_price_export_columnar():
+        payload = request.get_json(silent=True) or {}
+        try:
+            start_ms = parse_time_ms(str(payload.get("start") or ""))
+            end_ms = parse_time_ms(str(payload.get("end") or ""))
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        fmt = (payload.get("format") or "parquet").strip().lower()
+        out_dir = os.path.join("data", "columnar", fmt)
+        try:
+            result = export_columnar(get_session, fmt, out_dir, start_ms, end_ms)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         except Exception as e:
             return jsonify({"success": False, "error": str(e)}), 500
+        return jsonify({"success": True, **result})
 
     # 数据库管理页面
+    # 启动耗时报告（各步骤与迁移耗时、后台孤儿补齐进度）
+    @app.route("/api/admin/db/startup", methods=["GET"])
+    def admin_db_startup_report():
+        return jsonify({"success": True, **STARTUP_REPORT})
+
+    # 写线程状态（队列深度、合并提交统计）
+    @app.route("/api/admin/db/writer", methods=["GET"])
+    def admin_db_writer_status():
+        return jsonify({"success": True, **ingest_writer.status()})
+
     @app.route("/admin/db")
     def admin_db_page():
         return render_template("admin_db.html")
@@ -561,68 +470,79 @@ def create_app():
         aliases = normalize_platform_filter(raw_platform)
         limit = max(1, min(int(request.args.get("limit", 50)), 200))
         offset = max(0, int(request.args.get("offset", 0)))
+        cursor = (request.args.get("cursor") or "").strip()
+        include_prices = request.args.get("includePrices", "").strip().lower() in ("1", "true", "yes")
         sort_by = (request.args.get("sortBy", "") or "").strip().lower()
         order = (request.args.get("order", "asc") or "").strip().lower()
+        order = "desc" if order == "desc" else "asc"
         # 规范 sortBy 值
         if sort_by in ("item_id", "id"):  
             sort_by = "id"
         elif sort_by in ("minprice", "min_price", "minsellprice", "price"):
             sort_by = "min_price"
         else:
+            # 默认按 marketHashName 升序
             sort_by = "default"
+            order = "asc"
         try:
-            sess = get_session()
+            after = decode_cursor(cursor, sort_by, order) if cursor else None
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        try:
+            sess = get_read_session()
             try:
-                query = sess.query(Item)
-                if q:
-                    like = f"%{q}%"
-                    query = query.filter((Item.name.ilike(like)) | (Item.market_hash_name.ilike(like)))
-                if aliases:
-                    query = query.join(Platform, Item.id == Platform.item_id).filter(func.upper(Platform.name).in_(aliases))
-                # 统计总数（在排序与联接之前计算）
-                total = query.count()
-
-                # 排序逻辑
+                query = keyword_filter(sess.query(Item), q)
+                query = platform_filter(query, aliases)
+                # 统计总数（在排序与联接之前计算）：按筛选条件缓存，目录写入后失效
+                totals_key = (q, tuple(sorted(aliases)))
+                total = item_totals.get(totals_key)
+                if total is None:
+                    version = item_totals.version()
+                    # 仅关键词筛选时直接从全文索引计数
+                    total = keyword_count(sess, q) if not aliases else None
+                    if total is None:
+                        total = query.count()
+                    item_totals.put(totals_key, version, total)
+
+                # 排序与游标（keyset）：按上一页末行的排序键继续，翻页成本与页码无关
                 if sort_by == "id":
-                    if order == "desc":
-                        query = query.order_by(Item.id.desc())
-                    else:
-                        query = query.order_by(Item.id.asc())
+                    if after is not None:
+                        query = query.filter(Item.id < after[0] if order == "desc" else Item.id > after[0])
+                    query = query.order_by(Item.id.desc() if order == "desc" else Item.id.asc())
+                    page_key = lambda it: [it.id]
                 elif sort_by == "min_price":
-                    # 依据有效最低售卖价排序（sell_price > 0 且非空）
-                    min_subq = (
-                        sess.query(
-                            Price.item_id,
-                            func.min(Price.sell_price).label("min_sell_price")
-                        )
-                        .filter(Price.sell_price != None, Price.sell_price > 0)
-                        .group_by(Price.item_id)
-                        .subquery()
-                    )
-                    query = query.outerjoin(min_subq, Item.id == min_subq.c.item_id)
-                    # 使用 COALESCE 确保无价的条目排在最后
-                    if order == "desc":
-                        sort_expr = func.coalesce(min_subq.c.min_sell_price, -1.0)
-                        query = query.order_by(sort_expr.desc(), Item.id.asc())
-                    else:
-                        sort_expr = func.coalesce(min_subq.c.min_sell_price, 999999999.0)
-                        query = query.order_by(sort_expr.asc(), Item.id.asc())
+                    # 依据各平台最新快照中的有效最低售卖价（items.min_sell_price）排序，无价的条目排在最后
+                    page_key = lambda it: [it.min_sell_price, it.id]
                 else:
-                    # 默认按 marketHashName 升序
+                    if after is not None:
+                        query = query.filter(Item.market_hash_name > after[0])
                     query = query.order_by(Item.market_hash_name.asc())
+                    page_key = lambda it: [it.market_hash_name]
 
-                results = (
-                    query.options(joinedload(Item.platforms))
-                    .offset(offset)
-                    .limit(limit)
-                    .all()
-                )
+                query = query.options(selectinload(Item.platforms))
+                if sort_by == "min_price":
+                    rows = min_price_page(query, order, after, 0 if after is not None else offset, limit + 1)
+                else:
+                    if after is None and offset:
+                        query = query.offset(offset)
+                    rows = query.limit(limit + 1).all()
+                next_cursor = None
+                if len(rows) > limit:
+                    rows = rows[:limit]
+                    next_cursor = encode_cursor(sort_by, order, page_key(rows[-1]))
+                data = [it.to_dict() for it in rows]
+                # includePrices=1：同时返回本页各饰品的平台最新价格（一次查询）
+                if include_prices:
+                    prices = latest_prices_by_name(sess, [d["marketHashName"] for d in data])
+                    for d in data:
+                        d["prices"] = prices[d["marketHashName"]]
                 return jsonify({
                     "success": True,
-                    "data": [r.to_dict() for r in results],
+                    "data": data,
                     "total": total,
                     "limit": limit,
-                    "offset": offset,
+                    "offset": 0 if after is not None else offset,
+                    "nextCursor": next_cursor,
                 })
             finally:
                 sess.close()
@@ -639,11 +559,11 @@ def create_app():
             plats = payload.get("platformList") or []
             if not mhn:
                 return jsonify({"success": False, "error": "缺少 marketHashName"}), 400
-            sess = get_session()
-            try:
+
+            def create(sess):
                 exists = sess.query(Item).filter(Item.market_hash_name == mhn).one_or_none()
                 if exists is not None:
-                    return jsonify({"success": False, "error": "条目已存在"}), 409
+                    return None
                 obj = Item(market_hash_name=mhn, name=name)
                 sess.add(obj)
                 sess.flush()
@@ -655,13 +575,15 @@ def create_app():
                         continue
                     sess.add(Platform(item_id=obj.id, name=pname, platform_item_id=pid))
                     created_platforms += 1
-                sess.commit()
-                return jsonify({"success": True, "item": obj.to_dict(), "platforms": created_platforms})
-            except Exception:
-                sess.rollback()
-                raise
-            finally:
-                sess.close()
+                refresh_item_min_sell_for(sess, [mhn])
+                sess.flush()
+                return obj.to_dict(), created_platforms
+
+            created = ingest_writer.run(create)
+            if created is None:
+                return jsonify({"success": False, "error": "条目已存在"}), 409
+            item_totals.invalidate()
+            return jsonify({"success": True, "item": created[0], "platforms": created[1]})
         except Exception as e:
             return jsonify({"success": False, "error": str(e)}), 500
 
@@ -669,36 +591,9 @@ def create_app():
     @app.route("/api/admin/platforms/normalize", methods=["POST"])
     def admin_normalize_platforms():
         try:
-            sess = get_session()
-            normalized = 0
-            merged = 0
-            try:
-                items = sess.query(Item).options(joinedload(Item.platforms)).all()
-                for it in items:
-                    by_canon = {}
-                    # 遍历平台并按规范名归并
-                    for p in list(it.platforms):
-                        cname = canonical_platform_name(p.name)
-                        existing = by_canon.get(cname)
-                        if existing is None:
-                            # 将当前记录重命名为规范名
-                            if (p.name or "").upper() != cname:
-                                p.name = cname
-                                normalized += 1
-                            by_canon[cname] = p
-                        else:
-                            # 合并重复：保留已有记录，补充 itemId，删除当前重复记录
-                            if (not existing.platform_item_id) and p.platform_item_id:
-                                existing.platform_item_id = p.platform_item_id
-                            sess.delete(p)
-                            merged += 1
-                sess.commit()
-                return jsonify({"success": True, "normalized": normalized, "merged": merged})
-            except Exception:
-                sess.rollback()
-                raise
-            finally:
-                sess.close()
+            result = ingest_writer.run(lambda sess: normalize_platforms(sess.connection()))
+            item_totals.invalidate()
+            return jsonify({"success": True, **result})
         except Exception as e:
             return jsonify({"success": False, "error": str(e)}), 500
 
@@ -709,16 +604,17 @@ def create_app():
         if not mhn:
             return jsonify({"success": False, "error": "缺少参数 marketHashName"}), 400
         try:
-            sess = get_session()
-            try:
+            def delete(sess):
                 obj = sess.query(Item).filter(Item.market_hash_name == mhn).one_or_none()
                 if obj is None:
-                    return jsonify({"success": False, "error": "条目不存在"}), 404
+                    return False
                 sess.delete(obj)
-                sess.commit()
-                return jsonify({"success": True})
-            finally:
-                sess.close()
+                return True
+
+            if not ingest_writer.run(delete):
+                return jsonify({"success": False, "error": "条目不存在"}), 404
+            item_totals.invalidate()
+            return jsonify({"success": True})
         except Exception as e:
             return jsonify({"success": False, "error": str(e)}), 500
 
@@ -726,15 +622,14 @@ def create_app():
     @app.route("/api/admin/clear", methods=["POST"])
     def admin_clear_db():
         try:
-            sess = get_session()
-            try:
+            def clear(sess):
                 # 先删平台，再删条目
                 sess.query(Platform).delete()
                 sess.query(Item).delete()
-                sess.commit()
-                return jsonify({"success": True})
-            finally:
-                sess.close()
+
+            ingest_writer.run(clear)
+            item_totals.invalidate()
+            return jsonify({"success": True})
         except Exception as e:
             return jsonify({"success": False, "error": str(e)}), 500
 
@@ -745,8 +640,10 @@ def create_app():
         if not name:
             return jsonify({"success": False, "error": "缺少参数 marketHashName"}), 400
         try:
-            data = client.get_price_single(name)
+            data = price_cache.get("single", name, lambda: proxy_client.get_price_single(name))
             return jsonify(data)
+        except RateLimitError as e:
+            return rate_limited(e)
         except Exception as e:
             return jsonify({"success": False, "error": str(e)}), 500
 
@@ -758,8 +655,11 @@ def create_app():
             names = payload.get("marketHashNames") if isinstance(payload, dict) else None
             if not names or not isinstance(names, list):
                 return jsonify({"success": False, "error": "请提供 marketHashNames 列表"}), 400
-            data = client.get_price_batch(names)
+            # 已缓存的名称本地返回，只把未命中的转发上游
+            data = price_cache.get_batch("batch", [str(n).strip() for n in names], proxy_client.get_price_batch)
             return jsonify(data)
+        except RateLimitError as e:
+            return rate_limited(e)
         except Exception as e:
             return jsonify({"success": False, "error": str(e)}), 500
 
@@ -770,11 +670,18 @@ def create_app():
         if not name:
             return jsonify({"success": False, "error": "缺少参数 marketHashName"}), 400
         try:
-            data = client.get_price_avg(name)
+            data = price_cache.get("avg", name, lambda: proxy_client.get_price_avg(name))
             return jsonify(data)
+        except RateLimitError as e:
+            return rate_limited(e)
         except Exception as e:
             return jsonify({"success": False, "error": str(e)}), 500
 
+    # 价格代理缓存统计（命中 / 未命中 / 合并的并发请求 / 上游调用次数）
+    @app.route("/api/price/cache/stats", methods=["GET"])
+    def price_cache_stats():
+        return jsonify({"success": True, **price_cache.stats()})
+
     # 管理页价格查询：从数据库读取各平台最新记录
     @app.route("/api/admin/price/single", methods=["GET"]) 
     def admin_price_single():
@@ -782,60 +689,10 @@ def create_app():
         if not name:
             return jsonify({"success": False, "error": "缺少参数 marketHashName"}), 400
         try:
-            sess = get_session()
+            sess = get_read_session()
             try:
-                # 兼容：优先通过 item_id 读取，其次使用旧的 marketHashName 匹配
-                item = sess.query(Item).filter(Item.market_hash_name == name).one_or_none()
-                rows = (
-                    sess.query(Price)
-                    .filter(
-                        or_(
-                            Price.market_hash_name == name,
-                            Price.item_id == (item.id if item else None)
-                        )
-                    )
-                    .order_by(Price.update_time.desc(), Price.created_at.desc())
-                    .all()
-                )
-                # 预取涉及的平台，避免 N+1
-                pid_set = {r.platform_id for r in rows if r.platform_id is not None}
-                plat_map = {}
-                if pid_set:
-                    plats = sess.query(Platform).filter(Platform.id.in_(list(pid_set))).all()
-                    plat_map = {p.id: p for p in plats}
-
-                def canonical_platform_name(name: str):
-                    p = (name or "").strip().upper()
-                    if p == "C5":
-                        return "C5GAME"
-                    if p == "HALO":
-                        return "HALOSKINS"
-                    return p
-
-                latest_by_platform = {}
-                for r in rows:
-                    pkey = canonical_platform_name(r.platform) if r.platform else None
-                    if not pkey and r.platform_id and r.platform_id in plat_map:
-                        pkey = canonical_platform_name(plat_map[r.platform_id].name)
-                    pkey = pkey or "UNKNOWN"
-                    if pkey not in latest_by_platform:
-                        latest_by_platform[pkey] = r
-                platforms = []
-                for p, r in latest_by_platform.items():
-                    plat_item_id = r.platform_item_id
-                    if not plat_item_id and r.platform_id and r.platform_id in plat_map:
-                        plat_item_id = plat_map[r.platform_id].platform_item_id
-                    platforms.append({
-                        "platform": p,
-                        "itemId": plat_item_id,
-                        "sell_price": r.sell_price,
-                        "bidding_price": r.bidding_price,
-                        "sell_count": r.sell_count,
-                        "bidding_count": r.bidding_count,
-                        "update_time": r.update_time,
-                        "update_time_text": r.update_time_text,
-                        "created_at": r.created_at.isoformat() if r.created_at else None
-                    })
+                # 直接读取最新快照：每个平台一行
+                platforms = latest_prices_by_name(sess, [name])[name]
                 return jsonify({
                     "success": True,
                     "source": "db",
@@ -848,108 +705,161 @@ def create_app():
         except Exception as e:
             return jsonify({"success": False, "error": str(e)}), 500
 
-    # 管理页均价查询：近7天数据库均值
+    # 管理页批量价格查询：一次返回多个饰品各平台最新记录（marketHashName 可重复，或 ids=饰品ID逗号分隔）
+    @app.route("/api/admin/price/latest", methods=["GET"])
+    def admin_price_latest():
+        names = [n.strip() for n in request.args.getlist("marketHashName") if n.strip()]
+        try:
+            ids = [int(x) for x in (request.args.get("ids") or "").split(",") if x.strip()]
+        except ValueError:
+            return jsonify({"success": False, "error": "ids 必须为逗号分隔的整数"}), 400
+        if not names and not ids:
+            return jsonify({"success": False, "error": "缺少参数 marketHashName 或 ids"}), 400
+        if len(names) + len(ids) > 500:
+            return jsonify({"success": False, "error": "单次最多查询 500 个饰品"}), 400
+        try:
+            sess = get_read_session()
+            try:
+                if ids:
+                    names += [m for (m,) in sess.query(Item.market_hash_name).filter(Item.id.in_(ids))]
+                data = latest_prices_by_name(sess, list(dict.fromkeys(names)))
+                return jsonify({"success": True, "source": "db", "count": len(data), "data": data})
+            finally:
+                sess.close()
+        except Exception as e:
+            return jsonify({"success": False, "error": str(e)}), 500
+
+    # 均价窗口：支持 1d/7d/30d、12h 或纯数字（天）
+    def parse_window_ms(raw: str, default_days: int = 7):
+        v = (raw or "").strip().lower()
+        if not v:
+            return default_days * DAY_MS
+        unit = DAY_MS
+        if v[-1] in ("d", "h"):
+            unit = DAY_MS if v[-1] == "d" else HOUR_MS
+            v = v[:-1]
+        n = float(v)
+        if n <= 0:
+            raise ValueError("window 必须大于 0")
+        return int(min(n * unit, 366 * DAY_MS))
+
+    # 管理页均价查询：按小时/日汇总桶计算窗口内均值（默认近7天）
     @app.route("/api/admin/price/avg", methods=["GET"]) 
     def admin_price_avg():
         name = request.args.get("marketHashName", "").strip()
         if not name:
             return jsonify({"success": False, "error": "缺少参数 marketHashName"}), 400
         try:
-            now = datetime.utcnow()
-            window_days = 7
-            threshold_dt = now - timedelta(days=window_days)
-            threshold_ms = int(threshold_dt.timestamp() * 1000)
-
-            sess = get_session()
+            window_ms = parse_window_ms(request.args.get("window") or request.args.get("days") or "")
+        except ValueError:
+            return jsonify({"success": False, "error": "window 格式不正确，例如 1d、7d、30d"}), 400
+        try:
+            now_ms = int(time.time() * 1000)
+            threshold_ms = now_ms - window_ms
+            # 窗口起点按小时对齐；其后第一个完整自然日之前用小时桶，之后用日桶
+            hour_start = hour_bucket(threshold_ms)
+            day_cut = day_bucket(hour_start)
+            if day_cut < hour_start:
+                day_cut += DAY_MS
+
+            sess = get_read_session()
             try:
-                item = sess.query(Item).filter(Item.market_hash_name == name).one_or_none()
-                rows = (
-                    sess.query(Price)
-                    .filter(
-                        or_(
-                            Price.market_hash_name == name,
-                            Price.item_id == (item.id if item else None)
-                        )
-                    )
+                cols = lambda m: (
+                    m.platform,
+                    func.sum(m.sell_sum), func.sum(m.sell_samples), func.min(m.sell_min), func.max(m.sell_max),
+                    func.sum(m.bidding_sum), func.sum(m.bidding_samples), func.min(m.bidding_min), func.max(m.bidding_max),
+                )
+                hourly = (
+                    sess.query(*cols(PriceRollupHourly))
                     .filter(
-                        or_(
-                            Price.update_time != None,
-                            Price.created_at != None
-                        )
+                        PriceRollupHourly.market_hash_name == name,
+                        PriceRollupHourly.bucket_start >= hour_start,
+                        PriceRollupHourly.bucket_start < day_cut,
                     )
+                    .group_by(PriceRollupHourly.platform)
+                    .all()
+                )
+                daily = (
+                    sess.query(*cols(PriceRollupDaily))
                     .filter(
-                        or_(
-                            and_(Price.update_time != None, Price.update_time >= threshold_ms),
-                            and_(Price.update_time == None, Price.created_at >= threshold_dt)
-                        )
+                        PriceRollupDaily.market_hash_name == name,
+                        PriceRollupDaily.bucket_start >= day_cut,
                     )
+                    .group_by(PriceRollupDaily.platform)
                     .all()
                 )
+            finally:
+                sess.close()
 
-                per_platform = {}
-                # 预取涉及的平台
-                pid_set = {r.platform_id for r in rows if r.platform_id is not None}
-                plat_map = {}
-                if pid_set:
-                    plats = sess.query(Platform).filter(Platform.id.in_(list(pid_set))).all()
-                    plat_map = {p.id: p for p in plats}
-
-                def canonical_platform_name(name: str):
-                    p = (name or "").strip().upper()
-                    if p == "C5":
-                        return "C5GAME"
-                    if p == "HALO":
-                        return "HALOSKINS"
-                    return p
-
-                for r in rows:
-                    key = canonical_platform_name(r.platform) if r.platform else None
-                    if not key and r.platform_id and r.platform_id in plat_map:
-                        key = canonical_platform_name(plat_map[r.platform_id].name)
-                    key = key or "UNKNOWN"
-                    if key not in per_platform:
-                        per_platform[key] = {"sell": [], "buy": []}
-                    if r.sell_price is not None:
-                        per_platform[key]["sell"].append(r.sell_price)
-                    if r.bidding_price is not None:
-                        per_platform[key]["buy"].append(r.bidding_price)
-
-                def avg(values):
-                    return (sum(values) / len(values)) if values else None
-
-                platforms = []
-                all_sell = []
-                all_buy = []
-                for p, vals in per_platform.items():
-                    s_avg = avg(vals["sell"])
-                    b_avg = avg(vals["buy"])
-                    platforms.append({
-                        "platform": p,
-                        "sell_avg": s_avg,
-                        "bidding_avg": b_avg,
-                        "sell_samples": len(vals["sell"]),
-                        "bidding_samples": len(vals["buy"])
-                    })
-                    all_sell.extend(vals["sell"])
-                    all_buy.extend(vals["buy"])
-
-                overall = {
-                    "sell_avg": avg(all_sell),
-                    "bidding_avg": avg(all_buy),
-                    "sell_samples": len(all_sell),
-                    "bidding_samples": len(all_buy)
+            def merge(acc, s_sum, s_n, s_min, s_max, b_sum, b_n, b_min, b_max):
+                acc["sell_sum"] += s_sum or 0
+                acc["sell_samples"] += s_n or 0
+                acc["bidding_sum"] += b_sum or 0
+                acc["bidding_samples"] += b_n or 0
+                for k, v, fn in (("sell_min", s_min, min), ("sell_max", s_max, max),
+                                 ("bidding_min", b_min, min), ("bidding_max", b_max, max)):
+                    if v is not None:
+                        acc[k] = v if acc[k] is None else fn(acc[k], v)
+
+            def empty():
+                return {"sell_sum": 0.0, "sell_samples": 0, "sell_min": None, "sell_max": None,
+                        "bidding_sum": 0.0, "bidding_samples": 0, "bidding_min": None, "bidding_max": None}
+
+            def summarize(acc):
+                return {
+                    "sell_avg": (acc["sell_sum"] / acc["sell_samples"]) if acc["sell_samples"] else None,
+                    "bidding_avg": (acc["bidding_sum"] / acc["bidding_samples"]) if acc["bidding_samples"] else None,
+                    "sell_samples": acc["sell_samples"],
+                    "bidding_samples": acc["bidding_samples"],
+                    "sell_min": acc["sell_min"],
+                    "sell_max": acc["sell_max"],
+                    "bidding_min": acc["bidding_min"],
+                    "bidding_max": acc["bidding_max"],
                 }
 
-                return jsonify({
-                    "success": True,
-                    "source": "db",
-                    "marketHashName": name,
-                    "windowDays": window_days,
-                    "platforms": platforms,
-                    "overall": overall
-                })
-            finally:
-                sess.close()
+            per_platform = {}
+            overall_acc = empty()
+            for row in list(hourly) + list(daily):
+                acc = per_platform.setdefault(row[0], empty())
+                merge(acc, *row[1:])
+                merge(overall_acc, *row[1:])
+
+            platforms = [{"platform": p, **summarize(acc)} for p, acc in sorted(per_platform.items())]
+            return jsonify({
+                "success": True,
+                "source": "rollup",
+                "marketHashName": name,
+                "windowDays": round(window_ms / DAY_MS, 4),
+                "platforms": platforms,
+                "overall": summarize(overall_acc)
+            })
+        except Exception as e:
+            return jsonify({"success": False, "error": str(e)}), 500
+
+    # 跨平台价差/波动率排行：窗口内价格读为 NumPy 列后向量化计算（需要 numpy）
+    @app.route("/api/admin/analytics/spread", methods=["GET"])
+    def admin_analytics_spread():
+        try:
+            window_ms = parse_window_ms(request.args.get("window") or "")
+            limit = max(1, min(int(request.args.get("limit", 50)), 500))
+            min_platforms = max(1, int(request.args.get("minPlatforms", 2)))
+        except ValueError:
+            return jsonify({"success": False, "error": "参数格式不正确，例如 window=7d&limit=50&minPlatforms=2"}), 400
+        raw_platform = request.args.get("platform", "").strip()
+        plats = normalize_platform_filter(raw_platform) or None
+        try:
+            t0 = time.perf_counter()
+            now_ms = int(time.time() * 1000)
+            cols = load_price_columns(get_read_session, now_ms - window_ms, None, plats)
+            stats = cross_platform_stats(cols, min_platforms)
+            return jsonify({
+                "success": True,
+                "windowDays": round(window_ms / DAY_MS, 4),
+                "rows": int(cols["item"].size),
+                "items": stats["count"],
+                "elapsedMs": round((time.perf_counter() - t0) * 1000, 1),
+                "top": top_spreads(cols, stats, limit),
+            })
         except Exception as e:
             return jsonify({"success": False, "error": str(e)}), 500
 
@@ -998,96 +908,48 @@ def create_app():
                 for i in range(0, len(lst), size):
                     yield lst[i:i+size]
 
-            all_responses = []
-            inserted_count = 0
             now_dt = datetime.utcnow()
 
-            def _to_float(x):
-                try:
-                    return float(x)
-                except Exception:
-                    return None
+            # 多个批次并发在途请求，轮流分配到默认 key 与 KeyPool 中的各个 key，结果按区间顺序返回；
+            # 只发出各 key 当前额度内的批次，其余作为 pendingChunks 返回由调用方稍后重新提交（不在请求线程里等令牌）；
+            # 单个批次失败只记录该批次，其余批次照常入库
+            chunks = list(chunk(names, 100))
+            api_keys = list(dict.fromkeys([k for k in [api_key] + [c.api_key for c in key_pool] if k]))
+            keys = async_client.assign_keys(len(chunks), "price_batch", api_keys)
+            pending_chunks = [{"index": i, "names": c} for i, c in enumerate(chunks) if i >= len(keys)]
 
-            def _to_int(x):
-                try:
-                    return int(x)
-                except Exception:
+            def pending_retry_after():
+                if not pending_chunks:
                     return None
+                return round(min(async_client.wait_time("price_batch", k) for k in (api_keys or [None])), 1)
+
+            if not keys:
+                retry_after = pending_retry_after()
+                resp = jsonify({"success": False, "error": "批量接口额度已用完，请稍后重试",
+                                "retryAfter": retry_after, "pendingChunks": pending_chunks})
+                resp.headers["Retry-After"] = str(int(retry_after or 0) + 1)
+                return resp, 429
+            results = async_client.get_price_batch_many(chunks[:len(keys)], api_keys=keys)
+            retry_after = pending_retry_after()
+            all_responses = []
+            failed_chunks = []
+            for idx, (chunk_names, res) in enumerate(zip(chunks, results)):
+                if isinstance(res, BaseException):
+                    failed_chunks.append({
+                        "index": idx,
+                        "names": chunk_names,
+                        "error": str(res),
+                        "retryAfter": getattr(res, "retry_after", None),
+                    })
+                else:
+                    all_responses.append(res)
+            if not all_responses:
+                return jsonify({"success": False, "error": failed_chunks[0]["error"], "failedChunks": failed_chunks}), 500
 
-            sess = get_session()
-            try:
-                for chunk_names in chunk(names, 100):
-                    resp = client.get_price_batch(chunk_names)
-                    all_responses.append(resp)
-                    # 解析并写入 Price
-                    data_list = []
-                    if isinstance(resp, dict):
-                        if isinstance(resp.get("data"), list):
-                            data_list = resp.get("data")
-                        elif isinstance(resp.get("items"), list):
-                            data_list = resp.get("items")
-                        elif isinstance(resp.get("results"), list):
-                            data_list = resp.get("results")
-                    elif isinstance(resp, list):
-                        data_list = resp
-
-                    for it in (data_list or []):
-                        mhn = (it.get("marketHashName") or it.get("market_hash_name") or "").strip()
-                        if not mhn:
-                            continue
-                        # 支持多种平台列表键：platforms/platformList/dataList
-                        plats = it.get("platforms") or it.get("platformList") or it.get("dataList") or []
-                        if isinstance(plats, dict):
-                            plats = [plats]
-                        for p in plats:
-                            # 兼容不同的平台名键
-                            plat_name_raw = (p.get("platform") or p.get("name") or p.get("plat") or "")
-                            plat_name = canonical_platform_name(plat_name_raw)
-                            # 兼容不同的平台条目ID键
-                            pid = (p.get("itemId") or p.get("platformItemId") or p.get("platform_item_id") or None)
-                            sell = _to_float(p.get("sell_price") or p.get("sellPrice") or p.get("sell") or p.get("price"))
-                            buy = _to_float(p.get("bidding_price") or p.get("biddingPrice") or p.get("buy") or p.get("buy_price"))
-                            sell_count = _to_int(p.get("sell_count") or p.get("sellCount"))
-                            bidding_count = _to_int(p.get("bidding_count") or p.get("biddingCount"))
-                            ut = p.get("update_time") or p.get("updateTime")
-                            ut_int = _to_int(ut) if ut is not None else None
-                            # 统一为毫秒时间戳：若为秒（10位）则乘以 1000
-                            if ut_int is not None and ut_int < 1000000000000:
-                                ut_int = ut_int * 1000
-
-                            # 填充 item_id 与 platform_id（兼容旧数据无平台映射的情况）
-                            item_rec = sess.query(Item).filter(Item.market_hash_name == mhn).one_or_none()
-                            item_id_val = item_rec.id if item_rec else None
-                            plat_id_val = None
-                            if item_id_val:
-                                plat_rec = (
-                                    sess.query(Platform)
-                                    .filter(Platform.item_id == item_id_val, Platform.name == plat_name)
-                                    .one_or_none()
-                                )
-                                plat_id_val = plat_rec.id if plat_rec else None
-
-                            row = Price(
-                                market_hash_name=mhn,
-                                platform=plat_name,
-                                platform_item_id=pid,
-                                item_id=item_id_val,
-                                platform_id=plat_id_val,
-                                sell_price=sell,
-                                bidding_price=buy,
-                                sell_count=sell_count,
-                                bidding_count=bidding_count,
-                                update_time=ut_int,
-                                update_time_text=_format_beijing_text(ut_int),
-                            )
-                            sess.add(row)
-                            inserted_count += 1
-                sess.commit()
-            except Exception:
-                sess.rollback()
-                raise
-            finally:
-                sess.close()
+            # 解析并整批写入 Price（交给写线程，与后台任务的批次合并提交）
+            inserted_count = ingest_writer.run(
+                lambda sess: sum(ingest_price_response(sess, resp) for resp in all_responses)
+            )
 
             # 导出合并 JSON 到 data/<start>-<end>.json
             out_name = f"{start_id}-{end_id}.json"
@@ -1099,8 +961,10 @@ def create_app():
                         "startId": start_id,
                         "endId": end_id,
                         "count": len(names),
-                        "chunks": len(list(chunk(names, 100))),
+                        "chunks": len(chunks),
                         "responses": all_responses,
+                        "failedChunks": failed_chunks,
+                        "pendingChunks": pending_chunks,
                         "savedAt": now_dt.isoformat() + "Z",
                     }, f, ensure_ascii=False, indent=2)
             except Exception as e:
@@ -1111,8 +975,12 @@ def create_app():
                 "startId": start_id,
                 "endId": end_id,
                 "itemCount": len(items),
-                "processedNames": len(names),
+                "processedNames": len(names) - sum(len(f["names"]) for f in failed_chunks + pending_chunks),
                 "insertedRows": inserted_count,
+                "partial": bool(failed_chunks or pending_chunks),
+                "failedChunks": failed_chunks,
+                "pendingChunks": pending_chunks,
+                "retryAfter": retry_after,
                 "saved": str(out_path),
             })
         except Exception as e:
@@ -0,0 +1,51 @@
+"""批量请求并发基准：同步 SteamDTClient 串行 vs SyncSteamDTClient 并发在途。
+
+用法（在仓库根目录执行）：
+    python benchmarks/bench_async_client.py [--chunks 20] [--latency 0.2] [--concurrency 4]
+
+请求发往本地模拟服务（benchmarks/stub_server.py），关闭限频以只比较网络并发。
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from steamdt_client import SteamDTClient  # noqa: E402
+from steamdt_async import SyncSteamDTClient  # noqa: E402
+from stub_server import stub_server  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=20)
+    ap.add_argument("--latency", type=float, default=0.2)
+    ap.add_argument("--concurrency", type=int, default=4)
+    args = ap.parse_args()
+
+    chunks = [[f"Item | Synthetic {c * 100 + i:06d}" for i in range(100)] for c in range(args.chunks)]
+    with stub_server(latency=args.latency) as base_url:
+        sync_client = SteamDTClient(api_key="stub", rate_limit=False, base_url=base_url)
+        t0 = time.perf_counter()
+        for c in chunks:
+            sync_client.get_price_batch(c)
+        t_serial = time.perf_counter() - t0
+
+        facade = SyncSteamDTClient(api_key="stub", max_concurrency=args.concurrency, rate_limit=False, base_url=base_url)
+        try:
+            t0 = time.perf_counter()
+            results = facade.get_price_batch_many(chunks)
+            t_async = time.perf_counter() - t0
+        finally:
+            facade.close()
+
+    assert len(results) == len(chunks)
+    print(f"{args.chunks} batch requests x 100 names, stub latency {args.latency}s")
+    print(f"{'serial requests.Session':<28}: {t_serial:6.2f} s")
+    print(f"{f'async, {args.concurrency} in flight':<28}: {t_async:6.2f} s  ({t_serial / t_async:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""目录入库基准：对比逐条查询 + ORM add 的旧导入与 catalog_loader.load_catalog。
+
+用法（在仓库根目录执行）：
+    python benchmarks/bench_catalog.py [--items 20000]
+
+在临时 SQLite 文件中分别测量：空库首次导入、以及对已有目录的每日刷新（upsert）。
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from db import Base, Item, Platform  # noqa: E402
+from catalog_loader import load_catalog  # noqa: E402
+
+PLATFORMS = ["BUFF", "C5GAME", "YOUPIN", "HALOSKINS", "STEAM", "SKINPORT"]
+
+
+def make_items(n: int):
+    return [
+        {"name": f"饰品 {i}", "marketHashName": f"Item | Synthetic {i:06d}",
+         "platformList": [{"name": p, "itemId": str(i * 10 + k)} for k, p in enumerate(PLATFORMS)]}
+        for i in range(1, n + 1)
+    ]
+
+
+def legacy_upsert(sess, items) -> int:
+    """改造前 fetch_base_info 的写入逻辑（补上 flush 以便取得新饰品 id）。"""
+    n = 0
+    for it in items:
+        mhn = (it.get("marketHashName") or "").strip()
+        name = (it.get("name") or "").strip()
+        obj = sess.query(Item).filter(Item.market_hash_name == mhn).one_or_none()
+        if obj is None:
+            obj = Item(market_hash_name=mhn, name=name)
+            sess.add(obj)
+            sess.flush()
+            n += 1
+        else:
+            obj.name = name or obj.name
+        for p in it.get("platformList") or []:
+            pname = (p.get("name") or "").strip()
+            pid = (p.get("itemId") or "").strip()
+            existing = (
+                sess.query(Platform)
+                .filter(Platform.item_id == obj.id, Platform.name == pname)
+                .one_or_none()
+            )
+            if existing is None:
+                sess.add(Platform(item_id=obj.id, name=pname, platform_item_id=pid))
+            else:
+                existing.platform_item_id = pid or existing.platform_item_id
+    return n
+
+
+def timed(Session, fn, items) -> float:
+    sess = Session()
+    try:
+        t0 = time.perf_counter()
+        fn(sess, items)
+        sess.commit()
+        return time.perf_counter() - t0
+    finally:
+        sess.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=20000)
+    args = ap.parse_args()
+    items = make_items(args.items)
+
+    def bulk(sess, data):
+        return load_catalog(sess, data, update_existing=True)
+
+    results = {}
+    for label, fn in (("legacy per-item ORM", legacy_upsert), ("bulk load_catalog", bulk)):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{tmp}/bench.db", future=True)
+            Base.metadata.create_all(engine)
+            Session = sessionmaker(bind=engine, autoflush=False, future=True)
+            results[label] = (timed(Session, fn, items), timed(Session, fn, items))
+            engine.dispose()
+
+    print(f"catalogue={args.items} items x {len(PLATFORMS)} platforms")
+    base_first, base_refresh = results["legacy per-item ORM"]
+    for label, (first, refresh) in results.items():
+        print(f"{label:<20}: first import {first:6.2f} s ({base_first / first:5.1f}x)"
+              f"   daily refresh {refresh:6.2f} s ({base_refresh / refresh:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""连接配置基准：持续入库的同时测量读写延迟，对比默认连接与调优配置。
+
+用法（在仓库根目录执行）：
+    python benchmarks/bench_db_profiles.py [--items 20000] [--seconds 10] [--readers 4] [--producers 4]
+
+两种配置各用一个新的临时 SQLite 文件（WAL），写入统一经由 WriteQueue：
+    default  单一引擎，连接只带 sqlite3 的 timeout，读写共用连接池
+    tuned    每连接 PRAGMA（synchronous=NORMAL、cache_size、mmap_size、temp_store）+ 独立只读引擎
+生产线程按 100 个饰品一批提交价格，读线程循环执行按饰品查询价格历史与按名称前缀分页两类查询。
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import func  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from db import Base, Item, Price, make_engine  # noqa: E402
+from price_ingest import ingest_price_response  # noqa: E402
+from write_queue import WriteQueue  # noqa: E402
+from bench_ingest import build_catalogue, make_response  # noqa: E402
+
+
+def percentiles(samples):
+    if not samples:
+        return {"n": 0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    s = sorted(samples)
+    return {
+        "n": len(s),
+        "p50": statistics.median(s),
+        "p95": s[min(len(s) - 1, int(len(s) * 0.95))],
+        "max": s[-1],
+    }
+
+
+def read_price_history(sess, n_items: int):
+    item_id = random.randint(1, n_items)
+    return (
+        sess.query(Price.platform, func.count(), func.avg(Price.sell_price))
+        .filter(Price.item_id == item_id)
+        .group_by(Price.platform)
+        .all()
+    )
+
+
+def read_item_page(sess, n_items: int):
+    prefix = f"Item | Synthetic {random.randint(0, n_items // 1000):03d}"
+    return (
+        sess.query(Item)
+        .filter(Item.market_hash_name >= prefix)
+        .order_by(Item.market_hash_name.asc())
+        .limit(50)
+        .all()
+    )
+
+
+def run_profile(name: str, tmp: str, args) -> dict:
+    url = f"sqlite:///{tmp}/{name}.db"
+    tuned = name == "tuned"
+    write_engine = make_engine(url, tuned=tuned)
+    with write_engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+    read_engine = make_engine(url, read_only=True, pool_size=args.readers) if tuned else write_engine
+    Base.metadata.create_all(write_engine)
+    Session = sessionmaker(bind=write_engine, autoflush=False, future=True)
+    ReadSession = sessionmaker(bind=read_engine, autoflush=False, future=True)
+    build_catalogue(Session, args.items)
+
+    writer = WriteQueue(Session)
+    stop = threading.Event()
+    write_ms, read_ms, rows = [], [], [0]
+    lock = threading.Lock()
+
+    def producer(seed: int):
+        rnd = random.Random(seed)
+        while not stop.is_set():
+            start = rnd.randint(1, max(1, args.items - 100))
+            resp = make_response(range(start, start + 100))
+            t0 = time.perf_counter()
+            n = writer.run(lambda sess: ingest_price_response(sess, resp))
+            with lock:
+                write_ms.append((time.perf_counter() - t0) * 1000)
+                rows[0] += n
+
+    def reader(seed: int):
+        random.seed(seed)
+        while not stop.is_set():
+            fn = read_price_history if random.random() < 0.5 else read_item_page
+            t0 = time.perf_counter()
+            sess = ReadSession()
+            try:
+                fn(sess, args.items)
+            finally:
+                sess.close()
+            with lock:
+                read_ms.append((time.perf_counter() - t0) * 1000)
+
+    threads = [threading.Thread(target=producer, args=(i,)) for i in range(args.producers)]
+    threads += [threading.Thread(target=reader, args=(100 + i,)) for i in range(args.readers)]
+    t_start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t_start
+    writer.stop()
+    write_engine.dispose()
+    if read_engine is not write_engine:
+        read_engine.dispose()
+    return {
+        "read": percentiles(read_ms),
+        "write": percentiles(write_ms),
+        "rowsPerSec": rows[0] / elapsed,
+        "avgGroup": writer.status()["avgGroup"],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=20000)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--producers", type=int, default=4)
+    args = ap.parse_args()
+
+    print(f"catalogue={args.items} items, producers={args.producers}, readers={args.readers}, {args.seconds}s per profile")
+    print(f"{'profile':<8} {'reads':>7} {'read p50':>9} {'p95':>7} {'max':>7} "
+          f"{'batches':>8} {'write p50':>10} {'p95':>7} {'rows/s':>8} {'group':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("default", "tuned"):
+            random.seed(42)
+            r = run_profile(name, tmp, args)
+            rd, wr = r["read"], r["write"]
+            print(f"{name:<8} {rd['n']:>7} {rd['p50']:>8.2f}ms {rd['p95']:>6.2f} {rd['max']:>7.1f} "
+                  f"{wr['n']:>8} {wr['p50']:>8.2f}ms {wr['p95']:>6.2f} {r['rowsPerSec']:>8.0f} {r['avgGroup']:>6}")
+
+
+if __name__ == "__main__":
+    main()
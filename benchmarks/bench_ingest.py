@@ -0,0 +1,152 @@
+"""价格入库基准：对比逐行 ORM 查询写入与整批解析 ID + Core INSERT 的吞吐。
+
+用法（在仓库根目录执行）：
+    python benchmarks/bench_ingest.py [--items 30000] [--batches 50]
+
+在临时 SQLite 文件中生成合成目录（每个饰品 6 个平台），
+按 100 个饰品一批模拟批量接口响应，分别统计两种写入方式的 rows/sec。
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from db import Base, Item, Platform, Price  # noqa: E402
+from price_ingest import ingest_price_response  # noqa: E402
+from price_normalizer import canonical_platform_name, _to_float, _to_int, _format_beijing_text  # noqa: E402
+
+PLATFORMS = ["BUFF", "C5", "YOUPIN", "HALO", "STEAM", "SKINPORT"]
+
+
+def build_catalogue(Session, n_items: int):
+    sess = Session()
+    try:
+        sess.execute(insert(Item.__table__), [
+            {"id": i, "name": f"饰品 {i}", "market_hash_name": f"Item | Synthetic {i:06d}"}
+            for i in range(1, n_items + 1)
+        ])
+        sess.execute(insert(Platform.__table__), [
+            {"item_id": i, "name": canonical_platform_name(p), "platform_item_id": str(i * 10 + k)}
+            for i in range(1, n_items + 1)
+            for k, p in enumerate(PLATFORMS)
+        ])
+        sess.commit()
+    finally:
+        sess.close()
+
+
+def make_response(ids):
+    now_sec = int(time.time())
+    return {
+        "success": True,
+        "data": [
+            {
+                "marketHashName": f"Item | Synthetic {i:06d}",
+                "dataList": [
+                    {
+                        "platform": p,
+                        "platformItemId": str(i * 10 + k),
+                        "sellPrice": round(random.uniform(1, 500), 2),
+                        "sellCount": random.randint(0, 500),
+                        "biddingPrice": round(random.uniform(1, 500), 2),
+                        "biddingCount": random.randint(0, 500),
+                        "updateTime": now_sec,
+                    }
+                    for k, p in enumerate(PLATFORMS)
+                ],
+            }
+            for i in ids
+        ],
+    }
+
+
+def legacy_ingest(sess, resp) -> int:
+    """改造前 PriceBatchJob._run_one_range 的写入逻辑（逐条查询 + ORM add）。"""
+    written = 0
+    for it in resp.get("data") or []:
+        mhn = (it.get("marketHashName") or it.get("market_hash_name") or "").strip()
+        if not mhn:
+            continue
+        plats = it.get("platforms") or it.get("platformList") or it.get("dataList") or []
+        item_rec = sess.query(Item).filter(Item.market_hash_name == mhn).one_or_none()
+        item_id_val = item_rec.id if item_rec else None
+        for p in plats:
+            plat_name = canonical_platform_name(p.get("platform") or p.get("name") or p.get("plat") or "")
+            pid = (p.get("itemId") or p.get("platformItemId") or p.get("platform_item_id") or None)
+            ut_int = _to_int(p.get("update_time") or p.get("updateTime"))
+            if ut_int is not None and ut_int < 1000000000000:
+                ut_int = ut_int * 1000
+            plat_id_val = None
+            if item_id_val:
+                plat_rec = (
+                    sess.query(Platform)
+                    .filter(Platform.item_id == item_id_val, Platform.name == plat_name)
+                    .one_or_none()
+                )
+                plat_id_val = plat_rec.id if plat_rec else None
+            sess.add(Price(
+                market_hash_name=mhn,
+                platform=plat_name,
+                platform_item_id=str(pid) if pid is not None else None,
+                item_id=item_id_val,
+                platform_id=plat_id_val,
+                sell_price=_to_float(p.get("sell_price") or p.get("sellPrice")),
+                bidding_price=_to_float(p.get("bidding_price") or p.get("biddingPrice")),
+                sell_count=_to_int(p.get("sell_count") or p.get("sellCount")),
+                bidding_count=_to_int(p.get("bidding_count") or p.get("biddingCount")),
+                update_time=ut_int,
+                update_time_text=_format_beijing_text(ut_int),
+            ))
+            written += 1
+    return written
+
+
+def run(Session, ingest_fn, responses) -> float:
+    rows = 0
+    t0 = time.perf_counter()
+    for resp in responses:
+        sess = Session()
+        try:
+            rows += ingest_fn(sess, resp)
+            sess.commit()
+        finally:
+            sess.close()
+    elapsed = time.perf_counter() - t0
+    return rows / elapsed if elapsed > 0 else 0.0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=30000)
+    ap.add_argument("--batches", type=int, default=50)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db", future=True)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine, autoflush=False, future=True)
+        build_catalogue(Session, args.items)
+
+        random.seed(42)
+        responses = []
+        for b in range(args.batches):
+            start = random.randint(1, max(1, args.items - 100))
+            responses.append(make_response(range(start, start + 100)))
+
+        legacy = run(Session, legacy_ingest, responses)
+        bulk = run(Session, ingest_price_response, responses)
+        print(f"catalogue={args.items} items, batches={args.batches} x 100 items x {len(PLATFORMS)} platforms")
+        print(f"legacy per-row ORM : {legacy:10.0f} rows/sec")
+        print(f"bulk-resolved Core : {bulk:10.0f} rows/sec  ({bulk / legacy if legacy else 0:.1f}x)")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""价格负载归一化微基准：对比旧的链式 dict.get 解析与 price_normalizer 快速路径。
+
+用法（在仓库根目录执行）：
+    python benchmarks/bench_normalizer.py [path/to/recorded.json] [--repeat 20]
+
+recorded.json 可为 /api/admin/price/batch_by_id 导出的 data/<start>-<end>.json
+（含 responses 数组）或单次批量接口原始响应；未提供时生成 100 批 x 100 条 x 6 平台的合成响应。
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from price_normalizer import (  # noqa: E402
+    canonical_platform_name, extract_items, normalize_price_items, _to_float, _to_int,
+)
+
+PLATFORMS = ["BUFF", "C5", "YOUPIN", "HALO", "STEAM", "SKINPORT"]
+
+
+def synthetic_payload(batches: int = 100, per_batch: int = 100):
+    random.seed(7)
+    now_sec = int(time.time())
+    responses = []
+    for b in range(batches):
+        responses.append({
+            "success": True,
+            "data": [
+                {
+                    "marketHashName": f"Item | Synthetic {b * per_batch + i:06d}",
+                    "dataList": [
+                        {
+                            "platform": p,
+                            "platformItemId": str(random.randint(1, 10 ** 6)),
+                            "sellPrice": round(random.uniform(1, 500), 2),
+                            "sellCount": random.randint(0, 500),
+                            "biddingPrice": round(random.uniform(1, 500), 2),
+                            "biddingCount": random.randint(0, 500),
+                            "updateTime": now_sec,
+                        }
+                        for p in PLATFORMS
+                    ],
+                }
+                for i in range(per_batch)
+            ],
+        })
+    return {"responses": responses}
+
+
+def legacy_parse(items):
+    """改造前各入库路径中重复的解析逻辑（每行 10~15 次链式 get）。"""
+    out = []
+    for it in items:
+        mhn = (it.get("marketHashName") or it.get("market_hash_name") or "").strip()
+        if not mhn:
+            continue
+        plats = it.get("platforms") or it.get("platformList") or it.get("dataList") or []
+        if isinstance(plats, dict):
+            plats = [plats]
+        for p in plats:
+            plat_name = canonical_platform_name(p.get("platform") or p.get("name") or p.get("plat") or "")
+            pid = (p.get("itemId") or p.get("platformItemId") or p.get("platform_item_id") or None)
+            sell = _to_float(p.get("sell_price") or p.get("sellPrice") or p.get("sell") or p.get("price"))
+            buy = _to_float(p.get("bidding_price") or p.get("biddingPrice") or p.get("buy") or p.get("buy_price"))
+            sell_count = _to_int(p.get("sell_count") or p.get("sellCount"))
+            bidding_count = _to_int(p.get("bidding_count") or p.get("biddingCount"))
+            ut = p.get("update_time") or p.get("updateTime")
+            ut_int = _to_int(ut) if ut is not None else None
+            if ut_int is not None and ut_int < 1000000000000:
+                ut_int = ut_int * 1000
+            out.append((mhn, plat_name, str(pid) if pid is not None else None, sell, buy, sell_count, bidding_count, ut_int))
+    return out
+
+
+def bench(fn, items, repeat):
+    best = float("inf")
+    rows = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        rows = len(fn(items))
+        best = min(best, time.perf_counter() - t0)
+    return rows, best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("path", nargs="?")
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    if args.path:
+        with open(args.path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+    else:
+        payload = synthetic_payload()
+    items = extract_items(payload)
+
+    rows_a, t_a = bench(legacy_parse, items, args.repeat)
+    rows_b, t_b = bench(normalize_price_items, items, args.repeat)
+    print(f"items={len(items)} rows={rows_b} (legacy rows={rows_a}), best of {args.repeat}")
+    print(f"legacy chained get : {t_a * 1e3:8.2f} ms  {rows_a / t_a / 1e6:6.2f} M rows/s")
+    print(f"compiled fast path : {t_b * 1e3:8.2f} ms  {rows_b / t_b / 1e6:6.2f} M rows/s  ({t_a / t_b:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
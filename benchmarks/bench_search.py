@@ -0,0 +1,82 @@
+"""饰品搜索基准：对比 ILIKE '%q%' 全表扫描与 items_fts（FTS5 trigram）索引。
+
+用法（在仓库根目录执行）：
+    python benchmarks/bench_search.py [--items 30000] [--repeat 50]
+
+在临时 SQLite 文件中写入合成目录，分别测量管理页列表查询（一页 50 行 + 总数）的平均延迟。
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker, joinedload  # noqa: E402
+
+import item_search  # noqa: E402
+from db import Base, Item, create_items_fts  # noqa: E402
+from catalog_loader import load_catalog  # noqa: E402
+from bench_catalog import make_items  # noqa: E402
+
+WEAPONS = ["AK-47", "M4A1-S", "AWP", "Glock-18", "USP-S", "Desert Eagle", "★ Karambit", "★ Sport Gloves"]
+SKINS = ["Redline", "Asiimov", "Fade", "Doppler", "Case Hardened", "Vulcan", "Hyper Beast", "Slaughter"]
+WEARS = ["Factory New", "Minimal Wear", "Field-Tested", "Well-Worn", "Battle-Scarred"]
+QUERIES = ["redline", "AK-47 | Vulcan", "field-tested", "Doppler (Factory", "Synthetic 0123", "no such item"]
+
+
+def make_catalog(n: int):
+    items = make_items(n)
+    for i, it in enumerate(items):
+        w, s, wear = WEAPONS[i % len(WEAPONS)], SKINS[(i // 8) % len(SKINS)], WEARS[(i // 64) % len(WEARS)]
+        it["marketHashName"] = f"{w} | {s} ({wear}) Synthetic {i:06d}"
+    return items
+
+
+def list_page(sess, q: str, fts: bool):
+    item_search._fts_ready = fts
+    query = item_search.keyword_filter(sess.query(Item), q)
+    total = item_search.keyword_count(sess, q)
+    if total is None:
+        total = query.count()
+    rows = query.order_by(Item.market_hash_name.asc()).options(joinedload(Item.platforms)).limit(50).all()
+    return total, len(rows)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=30000)
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db", future=True)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine, autoflush=False, future=True)
+        sess = Session()
+        load_catalog(sess, make_catalog(args.items), update_existing=True)
+        sess.commit()
+        with engine.begin() as conn:
+            create_items_fts(conn)
+
+        print(f"catalogue={args.items} items, page=50 rows + total, repeat={args.repeat}")
+        print(f"{'query':<20} {'matches':>8} {'ILIKE ms':>9} {'FTS ms':>8} {'speedup':>8}")
+        for q in QUERIES:
+            res = {}
+            for fts in (False, True):
+                list_page(sess, q, fts)  # 预热
+                t0 = time.perf_counter()
+                for _ in range(args.repeat):
+                    res[fts] = list_page(sess, q, fts)
+                res[(fts, "ms")] = (time.perf_counter() - t0) * 1000 / args.repeat
+            assert res[False] == res[True], (q, res[False], res[True])
+            like_ms, fts_ms = res[(False, "ms")], res[(True, "ms")]
+            print(f"{q:<20} {res[True][0]:>8} {like_ms:>9.2f} {fts_ms:>8.2f} {like_ms / fts_ms:>7.1f}x")
+        sess.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""本地 SteamDT 模拟服务：按固定延迟返回与开放平台同形态的响应，用于离线基准。
+
+    with stub_server(latency=0.2) as base_url:
+        client = SteamDTClient(api_key="stub", rate_limit=False, base_url=base_url)
+
+也可直接运行：python benchmarks/stub_server.py --port 8765 --latency 0.2
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+PLATFORMS = ["BUFF", "C5", "YOUPIN", "HALO", "STEAM", "SKINPORT"]
+
+
+def _price_entry(mhn: str):
+    now_sec = int(time.time())
+    return {
+        "marketHashName": mhn,
+        "dataList": [
+            {
+                "platform": p,
+                "platformItemId": str(abs(hash((mhn, p))) % 10 ** 7),
+                "sellPrice": round(random.uniform(1, 500), 2),
+                "sellCount": random.randint(0, 500),
+                "biddingPrice": round(random.uniform(1, 500), 2),
+                "biddingCount": random.randint(0, 500),
+                "updateTime": now_sec,
+            }
+            for p in PLATFORMS
+        ],
+    }
+
+
+def make_handler(latency: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive，便于观察连接复用
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, obj):
+            time.sleep(latency)
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            u = urlparse(self.path)
+            qs = parse_qs(u.query)
+            mhn = (qs.get("marketHashName") or [""])[0]
+            if u.path.endswith("/price/single"):
+                self._send({"success": True, "data": _price_entry(mhn)["dataList"]})
+            elif u.path.endswith("/price/avg"):
+                self._send({"success": True, "data": {"marketHashName": mhn, "avgPrice": 12.3}})
+            elif u.path.endswith("/base"):
+                self._send({"success": True, "data": [
+                    {"name": f"饰品 {i}", "marketHashName": f"Item | Synthetic {i:06d}",
+                     "platformList": [{"name": p, "itemId": str(i)} for p in PLATFORMS]}
+                    for i in range(1, 101)
+                ]})
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if urlparse(self.path).path.endswith("/price/batch"):
+                names = payload.get("marketHashNames") or []
+                self._send({"success": True, "data": [_price_entry(n) for n in names]})
+            else:
+                self.send_error(404)
+
+    return Handler
+
+
+@contextmanager
+def stub_server(latency: float = 0.2, port: int = 0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency))
+    server.daemon_threads = True
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=0.2)
+    args = ap.parse_args()
+    with stub_server(args.latency, args.port) as url:
+        print(f"stub SteamDT listening on {url} (latency={args.latency}s)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
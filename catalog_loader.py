@@ -0,0 +1,157 @@
+from typing import List, Dict, Any, Tuple, Optional
+
+from sqlalchemy import case, func
+from db import Item, Platform, canonical_platform, dialect_insert, refresh_item_min_sell_for
+
+
+def _chunks(seq: list, n: int):
+    for i in range(0, len(seq), n):
+        yield seq[i:i + n]
+
+
+def parse_catalog_items(items: list, keep_last: bool) -> Tuple[Dict[str, Tuple[str, Dict[str, str]]], int]:
+    """将 base 接口的 data 数组整理为 {marketHashName: (name, {规范平台名: itemId})}，并返回批内重复数。
+
+    keep_last=True 时同名条目后者覆盖前者（平台合并），否则保留首次出现的条目。
+    """
+    out: Dict[str, Tuple[str, Dict[str, str]]] = {}
+    dup = 0
+    for it in items:
+        if not isinstance(it, dict):
+            continue
+        mhn = (it.get("marketHashName") or "").strip()
+        if not mhn:
+            continue
+        name = (it.get("name") or "").strip()
+        plats: Dict[str, str] = {}
+        for p in (it.get("platformList") or []):
+            pname = canonical_platform(p.get("name"))
+            pid = (p.get("itemId") or "").strip()
+            # C5 / C5GAME 等别名归并到同一平台，保留非空 itemId
+            if pname and (pid or pname not in plats):
+                plats[pname] = pid
+        prev = out.get(mhn)
+        if prev is not None:
+            dup += 1
+            if not keep_last:
+                continue
+            merged = dict(prev[1])
+            merged.update({k: v for k, v in plats.items() if v or k not in merged})
+            out[mhn] = (name or prev[0], merged)
+        else:
+            out[mhn] = (name, plats)
+    return out, dup
+
+
+class CatalogLoader:
+    """批量写入饰品目录（items + platforms），可分块多次调用 load()，由调用方提交事务。
+
+    首次调用时一次性预载 marketHashName → id 与 (item_id, 平台名) → itemId 映射，之后随写入更新，
+    只把新增或有变化的行以 INSERT ... ON CONFLICT 分批写入。
+    - update_existing=True：新增饰品，并更新已有饰品的名称与平台 itemId（空值不覆盖）；
+    - update_existing=False：只新增饰品及其平台，已存在的饰品计入 skipped。
+    counters 累计 inserted / updated / skipped / platforms_inserted / platforms_updated。
+    """
+
+    def __init__(self, sess, update_existing: bool, batch_size: int = 2000):
+        self.sess = sess
+        self.update_existing = update_existing
+        self.batch_size = batch_size
+        self.counters = {"inserted": 0, "updated": 0, "skipped": 0,
+                         "platforms_inserted": 0, "platforms_updated": 0}
+        self._existing: Optional[Dict[str, Tuple[int, Optional[str]]]] = None
+        self._plat_map: Optional[Dict[Tuple[int, str], Optional[str]]] = None
+
+    def load(self, items: list) -> Dict[str, int]:
+        sess, counters, update_existing, batch_size = self.sess, self.counters, self.update_existing, self.batch_size
+        parsed, dup = parse_catalog_items(items, keep_last=update_existing)
+        if not update_existing:
+            counters["skipped"] += dup
+        if not parsed:
+            return counters
+
+        if self._existing is None:
+            self._existing = {
+                mhn: (iid, name) for iid, mhn, name in sess.query(Item.id, Item.market_hash_name, Item.name)
+            }
+        existing = self._existing
+
+        # 1) items
+        item_rows: List[Dict[str, Any]] = []
+        new_mhns: List[str] = []
+        for mhn, (name, _) in parsed.items():
+            cur = existing.get(mhn)
+            if cur is None:
+                item_rows.append({"market_hash_name": mhn, "name": name})
+                new_mhns.append(mhn)
+                counters["inserted"] += 1
+            elif not update_existing:
+                counters["skipped"] += 1
+            elif name and name != cur[1]:
+                item_rows.append({"market_hash_name": mhn, "name": name})
+                existing[mhn] = (cur[0], name)
+                counters["updated"] += 1
+        if item_rows:
+            tbl = Item.__table__
+            stmt = dialect_insert(tbl)
+            if update_existing:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[tbl.c.market_hash_name],
+                    set_={"name": case((func.coalesce(stmt.excluded.name, "") != "", stmt.excluded.name), else_=tbl.c.name)},
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=[tbl.c.market_hash_name])
+            for batch in _chunks(item_rows, batch_size):
+                sess.execute(stmt, batch)
+            # 取回新饰品的 id
+            for batch in _chunks(new_mhns, 500):
+                for iid, mhn, name in (
+                    sess.query(Item.id, Item.market_hash_name, Item.name).filter(Item.market_hash_name.in_(batch))
+                ):
+                    existing[mhn] = (iid, name)
+            # 入目录前已有价格快照的饰品补上最低价
+            refresh_item_min_sell_for(sess, new_mhns)
+
+        # 2) platforms：update_existing 时处理本块全部饰品，否则只处理本块新增的饰品
+        if update_existing:
+            targets = [(existing[m][0], plats) for m, (_, plats) in parsed.items() if plats and m in existing]
+        else:
+            targets = [(existing[m][0], parsed[m][1]) for m in new_mhns if parsed[m][1] and m in existing]
+        if self._plat_map is None:
+            self._plat_map = {}
+            if update_existing and targets:
+                self._plat_map = {
+                    (iid, name): pid
+                    for iid, name, pid in sess.query(Platform.item_id, Platform.name, Platform.platform_item_id)
+                }
+        plat_map = self._plat_map
+        plat_rows: List[Dict[str, Any]] = []
+        for iid, plats in targets:
+            for pname, pid in plats.items():
+                key = (iid, pname)
+                if key not in plat_map:
+                    plat_rows.append({"item_id": iid, "name": pname, "platform_item_id": pid})
+                    plat_map[key] = pid
+                    counters["platforms_inserted"] += 1
+                elif pid and pid != plat_map[key]:
+                    plat_rows.append({"item_id": iid, "name": pname, "platform_item_id": pid})
+                    plat_map[key] = pid
+                    counters["platforms_updated"] += 1
+        if plat_rows:
+            tbl = Platform.__table__
+            stmt = dialect_insert(tbl)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[tbl.c.item_id, tbl.c.name],
+                set_={"platform_item_id": case(
+                    (func.coalesce(stmt.excluded.platform_item_id, "") != "", stmt.excluded.platform_item_id),
+                    else_=tbl.c.platform_item_id,
+                )},
+            )
+            for batch in _chunks(plat_rows, batch_size):
+                sess.execute(stmt, batch)
+        return counters
+
+
+def load_catalog(sess, items: list, update_existing: bool, batch_size: int = 2000) -> Dict[str, int]:
+    """一次性写入整份目录，见 CatalogLoader。"""
+    return CatalogLoader(sess, update_existing, batch_size).load(items)
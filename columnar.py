@@ -0,0 +1,320 @@
+import argparse
+import os
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from db import Price, DAY_MS, DAY_OFFSET_MS
+
+# numpy / pyarrow 为可选依赖：未安装时列式导出与分析接口返回错误，其余功能不受影响
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - 可选依赖
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pads
+except ImportError:  # pragma: no cover - 可选依赖
+    pa = None
+    pads = None
+
+FORMATS = ("parquet", "npz")
+READ_BATCH = 50000
+
+# 导出列（date 为北京时间日期，与 platform 一起作为分区键）
+COLUMNS = ("market_hash_name", "platform", "item_id", "sell_price", "bidding_price",
+           "sell_count", "bidding_count", "update_time")
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("该功能需要 numpy，请先执行 pip install numpy")
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Parquet 导出需要 pyarrow，请先执行 pip install pyarrow")
+
+
+@lru_cache(maxsize=4096)
+def _day_label(day_index: int) -> str:
+    return datetime.fromtimestamp(day_index * DAY_MS / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _beijing_date(ms: int) -> str:
+    """北京时间日期（分区键）。"""
+    return _day_label((ms + DAY_OFFSET_MS) // DAY_MS)
+
+
+# 分析只需要的列
+ANALYTICS_COLUMNS = ("market_hash_name", "platform", "sell_price", "bidding_price", "update_time")
+
+
+def _price_select(start_ms: Optional[int], end_ms: Optional[int], platforms: Optional[List[str]] = None,
+                  columns: Tuple[str, ...] = COLUMNS):
+    tbl = Price.__table__
+    stmt = select(*[tbl.c[c] for c in columns]).where(tbl.c.update_time.isnot(None)).order_by(tbl.c.id.asc())
+    if start_ms is not None:
+        stmt = stmt.where(tbl.c.update_time >= start_ms)
+    if end_ms is not None:
+        stmt = stmt.where(tbl.c.update_time < end_ms)
+    if platforms:
+        stmt = stmt.where(tbl.c.platform.in_(platforms))
+    return stmt
+
+
+def iter_price_batches(get_session, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                       platforms: Optional[List[str]] = None, columns: Tuple[str, ...] = COLUMNS,
+                       batch_size: int = READ_BATCH) -> Iterator[List[tuple]]:
+    """按 id 顺序分批读取价格行（元组列表，列顺序同 columns）。"""
+    sess = get_session()
+    try:
+        result = sess.execute(_price_select(start_ms, end_ms, platforms, columns).execution_options(yield_per=batch_size))
+        for part in result.partitions():
+            yield [tuple(r) for r in part]
+    finally:
+        sess.close()
+
+
+def _partition_key(row: tuple) -> Tuple[str, str]:
+    return _beijing_date(row[7]), (row[1] or "UNKNOWN")
+
+
+def export_parquet(get_session, out_dir: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Dict[str, Any]:
+    """写出 Hive 风格分区的 Parquet 数据集：out_dir/date=YYYY-MM-DD/platform=XXX/*.parquet。"""
+    _require_pyarrow()
+    schema = pa.schema([
+        ("market_hash_name", pa.string()),
+        ("item_id", pa.int64()),
+        ("sell_price", pa.float64()),
+        ("bidding_price", pa.float64()),
+        ("sell_count", pa.int64()),
+        ("bidding_count", pa.int64()),
+        ("update_time", pa.int64()),
+        ("date", pa.string()),
+        ("platform", pa.string()),
+    ])
+    counter = {"rows": 0}
+
+    def batches():
+        for rows in iter_price_batches(get_session, start_ms, end_ms):
+            counter["rows"] += len(rows)
+            cols = list(zip(*rows))
+            yield pa.record_batch([
+                pa.array(cols[0], pa.string()),
+                pa.array(cols[2], pa.int64()),
+                pa.array(cols[3], pa.float64()),
+                pa.array(cols[4], pa.float64()),
+                pa.array(cols[5], pa.int64()),
+                pa.array(cols[6], pa.int64()),
+                pa.array(cols[7], pa.int64()),
+                pa.array([_beijing_date(ms) for ms in cols[7]], pa.string()),
+                pa.array([p or "UNKNOWN" for p in cols[1]], pa.string()),
+            ], schema=schema)
+
+    pads.write_dataset(
+        batches(), out_dir, schema=schema, format="parquet",
+        partitioning=pads.partitioning(pa.schema([("date", pa.string()), ("platform", pa.string())]), flavor="hive"),
+        existing_data_behavior="delete_matching",
+        basename_template="part-{i}.parquet",
+    )
+    return {"format": "parquet", "rows": counter["rows"], "outDir": out_dir}
+
+
+def export_npz(get_session, out_dir: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+               flush_rows: int = 200000) -> Dict[str, Any]:
+    """写出按分区组织的 NumPy 数据：out_dir/date=YYYY-MM-DD/platform=XXX/part-N.npz（不依赖 pyarrow）。"""
+    _require_numpy()
+    buffers: Dict[Tuple[str, str], List[tuple]] = {}
+    parts: Dict[Tuple[str, str], int] = {}
+    total = {"rows": 0, "files": 0}
+
+    def flush(key: Tuple[str, str]):
+        rows = buffers.pop(key, None)
+        if not rows:
+            return
+        cols = list(zip(*rows))
+        d = Path(out_dir) / f"date={key[0]}" / f"platform={key[1]}"
+        d.mkdir(parents=True, exist_ok=True)
+        if key not in parts:
+            # 覆盖该分区此前导出的文件
+            for old in d.glob("part-*.npz"):
+                old.unlink()
+        n = parts.get(key, 0)
+        parts[key] = n + 1
+        np.savez(
+            d / f"part-{n}.npz",
+            market_hash_name=np.array(cols[0], dtype=str),
+            item_id=np.array([v if v is not None else -1 for v in cols[2]], dtype=np.int64),
+            sell_price=np.array(cols[3], dtype=np.float64),
+            bidding_price=np.array(cols[4], dtype=np.float64),
+            sell_count=np.array([v if v is not None else -1 for v in cols[5]], dtype=np.int64),
+            bidding_count=np.array([v if v is not None else -1 for v in cols[6]], dtype=np.int64),
+            update_time=np.array(cols[7], dtype=np.int64),
+        )
+        total["files"] += 1
+
+    for rows in iter_price_batches(get_session, start_ms, end_ms):
+        total["rows"] += len(rows)
+        for r in rows:
+            buffers.setdefault(_partition_key(r), []).append(r)
+        for key in [k for k, v in buffers.items() if len(v) >= flush_rows]:
+            flush(key)
+    for key in list(buffers):
+        flush(key)
+    return {"format": "npz", "rows": total["rows"], "files": total["files"], "outDir": out_dir}
+
+
+def export_columnar(get_session, fmt: str, out_dir: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Dict[str, Any]:
+    fmt = (fmt or "parquet").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"format 仅支持 {', '.join(FORMATS)}")
+    if fmt == "parquet":
+        return export_parquet(get_session, out_dir, start_ms, end_ms)
+    return export_npz(get_session, out_dir, start_ms, end_ms)
+
+
+def load_price_columns(get_session, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                       platforms: Optional[List[str]] = None) -> Dict[str, Any]:
+    """将价格行读为列式 NumPy 数组。
+
+    饰品与平台编码为整数（item / platform），名称表见 item_names / platform_names；
+    缺失价格为 NaN。
+    """
+    _require_numpy()
+    item_codes: Dict[str, int] = {}
+    plat_codes: Dict[str, int] = {}
+    chunks: List[Tuple[Any, ...]] = []
+    for rows in iter_price_batches(get_session, start_ms, end_ms, platforms, ANALYTICS_COLUMNS):
+        n = len(rows)
+        cols = list(zip(*rows))
+        item = np.fromiter((item_codes.setdefault(m, len(item_codes)) for m in cols[0]), dtype=np.int32, count=n)
+        plat = np.fromiter((plat_codes.setdefault(p or "UNKNOWN", len(plat_codes)) for p in cols[1]), dtype=np.int16, count=n)
+        sell = np.array(cols[2], dtype=np.float64)      # None -> nan
+        bid = np.array(cols[3], dtype=np.float64)
+        ts = np.fromiter(cols[4], dtype=np.int64, count=n)
+        chunks.append((item, plat, sell, bid, ts))
+
+    def cat(i, dtype):
+        return np.concatenate([c[i] for c in chunks]) if chunks else np.empty(0, dtype=dtype)
+
+    return {
+        "item": cat(0, np.int32),
+        "platform": cat(1, np.int16),
+        "sell_price": cat(2, np.float64),
+        "bidding_price": cat(3, np.float64),
+        "update_time": cat(4, np.int64),
+        "item_names": list(item_codes),
+        "platform_names": list(plat_codes),
+    }
+
+
+def cross_platform_stats(cols: Dict[str, Any], min_platforms: int = 2) -> Dict[str, Any]:
+    """向量化计算每个饰品的跨平台价差与波动率。
+
+    - 价差：各平台窗口内最新在售价的 (max - min) / min，并给出最低/最高价平台；
+    - 波动率：同一 饰品 × 平台 在售价对数收益率的标准差，按饰品取各平台的均值。
+    返回以饰品为行的列式结果（仅包含至少 min_platforms 个平台有价的饰品）。
+    """
+    _require_numpy()
+    item, plat, sell, ts = cols["item"], cols["platform"], cols["sell_price"], cols["update_time"]
+    n_items, n_plats = len(cols["item_names"]), len(cols["platform_names"])
+    ok = ~np.isnan(sell) & (sell > 0)
+    item, plat, sell, ts = item[ok], plat[ok].astype(np.int64), sell[ok], ts[ok]
+    if item.size == 0:
+        return {"item": np.empty(0, dtype=np.int32), "count": 0}
+
+    # 按 (饰品, 平台, 时间) 排序
+    order = np.lexsort((ts, plat, item))
+    item, plat, sell, ts = item[order], plat[order], sell[order], ts[order]
+    group = item.astype(np.int64) * n_plats + plat
+    last_in_group = np.r_[group[1:] != group[:-1], True]
+
+    # 最新价矩阵：饰品 × 平台
+    latest = np.full(n_items * n_plats, np.nan)
+    latest[group[last_in_group]] = sell[last_in_group]
+    latest = latest.reshape(n_items, n_plats)
+    have = (~np.isnan(latest)).sum(axis=1)
+    keep = have >= max(1, min_platforms)
+    filled_hi = np.where(np.isnan(latest), -np.inf, latest)
+    filled_lo = np.where(np.isnan(latest), np.inf, latest)
+    hi_idx = filled_hi.argmax(axis=1)
+    lo_idx = filled_lo.argmin(axis=1)
+    hi = filled_hi[np.arange(n_items), hi_idx]
+    lo = filled_lo[np.arange(n_items), lo_idx]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spread = (hi - lo) / lo
+
+    # 对数收益率（仅同组相邻样本）
+    logp = np.log(sell)
+    same = group[1:] == group[:-1]
+    ret = np.diff(logp)[same]
+    ret_group = group[1:][same]
+    cnt = np.bincount(ret_group, minlength=n_items * n_plats)
+    s1 = np.bincount(ret_group, weights=ret, minlength=n_items * n_plats)
+    s2 = np.bincount(ret_group, weights=ret * ret, minlength=n_items * n_plats)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var = (s2 - s1 * s1 / cnt) / (cnt - 1)
+    vol_gp = np.where(cnt >= 2, np.sqrt(np.maximum(var, 0)), np.nan).reshape(n_items, n_plats)
+    vol_n = (~np.isnan(vol_gp)).sum(axis=1)
+    with np.errstate(invalid="ignore"):
+        vol = np.where(vol_n > 0, np.nansum(vol_gp, axis=1) / np.maximum(vol_n, 1), np.nan)
+
+    idx = np.nonzero(keep)[0]
+    return {
+        "item": idx.astype(np.int32),
+        "platforms": have[idx],
+        "spread": spread[idx],
+        "low": lo[idx],
+        "low_platform": lo_idx[idx],
+        "high": hi[idx],
+        "high_platform": hi_idx[idx],
+        "volatility": vol[idx],
+        "count": int(idx.size),
+    }
+
+
+def top_spreads(cols: Dict[str, Any], stats: Dict[str, Any], limit: int = 50) -> List[Dict[str, Any]]:
+    """按价差降序取前 limit 个饰品，转换为 JSON 友好的字典列表。"""
+    if not stats.get("count"):
+        return []
+    order = np.argsort(-stats["spread"], kind="stable")[:limit]
+    names, plats = cols["item_names"], cols["platform_names"]
+
+    def num(v):
+        v = float(v)
+        return None if np.isnan(v) else round(v, 6)
+
+    return [
+        {
+            "marketHashName": names[stats["item"][i]],
+            "platforms": int(stats["platforms"][i]),
+            "spread": num(stats["spread"][i]),
+            "low": num(stats["low"][i]),
+            "lowPlatform": plats[stats["low_platform"][i]],
+            "high": num(stats["high"][i]),
+            "highPlatform": plats[stats["high_platform"][i]],
+            "volatility": num(stats["volatility"][i]),
+        }
+        for i in order
+    ]
+
+
+def main():
+    from db import SessionLocal
+    from exports import parse_time_ms
+    ap = argparse.ArgumentParser(description="导出 prices 为按日期/平台分区的列式数据（在仓库根目录执行）")
+    ap.add_argument("--format", choices=FORMATS, default="parquet")
+    ap.add_argument("--start", default=None, help="时间戳或北京时间日期，例如 2025-10-01")
+    ap.add_argument("--end", default=None)
+    ap.add_argument("--out", default=os.path.join("data", "columnar"))
+    args = ap.parse_args()
+    print(export_columnar(SessionLocal, args.format, args.out, parse_time_ms(args.start), parse_time_ms(args.end)))
+
+
+if __name__ == "__main__":
+    main()
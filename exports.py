@@ -0,0 +1,133 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from db import Item, Price
+
+# 每次从数据库取回的行数；导出内存占用只与该值有关，与总行数无关
+EXPORT_BATCH = 1000
+
+PRICE_EXPORT_COLUMNS = (
+    "id", "market_hash_name", "platform", "platform_item_id", "item_id", "platform_id",
+    "sell_price", "bidding_price", "sell_count", "bidding_count",
+    "update_time", "update_time_text", "created_at",
+)
+
+_BEIJING = timezone(timedelta(hours=8))
+
+
+def parse_time_ms(raw: Optional[str]) -> Optional[int]:
+    """解析时间参数：毫秒/秒时间戳，或北京时间 'YYYY-MM-DD[ HH:MM[:SS]]'；空值返回 None。"""
+    v = (raw or "").strip()
+    if not v:
+        return None
+    if v.lstrip("-").isdigit():
+        n = int(v)
+        return n * 1000 if n < 1000000000000 else n
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d"):
+        try:
+            dt = datetime.strptime(v, fmt).replace(tzinfo=_BEIJING)
+            return int(dt.timestamp() * 1000)
+        except ValueError:
+            continue
+    raise ValueError(f"无法解析时间：{v}")
+
+
+def iter_items(get_session, build_query: Callable[[Any], Any]) -> Iterator[Dict[str, Any]]:
+    """按 id 顺序分批读取饰品（selectinload 平台），逐个产出 to_dict() 结果。"""
+    sess = get_session()
+    try:
+        query = build_query(sess.query(Item)).order_by(Item.id.asc()).options(selectinload(Item.platforms))
+        for it in query.yield_per(EXPORT_BATCH):
+            yield it.to_dict()
+    finally:
+        sess.close()
+
+
+def _flush(buf: io.StringIO) -> str:
+    out = buf.getvalue()
+    buf.seek(0)
+    buf.truncate(0)
+    return out
+
+
+def stream_base_csv(items: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """逐块输出目录 CSV（每个平台一行，无平台的饰品输出一行空平台）。"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["name", "marketHashName", "platform", "itemId"])
+    for item in items:
+        plats = item.get("platformList") or []
+        if not plats:
+            writer.writerow([item.get("name"), item.get("marketHashName"), "", ""])
+        for p in plats:
+            writer.writerow([item.get("name"), item.get("marketHashName"), p.get("name"), p.get("itemId")])
+        if buf.tell() >= 1 << 16:
+            yield _flush(buf)
+    yield _flush(buf)
+
+
+def stream_json_array(items: Iterable[Any]) -> Iterator[str]:
+    """逐个输出 JSON 数组元素，格式与 json.dump(list, indent=2) 相同。"""
+    first = True
+    for it in items:
+        body = json.dumps(it, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+        yield ("[\n  " if first else ",\n  ") + body
+        first = False
+    yield "[]" if first else "\n]"
+
+
+def iter_price_rows(get_session, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                    market_hash_name: Optional[str] = None, platforms: Optional[List[str]] = None) -> Iterator[Any]:
+    """按 id 顺序流式读取价格历史（update_time ∈ [start_ms, end_ms)），逐行产出 Row。"""
+    tbl = Price.__table__
+    stmt = select(*[tbl.c[c] for c in PRICE_EXPORT_COLUMNS]).order_by(tbl.c.id.asc())
+    if market_hash_name:
+        stmt = stmt.where(tbl.c.market_hash_name == market_hash_name)
+    if platforms:
+        stmt = stmt.where(tbl.c.platform.in_(platforms))
+    if start_ms is not None:
+        stmt = stmt.where(tbl.c.update_time >= start_ms)
+    if end_ms is not None:
+        stmt = stmt.where(tbl.c.update_time < end_ms)
+    sess = get_session()
+    try:
+        result = sess.execute(stmt.execution_options(yield_per=EXPORT_BATCH))
+        for partition in result.partitions():
+            yield from partition
+    finally:
+        sess.close()
+
+
+def _export_value(v):
+    return v.isoformat() if isinstance(v, datetime) else v
+
+
+def stream_prices_csv(rows: Iterable[Any]) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(PRICE_EXPORT_COLUMNS)
+    for r in rows:
+        writer.writerow([_export_value(v) for v in r])
+        if buf.tell() >= 1 << 16:
+            yield _flush(buf)
+    yield _flush(buf)
+
+
+def stream_prices_ndjson(rows: Iterable[Any]) -> Iterator[str]:
+    parts: List[str] = []
+    size = 0
+    for r in rows:
+        line = json.dumps(dict(zip(PRICE_EXPORT_COLUMNS, map(_export_value, r))), ensure_ascii=False) + "\n"
+        parts.append(line)
+        size += len(line)
+        if size >= 1 << 16:
+            yield "".join(parts)
+            parts, size = [], 0
+    if parts:
+        yield "".join(parts)
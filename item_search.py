@@ -0,0 +1,170 @@
+import base64
+import json
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Integer, column, false, select, text, tuple_
+
+from db import IS_SQLITE, Item, Platform, PlatformCode, canonical_platform
+
+# trigram 索引只能匹配长度 ≥ 3 的子串，更短的关键词退回 LIKE
+MIN_FTS_CHARS = 3
+
+_fts_ready: Optional[bool] = None
+
+
+def fts_available(sess) -> bool:
+    """items_fts 是否已建立（结果按进程缓存；迁移失败时为 False）。
+
+    PostgreSQL 没有 FTS5，始终为 False，关键词走 ILIKE（由 pg_trgm GIN 索引加速）。
+    """
+    global _fts_ready
+    if _fts_ready is None:
+        if not IS_SQLITE:
+            _fts_ready = False
+            return _fts_ready
+        row = sess.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'items_fts'")).first()
+        _fts_ready = row is not None
+    return _fts_ready
+
+
+def fts_phrase(q: str) -> str:
+    """把关键词转为 FTS5 短语（整体作为子串匹配，双引号转义）。"""
+    return '"' + q.replace('"', '""') + '"'
+
+
+def use_fts(sess, q: str) -> bool:
+    return len(q) >= MIN_FTS_CHARS and fts_available(sess)
+
+
+def keyword_filter(query, q: str):
+    """按关键词筛选 Item 查询：名称或 marketHashName 包含 q（不区分大小写）。"""
+    if not q:
+        return query
+    if use_fts(query.session, q):
+        matched = (
+            text("SELECT rowid FROM items_fts WHERE items_fts MATCH :fts_q")
+            .bindparams(fts_q=fts_phrase(q))
+            .columns(column("rowid", Integer))
+        )
+        return query.filter(Item.id.in_(matched))
+    like = f"%{q}%"
+    return query.filter((Item.name.ilike(like)) | (Item.market_hash_name.ilike(like)))
+
+
+def keyword_count(sess, q: str) -> Optional[int]:
+    """仅按关键词筛选时直接从索引计数；无法使用索引时返回 None，由调用方 count()。"""
+    if not q or not use_fts(sess, q):
+        return None
+    return sess.execute(
+        text("SELECT COUNT(*) FROM items_fts WHERE items_fts MATCH :fts_q"), {"fts_q": fts_phrase(q)}
+    ).scalar_one()
+
+
+def platform_code_ids(sess, aliases: Iterable[str]) -> List[int]:
+    """平台别名 → platform_codes 编码（按规范名查找，未知平台忽略）。"""
+    names = {canonical_platform(a) for a in aliases}
+    return [cid for (cid,) in sess.query(PlatformCode.id).filter(PlatformCode.name.in_(names))]
+
+
+def platform_filter(query, aliases: List[str]):
+    """只保留在任一别名平台上架的饰品（半连接，按 (code_id, item_id) 索引查找，不产生重复行）。"""
+    if not aliases:
+        return query
+    ids = platform_code_ids(query.session, aliases)
+    if not ids:
+        return query.filter(false())
+    return query.filter(Item.id.in_(select(Platform.item_id).where(Platform.code_id.in_(ids))))
+
+
+def min_price_page(query, order: str, after: Optional[list], offset: int, limit: int) -> List[Item]:
+    """按 items.min_sell_price 排序取一页（升序 / 降序，同价按 id 同向），无价条目按 id 升序排在最后。
+
+    有价与无价两段各按 (min_sell_price, id) 索引与主键顺序读取，翻页不必对全部候选排序。
+    after 为上一页末行的 [min_sell_price, id]；末行无价时价格为 None，直接从无价段继续。
+    """
+    priced = query.filter(Item.min_sell_price.isnot(None))
+    key = tuple_(Item.min_sell_price, Item.id)
+    if order == "desc":
+        priced = priced.order_by(Item.min_sell_price.desc(), Item.id.desc())
+    else:
+        priced = priced.order_by(Item.min_sell_price.asc(), Item.id.asc())
+    unpriced = query.filter(Item.min_sell_price.is_(None)).order_by(Item.id.asc())
+
+    rows: List[Item] = []
+    if after is not None and after[0] is None:
+        unpriced = unpriced.filter(Item.id > after[1])
+    else:
+        if after is not None:
+            priced = priced.filter(key < tuple(after) if order == "desc" else key > tuple(after))
+        rows = priced.offset(offset).limit(limit).all() if offset else priced.limit(limit).all()
+        if rows:
+            offset = 0
+        elif offset:
+            # 偏移越过了全部有价条目：余下的偏移落在无价段
+            offset = max(0, offset - priced.order_by(None).count())
+    if len(rows) < limit:
+        rest = unpriced.offset(offset) if offset else unpriced
+        rows += rest.limit(limit - len(rows)).all()
+    return rows
+
+
+def encode_cursor(sort_by: str, order: str, key: list) -> str:
+    """把上一页末行的排序键编码为不透明游标（排序方式一并写入，换排序后旧游标失效）。"""
+    raw = json.dumps({"s": sort_by, "o": order, "k": key}, separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, order: str) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw.decode("utf-8"))
+        key = data["k"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("cursor 无效") from None
+    if data.get("s") != sort_by or data.get("o") != order or not isinstance(key, list):
+        raise ValueError("cursor 与当前排序方式不一致，请从第一页重新查询")
+    return key
+
+
+class ItemTotalsCache:
+    """按筛选条件缓存列表总数；目录写入提交后调用 invalidate()，另有 TTL 兜底。
+
+    写入与计数并发时，计数开始前取得的版本号已过期则不写入缓存，避免缓存提交前的旧值。
+    """
+
+    def __init__(self, ttl_sec: float = 300.0, max_entries: int = 512):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._version = 0
+        self._entries: Dict[Tuple, Tuple[int, float, int]] = {}
+
+    def version(self) -> int:
+        with self._lock:
+            return self._version
+
+    def get(self, key: Tuple) -> Optional[int]:
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None:
+                return None
+            version, ts, total = hit
+            if version != self._version or time.monotonic() - ts > self.ttl_sec:
+                self._entries.pop(key, None)
+                return None
+            return total
+
+    def put(self, key: Tuple, version: int, total: int):
+        with self._lock:
+            if version != self._version:
+                return
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[key] = (version, time.monotonic(), total)
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
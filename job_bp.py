@@ -1,25 +1,104 @@
-from flask import Blueprint, jsonify, request
-
-from job_manager import PriceBatchJob, DualApiSequentialJob
+import json
+import logging
+import os
+import threading
+import time
+
+from flask import Blueprint, Response, jsonify, request
+
+from job_manager import PriceBatchJob, DualApiSequentialJob, MultiKeyParallelJob
+from retention import enable_incremental_vacuum, auto_vacuum_mode
+
+
+logger = logging.getLogger(__name__)
+
+# SSE 心跳间隔与单连接最长时长（到时由浏览器 EventSource 自动重连）
+SSE_HEARTBEAT_SEC = 15
+SSE_MAX_AGE_SEC = 600
+# 仅随时间变化的字段：不单独触发推送，但每次推送都携带，供页面本地倒计时
+_TICKING_KEYS = ("nextRunSeconds",)
+
+
+def status_event_stream(job):
+    """以 Server-Sent Events 推送任务状态：连接时发送完整状态，之后仅在状态变化时发送变化的字段。"""
+    yield "retry: 3000\n\n"
+    last: dict = {}
+    version = None
+    deadline = time.monotonic() + SSE_MAX_AGE_SEC
+    while time.monotonic() < deadline:
+        if version is None:
+            version = job.changes.version
+        else:
+            current = job.changes.wait(version, SSE_HEARTBEAT_SEC)
+            if current == version:
+                yield ": ping\n\n"
+                continue
+            version = current
+        data = job.status()
+        delta = {k: v for k, v in data.items() if k not in last or last[k] != v}
+        last = data
+        if not any(k not in _TICKING_KEYS for k in delta):
+            continue
+        delta.update({k: data[k] for k in _TICKING_KEYS if k in data})
+        yield f"event: status\ndata: {json.dumps(delta, ensure_ascii=False)}\n\n"
+
+
+def sse_response(job) -> Response:
+    return Response(
+        status_event_stream(job),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 def create_job_blueprint(client, get_session) -> Blueprint:
     job = PriceBatchJob(client=client, get_session=get_session)
     bp = Blueprint("job", __name__)
+    auto_resume = os.getenv("PRICE_JOB_AUTO_RESUME", "1").strip().lower() in ("1", "true", "yes")
+    resume_once = threading.Lock()
+
+    def _resume():
+        try:
+            job.resume_from_checkpoint()
+        except Exception:
+            # 错误已记入 job.last_error（status() 可见），此处留下完整堆栈
+            logger.exception("PriceBatchJob 续跑失败")
+
+    # 首个请求时续跑上次进程退出前未结束的运行（只尝试一次，避免调试模式 reloader 父进程也启动）；
+    # 预热 last-seen 与写运行记录放到后台线程，首个请求不必等待
+    @bp.before_app_request
+    def _resume_price_job():
+        if auto_resume and resume_once.acquire(blocking=False):
+            threading.Thread(target=_resume, name="PriceBatchJobResume", daemon=True).start()
 
     @bp.route("/api/admin/job/status", methods=["GET"])
     def job_status():
         return jsonify(job.status())
 
+    @bp.route("/api/admin/job/events", methods=["GET"])
+    def job_events():
+        return sse_response(job)
+
     @bp.route("/api/admin/job/start", methods=["POST"])
     def job_start():
         payload = request.get_json(silent=True) or {}
         start_id = payload.get("startId")
         batch_size = payload.get("batchSize")
         interval_sec = payload.get("intervalSec")
-        data = job.start(start_id, batch_size, interval_sec)
+        schedule_mode = payload.get("scheduleMode")
+        dedup = payload.get("dedup")
+        data = job.start(start_id, batch_size, interval_sec, schedule_mode, dedup)
         return jsonify(data)
 
+    # 运行历史（起止游标、耗时、写入行数、错误）
+    @bp.route("/api/admin/job/runs", methods=["GET"])
+    def job_runs():
+        try:
+            limit = max(1, min(int(request.args.get("limit", 20)), 200))
+        except ValueError:
+            return jsonify({"success": False, "error": "limit 必须为整数"}), 400
+        return jsonify({"success": True, "runs": job.runs.history(limit)})
+
     @bp.route("/api/admin/job/pause", methods=["POST"])
     def job_pause():
         return jsonify(job.pause())
@@ -43,13 +122,19 @@ def create_dual_job_blueprint(client1, client2, get_session) -> Blueprint:
     def dual_job_status():
         return jsonify(job.status())
 
+    @bp.route("/api/admin/dualjob/events", methods=["GET"])
+    def dual_job_events():
+        return sse_response(job)
+
     @bp.route("/api/admin/dualjob/start", methods=["POST"])
     def dual_job_start():
         payload = request.get_json(silent=True) or {}
         start_id = payload.get("startId")
         batch_size = payload.get("batchSize")
         interval_sec = payload.get("intervalSec")
-        data = job.start(start_id, batch_size, interval_sec)
+        schedule_mode = payload.get("scheduleMode")
+        dedup = payload.get("dedup")
+        data = job.start(start_id, batch_size, interval_sec, schedule_mode, dedup)
         return jsonify(data)
 
     @bp.route("/api/admin/dualjob/pause", methods=["POST"])
@@ -64,4 +149,64 @@ def create_dual_job_blueprint(client1, client2, get_session) -> Blueprint:
     def dual_job_stop():
         return jsonify(job.stop())
 
-    return bp
\ No newline at end of file
+    return bp
+
+
+def create_multi_job_blueprint(pool, get_session) -> Blueprint:
+    job = MultiKeyParallelJob(pool=pool, get_session=get_session)
+    bp = Blueprint("multijob", __name__)
+
+    @bp.route("/api/admin/multijob/status", methods=["GET"])
+    def multi_job_status():
+        return jsonify(job.status())
+
+    @bp.route("/api/admin/multijob/start", methods=["POST"])
+    def multi_job_start():
+        payload = request.get_json(silent=True) or {}
+        start_id = payload.get("startId")
+        batch_size = payload.get("batchSize")
+        dedup = payload.get("dedup")
+        data = job.start(start_id, batch_size, dedup)
+        return jsonify(data)
+
+    @bp.route("/api/admin/multijob/pause", methods=["POST"])
+    def multi_job_pause():
+        return jsonify(job.pause())
+
+    @bp.route("/api/admin/multijob/resume", methods=["POST"])
+    def multi_job_resume():
+        return jsonify(job.resume())
+
+    @bp.route("/api/admin/multijob/stop", methods=["POST"])
+    def multi_job_stop():
+        return jsonify(job.stop())
+
+    return bp
+
+
+def create_retention_blueprint(runner) -> Blueprint:
+    bp = Blueprint("retention", __name__)
+
+    @bp.route("/api/admin/retention/status", methods=["GET"])
+    def retention_status():
+        data = runner.status()
+        data["autoVacuum"] = auto_vacuum_mode()
+        return jsonify(data)
+
+    @bp.route("/api/admin/retention/run", methods=["POST"])
+    def retention_run():
+        return jsonify(runner.trigger())
+
+    @bp.route("/api/admin/retention/stop", methods=["POST"])
+    def retention_stop():
+        return jsonify(runner.stop())
+
+    @bp.route("/api/admin/retention/enable-incremental-vacuum", methods=["POST"])
+    def retention_enable_incremental_vacuum():
+        try:
+            enable_incremental_vacuum()
+            return jsonify({"success": True, "autoVacuum": auto_vacuum_mode()})
+        except Exception as e:
+            return jsonify({"success": False, "error": str(e)}), 500
+
+    return bp
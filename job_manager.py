@@ -1,47 +1,181 @@
 import threading
 import time
-from datetime import datetime, timezone, timedelta
-from typing import Optional, Tuple, List, Dict, Any
+from typing import Optional, Tuple, List, Dict, Any, Callable
 
-from sqlalchemy import func
-from db import SessionLocal, Item, Platform, Price
+from sqlalchemy import func, update
+from db import SessionLocal, Item, JobRun
+from price_ingest import ingest_price_rows, LastSeenCache
+from price_normalizer import normalize_price_response
+from write_queue import ingest_writer
 
+# 调度模式：fixed 每批完成后固定间隔；token 令牌桶有余量即触发下一批
+SCHEDULE_MODES = ("fixed", "token")
 
-def canonical_platform_name(name: str) -> str:
-    p = (name or "").strip().upper()
-    if p == "C5":
-        return "C5GAME"
-    if p == "HALO":
-        return "HALOSKINS"
-    return p
 
+def _normalize_schedule_mode(mode: Optional[str], default: str) -> str:
+    m = (mode or "").strip().lower()
+    return m if m in SCHEDULE_MODES else default
 
-def _to_float(x):
-    try:
-        return float(x)
-    except Exception:
-        return None
 
+def _write_batch(resp, last_seen: Optional[LastSeenCache],
+                 before_commit: Optional[Callable[[Any, Dict[str, int]], None]] = None) -> Dict[str, int]:
+    """整批写库（传入 last_seen 时仅写入变化行），返回 {"written", "skipped"}。
 
-def _to_int(x):
-    try:
-        return int(x)
-    except Exception:
-        return None
+    解析在调用线程完成，写入交给单写线程 ingest_writer，与其它任务的批次合并提交；提交后才返回。
+    before_commit(sess, counters) 在同一事务内执行（用于推进任务检查点）。
+    """
+    rows = normalize_price_response(resp)
+
+    def task(sess) -> Dict[str, int]:
+        # 合并事务回滚后会单独重跑，计数每次重新开始
+        counters = {"written": 0, "skipped": 0}
+        ingest_price_rows(sess, rows, last_seen=last_seen, counters=counters)
+        if before_commit is not None:
+            before_commit(sess, counters)
+        return counters
+
+    counters = ingest_writer.run(task)
+    if last_seen is not None:
+        last_seen.remember(rows)
+    return counters
 
 
-def _format_beijing_text(ms: Optional[int]) -> Optional[str]:
+def _warm_start(get_session, dedup: bool) -> Tuple[int, Optional[LastSeenCache]]:
+    """启动前读库：最大饰品 ID；变更写入模式下从最新快照预热 last-seen。
+
+    要扫整张 latest_prices，调用方须在 _lock 外调用，免得阻塞 status() 与 SSE。
+    """
+    sess = get_session()
     try:
-        if ms is None:
-            return None
-        dt = datetime.fromtimestamp(ms / 1000, tz=timezone(timedelta(hours=8)))
-        return dt.strftime('%Y-%m-%d %H:%M:%S')
-    except Exception:
-        return None
+        max_id = int(sess.query(func.max(Item.id)).scalar() or 0)
+        return max_id, (LastSeenCache.warm(sess) if dedup else None)
+    finally:
+        sess.close()
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class JobRunLedger:
+    """job_runs 表读写：开始 / 续跑 / 检查点 / 状态变更 / 历史。"""
+
+    UNFINISHED = ("running", "paused")
+
+    def __init__(self, get_session, job: str):
+        self.get_session = get_session
+        self.job = job
+        self._table = JobRun.__table__
+
+    def _update(self, run_id: int, **values):
+        values["updated_at"] = _now_ms()
+        stmt = update(self._table).where(self._table.c.id == run_id).values(**values)
+
+        def task(sess):
+            sess.execute(stmt)
+
+        ingest_writer.run(task)
+
+    def open(self, start_id: int, max_id: int, batch_size: int, interval_sec: int,
+             schedule_mode: str, dedup: bool) -> int:
+        """新建一条运行记录，并把此前未结束的记录标记为 stopped。"""
+        now = _now_ms()
+
+        def task(sess):
+            sess.execute(
+                update(self._table)
+                .where(self._table.c.job == self.job, self._table.c.status.in_(self.UNFINISHED))
+                .values(status="stopped", finished_at=now, updated_at=now)
+            )
+            run = JobRun(
+                job=self.job, status="running", start_id=start_id, next_start_id=start_id, max_id=max_id,
+                batch_size=batch_size, interval_sec=interval_sec, schedule_mode=schedule_mode, dedup=int(dedup),
+                started_at=now, updated_at=now,
+            )
+            sess.add(run)
+            sess.flush()
+            return run.id
+
+        return ingest_writer.run(task)
+
+    def reopen(self, run_id: int, max_id: int):
+        self._update(run_id, status="running", max_id=max_id, resumes=self._table.c.resumes + 1, finished_at=None)
+
+    def checkpoint(self, sess, run_id: int, next_start_id: int, counters: Optional[Dict[str, int]] = None):
+        """在调用方事务内推进游标并累计写入行数（不提交）。"""
+        counters = counters or {}
+        sess.execute(
+            update(self._table)
+            .where(self._table.c.id == run_id)
+            .values(
+                next_start_id=next_start_id,
+                batches=self._table.c.batches + 1,
+                rows_written=self._table.c.rows_written + counters.get("written", 0),
+                rows_skipped=self._table.c.rows_skipped + counters.get("skipped", 0),
+                updated_at=_now_ms(),
+            )
+        )
+
+    def checkpoint_now(self, run_id: int, next_start_id: int):
+        """区间内没有可抓取的饰品时单独推进游标。"""
+        ingest_writer.run(lambda sess: self.checkpoint(sess, run_id, next_start_id))
+
+    def set_status(self, run_id: int, status: str):
+        values: Dict[str, Any] = {"status": status}
+        if status not in self.UNFINISHED:
+            values["finished_at"] = _now_ms()
+        self._update(run_id, **values)
+
+    def record_error(self, run_id: int, error: str):
+        self._update(run_id, errors=self._table.c.errors + 1, last_error=error[:512])
+
+    def unfinished(self) -> Optional[Dict[str, Any]]:
+        """最近一条进程退出前未结束（running / paused）的运行记录。"""
+        sess = self.get_session()
+        try:
+            run = (
+                sess.query(JobRun)
+                .filter(JobRun.job == self.job, JobRun.status.in_(self.UNFINISHED))
+                .order_by(JobRun.id.desc())
+                .first()
+            )
+            return run.to_dict() if run else None
+        finally:
+            sess.close()
+
+    def history(self, limit: int = 20) -> List[Dict[str, Any]]:
+        sess = self.get_session()
+        try:
+            runs = sess.query(JobRun).filter(JobRun.job == self.job).order_by(JobRun.id.desc()).limit(limit).all()
+            return [r.to_dict() for r in runs]
+        finally:
+            sess.close()
+
+
+class StatusChanges:
+    """任务状态变更通知：状态变化处调用 bump()，订阅方（SSE）用 wait() 阻塞到下一次变化。"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.version = 0
+
+    def bump(self):
+        with self._cond:
+            self.version += 1
+            self._cond.notify_all()
+
+    def wait(self, since: int, timeout: float) -> int:
+        """等待版本号不同于 since（最多 timeout 秒），返回当前版本号。"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != since, timeout)
+            return self.version
 
 
 class PriceBatchJob:
-    """后台价格批量抓取任务：每分钟执行一次，每次处理固定数量的饰品。"""
+    """后台价格批量抓取任务：每分钟执行一次，每次处理固定数量的饰品。
+
+    每批价格与游标检查点（job_runs）在同一事务内提交；进程重启后可由 resume_from_checkpoint() 续跑。
+    """
 
     def __init__(self, client, get_session, batch_size: int = 100, interval_sec: int = 60):
         self.client = client
@@ -53,6 +187,12 @@ class PriceBatchJob:
         self._stop_event = threading.Event()
         self._pause_event = threading.Event()
         self._lock = threading.Lock()
+        # 串行化运行记录的状态写入（经写线程往返，不在 _lock 内进行）
+        self._status_write_lock = threading.Lock()
+        # 每次 start() 递增，用于识别启动过程中被 stop() 或重新 start() 取代的旧启动
+        self._generation = 0
+        # 状态变化（启动/暂停/继续/停止/批次完成/出错）时通知订阅方
+        self.changes = StatusChanges()
 
         # 状态字段
         self.running: bool = False
@@ -64,50 +204,129 @@ class PriceBatchJob:
         self.interval_sec: int = self.default_interval
         self.last_processed_range: Optional[Tuple[int, int]] = None
         self.next_run_ts: Optional[float] = None
+        self.schedule_mode: str = "fixed"
+        self.dedup: bool = True
+        self.rows_written: int = 0
+        self.rows_skipped: int = 0
+        self._last_seen: Optional[LastSeenCache] = None
+        self.last_error: Optional[str] = None
+        self.run_id: Optional[int] = None
+        self.runs = JobRunLedger(get_session, "price_batch")
 
     # 公开控制方法
-    def start(self, start_id: Optional[int] = None, batch_size: Optional[int] = None, interval_sec: Optional[int] = None) -> Dict[str, Any]:
-        with self._lock:
-            if self.running:
-                return self.status()
-            self._stop_event.clear()
-            self._pause_event.clear()
-            self.paused = False
-            self.running = True
-            self.batch_size = max(1, int(batch_size or self.default_batch_size))
-            self.interval_sec = max(1, int(interval_sec or self.default_interval))
+    def start(self, start_id: Optional[int] = None, batch_size: Optional[int] = None, interval_sec: Optional[int] = None,
+              schedule_mode: Optional[str] = None, dedup: Optional[bool] = None,
+              run_id: Optional[int] = None, paused: bool = False) -> Dict[str, Any]:
+        """启动任务；传入 run_id 时续跑该运行记录（游标与累计行数沿用记录中的值）。
 
-            # 计算最大ID
-            sess = self.get_session()
-            try:
-                self.max_id = int(sess.query(func.max(Item.id)).scalar() or 0)
-            finally:
-                sess.close()
+        paused=True 时工作线程以暂停状态启动，不会先跑一批再停下。
 
-            self.current_start_id = int(start_id or 1)
-            self.completed_count = max(0, self.current_start_id - 1)
-            self.last_processed_range = None
-            self.next_run_ts = None
+        _lock 内只改内存状态；读库预热与运行记录写入（经写线程往返）在锁外进行，不阻塞 status() 与 SSE。
+        """
+        with self._lock:
+            already = self.running
+            if not already:
+                self._claim_start(start_id, batch_size, interval_sec, schedule_mode, dedup, paused)
+            gen = self._generation
+            params = (self.current_start_id, self.batch_size, self.interval_sec, self.schedule_mode, self.dedup)
+        if already:
+            return self.status()
+        first_id, size, interval, mode, dedup_on = params
 
-            self._thread = threading.Thread(target=self._loop, name="PriceBatchJob", daemon=True)
-            self._thread.start()
+        try:
+            max_id, last_seen = _warm_start(self.get_session, dedup_on)
+            with self._status_write_lock:
+                if run_id is None:
+                    run_id = self.runs.open(first_id, max_id, size, interval, mode, dedup_on)
+                else:
+                    self.runs.reopen(run_id, max_id)
+        except Exception:
+            with self._lock:
+                if gen == self._generation:
+                    self.running = False
+            self.changes.bump()
+            raise
+
+        with self._lock:
+            # 启动过程中被 stop()（或已被之后的 start() 取代）时放弃本次启动
+            abandoned = gen != self._generation or self._stop_event.is_set()
+            if not abandoned:
+                self.max_id = max_id
+                self._last_seen = last_seen
+                self.run_id = run_id
+                self._thread = threading.Thread(target=self._loop, name="PriceBatchJob", daemon=True)
+                self._thread.start()
+        if abandoned:
+            self._write_status(run_id, "stopped")
+        elif self.paused:
+            # 以暂停状态启动，或启动过程中被 pause()：此前还没有运行记录可写
+            self._sync_status()
+        self.changes.bump()
         return self.status()
 
+    def _claim_start(self, start_id, batch_size, interval_sec, schedule_mode, dedup, paused=False):
+        """在 _lock 内调用：置为运行中并重置本次运行的内存状态。"""
+        self._generation += 1
+        self._stop_event.clear()
+        if paused:
+            self._pause_event.set()
+        else:
+            self._pause_event.clear()
+        self.paused = bool(paused)
+        self.running = True
+        self.batch_size = max(1, int(batch_size or self.default_batch_size))
+        self.interval_sec = max(1, int(interval_sec or self.default_interval))
+        self.schedule_mode = _normalize_schedule_mode(schedule_mode, "fixed")
+        self.dedup = True if dedup is None else bool(dedup)
+        self.rows_written = 0
+        self.rows_skipped = 0
+        self.current_start_id = int(start_id or 1)
+        self.completed_count = max(0, self.current_start_id - 1)
+        self.last_processed_range = None
+        self.next_run_ts = None
+        self.last_error = None
+        self.run_id = None
+
+    def _write_status(self, run_id: int, status: str):
+        with self._status_write_lock:
+            self.runs.set_status(run_id, status)
+
+    def _sync_status(self):
+        """把当前的暂停 / 运行状态写入运行记录（在锁外调用）。
+
+        写入串行化，且在写锁内读取最新状态，先后两次切换的写入不会乱序覆盖。
+        """
+        with self._status_write_lock:
+            with self._lock:
+                run_id, active = self.run_id, self.running
+                status = "paused" if self.paused else "running"
+            if run_id is not None and active:
+                self.runs.set_status(run_id, status)
+
     def pause(self) -> Dict[str, Any]:
         with self._lock:
-            if self.running and not self.paused:
+            changed = self.running and not self.paused
+            if changed:
                 self.paused = True
                 self._pause_event.set()
+        if changed:
+            self._sync_status()
+        self.changes.bump()
         return self.status()
 
     def resume(self) -> Dict[str, Any]:
         with self._lock:
-            if self.running and self.paused:
+            changed = self.running and self.paused
+            if changed:
                 self.paused = False
                 self._pause_event.clear()
+        if changed:
+            self._sync_status()
+        self.changes.bump()
         return self.status()
 
-    def stop(self) -> Dict[str, Any]:
+    def stop(self, outcome: str = "stopped") -> Dict[str, Any]:
+        """停止任务；outcome 为写入运行记录的最终状态（手动停止 stopped，跑完 completed）。"""
         with self._lock:
             if self.running:
                 self._stop_event.set()
@@ -115,7 +334,7 @@ class PriceBatchJob:
         t = None
         with self._lock:
             t = self._thread
-        if t and t.is_alive():
+        if t and t.is_alive() and t is not threading.current_thread():
             try:
                 t.join(timeout=2.0)
             except Exception:
@@ -125,6 +344,10 @@ class PriceBatchJob:
             self.paused = False
             self._thread = None
             self.next_run_ts = None
+            run_id, self.run_id = self.run_id, None
+        if run_id is not None:
+            self._write_status(run_id, outcome)
+        self.changes.bump()
         return self.status()
 
     # 主循环
@@ -140,19 +363,28 @@ class PriceBatchJob:
             # 执行一次区间
             try:
                 self._run_one_range()
-            except Exception:
-                # 忽略单次异常，继续下一轮
-                pass
+                self.last_error = None
+            except Exception as e:
+                # 记录错误但继续下一轮
+                self.last_error = str(e)
+                if self.run_id is not None:
+                    self.runs.record_error(self.run_id, self.last_error)
 
             # 完成后检查是否结束
             with self._lock:
                 done = self.completed_count >= self.max_id
                 self.next_run_ts = time.time() + self.interval_sec
+            self.changes.bump()
             if done:
                 # 自动停止
-                self.stop()
+                self.stop("completed")
                 break
 
+            if self.schedule_mode == "token" and self.client.limited("price_batch"):
+                # 令牌桶调度：有可用令牌立即触发下一批（批量接口未配置限频时按固定间隔）
+                self._wait_for_token()
+                continue
+
             # 间隔等待
             remain = self.interval_sec
             while remain > 0 and not self._stop_event.is_set():
@@ -161,10 +393,21 @@ class PriceBatchJob:
                 time.sleep(0.2)
                 remain -= 0.2
 
+    def _wait_for_token(self):
+        """等待批量接口令牌可用（不消耗），期间响应停止与暂停。"""
+        while not self._stop_event.is_set() and not self.paused:
+            wait = self.client.wait_time("price_batch")
+            with self._lock:
+                self.next_run_ts = time.time() + wait
+            if wait <= 0:
+                return
+            self._stop_event.wait(min(wait, 0.2))
+
     def _run_one_range(self):
         with self._lock:
             start_id = self.current_start_id
             end_id = min(self.max_id, start_id + self.batch_size - 1)
+            run_id = self.run_id
 
         if start_id > end_id or start_id <= 0:
             return
@@ -184,6 +427,8 @@ class PriceBatchJob:
             sess.close()
 
         if not names:
+            if run_id is not None:
+                self.runs.checkpoint_now(run_id, end_id + 1)
             with self._lock:
                 self.last_processed_range = (start_id, end_id)
                 self.completed_count = end_id
@@ -193,78 +438,37 @@ class PriceBatchJob:
         # 调用批量接口
         resp = self.client.get_price_batch(names)
 
-        # 写入数据库
-        sess2 = self.get_session()
-        try:
-            data_list: List[Dict[str, Any]] = []
-            if isinstance(resp, dict):
-                if isinstance(resp.get("data"), list):
-                    data_list = resp.get("data")
-                elif isinstance(resp.get("items"), list):
-                    data_list = resp.get("items")
-                elif isinstance(resp.get("results"), list):
-                    data_list = resp.get("results")
-            elif isinstance(resp, list):
-                data_list = resp
-
-            for it in (data_list or []):
-                mhn = (it.get("marketHashName") or it.get("market_hash_name") or "").strip()
-                if not mhn:
-                    continue
-                plats = it.get("platforms") or it.get("platformList") or it.get("dataList") or []
-                if isinstance(plats, dict):
-                    plats = [plats]
-                # item 映射（若存在）
-                item_rec = sess2.query(Item).filter(Item.market_hash_name == mhn).one_or_none()
-                item_id_val = item_rec.id if item_rec else None
-                for p in plats:
-                    plat_name_raw = (p.get("platform") or p.get("name") or p.get("plat") or "")
-                    plat_name = canonical_platform_name(plat_name_raw)
-                    pid = (p.get("itemId") or p.get("platformItemId") or p.get("platform_item_id") or None)
-                    sell = _to_float(p.get("sell_price") or p.get("sellPrice") or p.get("sell") or p.get("price"))
-                    buy = _to_float(p.get("bidding_price") or p.get("biddingPrice") or p.get("buy") or p.get("buy_price"))
-                    sell_count = _to_int(p.get("sell_count") or p.get("sellCount"))
-                    bidding_count = _to_int(p.get("bidding_count") or p.get("biddingCount"))
-                    ut = p.get("update_time") or p.get("updateTime")
-                    ut_int = _to_int(ut) if ut is not None else None
-                    # 统一为毫秒时间戳：若为秒（10位）则乘以 1000
-                    if ut_int is not None and ut_int < 1000000000000:
-                        ut_int = ut_int * 1000
-
-                    plat_id_val = None
-                    if item_id_val:
-                        plat_rec = (
-                            sess2.query(Platform)
-                            .filter(Platform.item_id == item_id_val, Platform.name == plat_name)
-                            .one_or_none()
-                        )
-                        plat_id_val = plat_rec.id if plat_rec else None
-
-                    row = Price(
-                        market_hash_name=mhn,
-                        platform=plat_name,
-                        platform_item_id=str(pid) if pid is not None else None,
-                        item_id=item_id_val,
-                        platform_id=plat_id_val,
-                        sell_price=sell,
-                        bidding_price=buy,
-                        sell_count=sell_count,
-                        bidding_count=bidding_count,
-                        update_time=ut_int,
-                        update_time_text=_format_beijing_text(ut_int),
-                    )
-                    sess2.add(row)
-            sess2.commit()
-        except Exception:
-            sess2.rollback()
-            raise
-        finally:
-            sess2.close()
+        # 写入数据库：整批解析 ID 后单条 INSERT 写入（变更写入模式跳过未变化的行），检查点随同一事务提交
+        checkpoint = None
+        if run_id is not None:
+            checkpoint = lambda sess, c: self.runs.checkpoint(sess, run_id, end_id + 1, c)
+        counters = _write_batch(resp, self._last_seen, checkpoint)
 
         with self._lock:
             self.last_processed_range = (start_id, end_id)
             self.completed_count = end_id
             self.current_start_id = end_id + 1
+            self.rows_written += counters["written"]
+            self.rows_skipped += counters["skipped"]
+
+    def resume_from_checkpoint(self) -> Optional[Dict[str, Any]]:
+        """续跑上次进程退出前未结束的运行（从检查点游标继续，原为暂停的恢复为暂停）。
+
+        失败时记入 last_error 供 status() 展示，并继续抛出。
+        """
+        if self.running:
+            return None
+        try:
+            run = self.runs.unfinished()
+            if run is None:
+                return None
+            return self.start(run["nextStartId"], run["batchSize"], run["intervalSec"], run["scheduleMode"],
+                              run["dedup"], run_id=run["id"], paused=run["status"] == "paused")
+        except Exception as e:
+            with self._lock:
+                self.last_error = f"续跑失败：{e}"
+            self.changes.bump()
+            raise
 
     def status(self) -> Dict[str, Any]:
         with self._lock:
@@ -287,6 +491,12 @@ class PriceBatchJob:
                 "nextRunSeconds": next_sec,
                 "intervalSec": self.interval_sec,
                 "batchSize": self.batch_size,
+                "scheduleMode": self.schedule_mode,
+                "dedup": self.dedup,
+                "rowsWritten": self.rows_written,
+                "rowsSkipped": self.rows_skipped,
+                "lastError": self.last_error,
+                "runId": self.run_id,
             }
 
 
@@ -304,6 +514,8 @@ class DualApiSequentialJob:
         self._stop_event = threading.Event()
         self._pause_event = threading.Event()
         self._lock = threading.Lock()
+        # 状态变化（启动/暂停/继续/停止/批次完成/出错）时通知订阅方
+        self.changes = StatusChanges()
 
         # 状态字段
         self.running: bool = False
@@ -315,50 +527,66 @@ class DualApiSequentialJob:
         self.interval_sec: int = self.default_interval
         self.last_processed_range: Optional[Tuple[int, int]] = None
         self.next_run_ts: Optional[float] = None
+        self.schedule_mode: str = "fixed"
+        self.dedup: bool = True
+        self.rows_written: int = 0
+        self.rows_skipped: int = 0
+        self._last_seen: Optional[LastSeenCache] = None
         self.next_client_id: int = 1  # 1 或 2
         self.last_error: Optional[str] = None
 
     # 公开控制方法
-    def start(self, start_id: Optional[int] = None, batch_size: Optional[int] = None, interval_sec: Optional[int] = None) -> Dict[str, Any]:
-        with self._lock:
-            if self.running:
-                return self.status()
-            # 检查两把 key
-            if not (self.client1 and getattr(self.client1, "api_key", None)):
-                return {"running": False, "paused": False, "error": "未配置 STEAMDT_API_KEY_1"}
-            if not (self.client2 and getattr(self.client2, "api_key", None)):
-                return {"running": False, "paused": False, "error": "未配置 STEAMDT_API_KEY_2"}
-
-            self._stop_event.clear()
-            self._pause_event.clear()
-            self.paused = False
-            self.running = True
-            self.batch_size = max(1, int(batch_size or self.default_batch_size))
-            self.interval_sec = max(1, int(interval_sec or self.default_interval))
-
-            # 计算最大ID
-            sess = self.get_session()
-            try:
-                self.max_id = int(sess.query(func.max(Item.id)).scalar() or 0)
-            finally:
-                sess.close()
+    def start(self, start_id: Optional[int] = None, batch_size: Optional[int] = None, interval_sec: Optional[int] = None,
+              schedule_mode: Optional[str] = None, dedup: Optional[bool] = None) -> Dict[str, Any]:
+        """启动任务；读库预热在取 _lock 前完成，不阻塞 status() 与 SSE。"""
+        if self.running:
+            return self.status()
+        # 检查两把 key
+        if not (self.client1 and getattr(self.client1, "api_key", None)):
+            return {"running": False, "paused": False, "error": "未配置 STEAMDT_API_KEY_1"}
+        if not (self.client2 and getattr(self.client2, "api_key", None)):
+            return {"running": False, "paused": False, "error": "未配置 STEAMDT_API_KEY_2"}
+        max_id, last_seen = _warm_start(self.get_session, True if dedup is None else bool(dedup))
 
-            self.current_start_id = int(start_id or 1)
-            self.completed_count = max(0, self.current_start_id - 1)
-            self.last_processed_range = None
-            self.next_run_ts = None
-            self.next_client_id = 1
-            self.last_error = None
-
-            self._thread = threading.Thread(target=self._loop, name="DualApiSequentialJob", daemon=True)
-            self._thread.start()
+        with self._lock:
+            # 预热期间已被另一次 start() 抢先启动
+            already = self.running
+            if not already:
+                self._claim_start(start_id, batch_size, interval_sec, schedule_mode, dedup, max_id, last_seen)
+        if not already:
+            self.changes.bump()
         return self.status()
 
+    def _claim_start(self, start_id, batch_size, interval_sec, schedule_mode, dedup, max_id, last_seen):
+        """在 _lock 内调用：重置本次运行的内存状态并启动工作线程。"""
+        self._stop_event.clear()
+        self._pause_event.clear()
+        self.paused = False
+        self.running = True
+        self.batch_size = max(1, int(batch_size or self.default_batch_size))
+        self.interval_sec = max(1, int(interval_sec or self.default_interval))
+        self.schedule_mode = _normalize_schedule_mode(schedule_mode, "fixed")
+        self.dedup = True if dedup is None else bool(dedup)
+        self.rows_written = 0
+        self.rows_skipped = 0
+        self.max_id = max_id
+        self._last_seen = last_seen
+        self.current_start_id = int(start_id or 1)
+        self.completed_count = max(0, self.current_start_id - 1)
+        self.last_processed_range = None
+        self.next_run_ts = None
+        self.next_client_id = 1
+        self.last_error = None
+
+        self._thread = threading.Thread(target=self._loop, name="DualApiSequentialJob", daemon=True)
+        self._thread.start()
+
     def pause(self) -> Dict[str, Any]:
         with self._lock:
             if self.running and not self.paused:
                 self.paused = True
                 self._pause_event.set()
+        self.changes.bump()
         return self.status()
 
     def resume(self) -> Dict[str, Any]:
@@ -366,6 +594,7 @@ class DualApiSequentialJob:
             if self.running and self.paused:
                 self.paused = False
                 self._pause_event.clear()
+        self.changes.bump()
         return self.status()
 
     def stop(self) -> Dict[str, Any]:
@@ -386,6 +615,7 @@ class DualApiSequentialJob:
             self.paused = False
             self._thread = None
             self.next_run_ts = None
+        self.changes.bump()
         return self.status()
 
     # 主循环
@@ -410,11 +640,19 @@ class DualApiSequentialJob:
             with self._lock:
                 done = self.completed_count >= self.max_id
                 self.next_run_ts = time.time() + self.interval_sec
+            self.changes.bump()
             if done:
                 # 自动停止
                 self.stop()
                 break
 
+            if self.schedule_mode == "token" and (
+                self.client1.limited("price_batch") or self.client2.limited("price_batch")
+            ):
+                # 令牌桶调度：有可用令牌立即触发下一批（批量接口未配置限频时按固定间隔）
+                self._wait_for_token()
+                continue
+
             # 间隔等待
             remain = self.interval_sec
             while remain > 0 and not self._stop_event.is_set():
@@ -423,6 +661,24 @@ class DualApiSequentialJob:
                 time.sleep(0.2)
                 remain -= 0.2
 
+    def _wait_for_token(self):
+        """等待任一客户端的批量接口令牌可用，并切换到等待更短的一方。"""
+        while not self._stop_event.is_set() and not self.paused:
+            waits = {
+                1: self.client1.wait_time("price_batch"),
+                2: self.client2.wait_time("price_batch"),
+            }
+            with self._lock:
+                cid = self.next_client_id
+                other = 2 if cid == 1 else 1
+                if waits[other] < waits[cid]:
+                    cid = other
+                self.next_client_id = cid
+                self.next_run_ts = time.time() + waits[cid]
+            if waits[cid] <= 0:
+                return
+            self._stop_event.wait(min(waits[cid], 0.2))
+
     def _run_one_range(self):
         with self._lock:
             start_id = self.current_start_id
@@ -463,72 +719,8 @@ class DualApiSequentialJob:
         cli = self.client1 if client_id == 1 else self.client2
         resp = cli.get_price_batch(names)
 
-        # 写入数据库（与 PriceBatchJob 保持一致逻辑）
-        sess2 = self.get_session()
-        try:
-            data_list: List[Dict[str, Any]] = []
-            if isinstance(resp, dict):
-                if isinstance(resp.get("data"), list):
-                    data_list = resp.get("data")
-                elif isinstance(resp.get("items"), list):
-                    data_list = resp.get("items")
-                elif isinstance(resp.get("results"), list):
-                    data_list = resp.get("results")
-            elif isinstance(resp, list):
-                data_list = resp
-
-            for it in (data_list or []):
-                mhn = (it.get("marketHashName") or it.get("market_hash_name") or "").strip()
-                if not mhn:
-                    continue
-                plats = it.get("platforms") or it.get("platformList") or it.get("dataList") or []
-                if isinstance(plats, dict):
-                    plats = [plats]
-                # item 映射（若存在）
-                item_rec = sess2.query(Item).filter(Item.market_hash_name == mhn).one_or_none()
-                item_id_val = item_rec.id if item_rec else None
-                for p in plats:
-                    plat_name_raw = (p.get("platform") or p.get("name") or p.get("plat") or "")
-                    plat_name = canonical_platform_name(plat_name_raw)
-                    pid = (p.get("itemId") or p.get("platformItemId") or p.get("platform_item_id") or None)
-                    sell = _to_float(p.get("sell_price") or p.get("sellPrice") or p.get("sell") or p.get("price"))
-                    buy = _to_float(p.get("bidding_price") or p.get("biddingPrice") or p.get("buy") or p.get("buy_price"))
-                    sell_count = _to_int(p.get("sell_count") or p.get("sellCount"))
-                    bidding_count = _to_int(p.get("bidding_count") or p.get("biddingCount"))
-                    ut = p.get("update_time") or p.get("updateTime")
-                    ut_int = _to_int(ut) if ut is not None else None
-                    if ut_int is not None and ut_int < 1000000000000:
-                        ut_int = ut_int * 1000
-
-                    plat_id_val = None
-                    if item_id_val:
-                        plat_rec = (
-                            sess2.query(Platform)
-                            .filter(Platform.item_id == item_id_val, Platform.name == plat_name)
-                            .one_or_none()
-                        )
-                        plat_id_val = plat_rec.id if plat_rec else None
-
-                    row = Price(
-                        market_hash_name=mhn,
-                        platform=plat_name,
-                        platform_item_id=str(pid) if pid is not None else None,
-                        item_id=item_id_val,
-                        platform_id=plat_id_val,
-                        sell_price=sell,
-                        bidding_price=buy,
-                        sell_count=sell_count,
-                        bidding_count=bidding_count,
-                        update_time=ut_int,
-                        update_time_text=_format_beijing_text(ut_int),
-                    )
-                    sess2.add(row)
-            sess2.commit()
-        except Exception:
-            sess2.rollback()
-            raise
-        finally:
-            sess2.close()
+        # 写入数据库：整批解析 ID 后单条 INSERT 写入（变更写入模式跳过未变化的行）
+        counters = _write_batch(resp, self._last_seen)
 
         # 更新状态：交替客户端与游标推进
         with self._lock:
@@ -536,6 +728,8 @@ class DualApiSequentialJob:
             self.completed_count = end_id
             self.current_start_id = end_id + 1
             self.next_client_id = 2 if client_id == 1 else 1
+            self.rows_written += counters["written"]
+            self.rows_skipped += counters["skipped"]
 
     def status(self) -> Dict[str, Any]:
         with self._lock:
@@ -558,7 +752,292 @@ class DualApiSequentialJob:
                 "nextRunSeconds": next_sec,
                 "intervalSec": self.interval_sec,
                 "batchSize": self.batch_size,
+                "scheduleMode": self.schedule_mode,
+                "dedup": self.dedup,
+                "rowsWritten": self.rows_written,
+                "rowsSkipped": self.rows_skipped,
                 "nextClientId": self.next_client_id,
                 "alternating": True,
                 "lastError": self.last_error,
-            }
\ No newline at end of file
+            }
+
+class MultiKeyParallelJob:
+    """多 key 并行批量抓取任务：KeyPool 中每把 key 一个工作线程，
+    各自受自身令牌桶限频，从共享游标领取 ID 区间并发抓取写库。"""
+
+    MAX_ATTEMPTS = 3           # 单个区间最多尝试次数
+    UNHEALTHY_AFTER = 3        # 连续失败次数达到后标记为不健康
+    MAX_COOLDOWN_SEC = 300     # 失败退避上限
+    UNLIMITED_PACE_SEC = 60    # 批量接口未配置限频时每把 key 的批次间隔（同 PriceBatchJob 默认节奏）
+
+    def __init__(self, pool, get_session, batch_size: int = 100):
+        self.pool = pool
+        self.get_session = get_session
+        self.default_batch_size = max(1, int(batch_size))
+
+        self._threads: List[threading.Thread] = []
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+        # 状态字段
+        self.running: bool = False
+        self.paused: bool = False
+        self.max_id: int = 0
+        self.completed_count: int = 0
+        self.current_start_id: int = 0
+        self.batch_size: int = self.default_batch_size
+        self.last_processed_range: Optional[Tuple[int, int]] = None
+        self.started_ts: Optional[float] = None
+        self._retry: List[Tuple[int, int, int]] = []   # (start, end, attempts)
+        self._in_flight: int = 0
+        self._alive_workers: int = 0
+        self.failed_ranges: List[Tuple[int, int]] = []
+        self.key_stats: List[Dict[str, Any]] = []
+        self.dedup: bool = True
+        self._last_seen: Optional[LastSeenCache] = None
+
+    # 公开控制方法
+    def start(self, start_id: Optional[int] = None, batch_size: Optional[int] = None,
+              dedup: Optional[bool] = None) -> Dict[str, Any]:
+        """启动任务；读库预热（last-seen 各 key 共用）在取 _lock 前完成，不阻塞 status()。"""
+        if self.running:
+            return self.status()
+        if len(self.pool) == 0:
+            return {"running": False, "paused": False, "error": "未配置 STEAMDT_API_KEY_1..N"}
+        max_id, last_seen = _warm_start(self.get_session, True if dedup is None else bool(dedup))
+
+        with self._lock:
+            # 预热期间已被另一次 start() 抢先启动
+            if self.running:
+                return self._status_locked()
+            self._stop_event.clear()
+            self.paused = False
+            self.running = True
+            self.batch_size = max(1, int(batch_size or self.default_batch_size))
+            self.dedup = True if dedup is None else bool(dedup)
+            self.max_id = max_id
+            self._last_seen = last_seen
+            self.current_start_id = int(start_id or 1)
+            self.completed_count = max(0, self.current_start_id - 1)
+            self.last_processed_range = None
+            self.started_ts = time.time()
+            self._retry = []
+            self._in_flight = 0
+            self.failed_ranges = []
+            self.key_stats = [
+                {
+                    "index": i + 1,
+                    "key": self.pool.mask(cli.api_key),
+                    "healthy": True,
+                    "batches": 0,
+                    "items": 0,
+                    "rows": 0,
+                    "skipped": 0,
+                    "errors": 0,
+                    "consecutiveErrors": 0,
+                    "lastError": None,
+                    "lastLatencyMs": None,
+                    "cooldownUntil": None,
+                }
+                for i, cli in enumerate(self.pool)
+            ]
+            self._threads = []
+            self._alive_workers = len(self.pool)
+            for i, cli in enumerate(self.pool):
+                t = threading.Thread(target=self._worker, args=(i, cli), name=f"MultiKeyParallelJob-{i + 1}", daemon=True)
+                self._threads.append(t)
+                t.start()
+            return self._status_locked()
+
+    def pause(self) -> Dict[str, Any]:
+        with self._lock:
+            if self.running and not self.paused:
+                self.paused = True
+        return self.status()
+
+    def resume(self) -> Dict[str, Any]:
+        with self._lock:
+            if self.running and self.paused:
+                self.paused = False
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        self._stop_event.set()
+        with self._lock:
+            threads = list(self._threads)
+        for t in threads:
+            if t.is_alive() and t is not threading.current_thread():
+                try:
+                    t.join(timeout=2.0)
+                except Exception:
+                    pass
+        with self._lock:
+            self.running = False
+            self.paused = False
+            self._threads = []
+        return self.status()
+
+    # 区间分发
+    def _claim_range(self) -> Optional[Tuple[int, int, int]]:
+        """领取下一个区间：优先重试队列；全部分发完且无在途任务时返回 None。"""
+        with self._lock:
+            if self._retry:
+                rng = self._retry.pop(0)
+            elif self.current_start_id <= self.max_id:
+                start_id = self.current_start_id
+                end_id = min(self.max_id, start_id + self.batch_size - 1)
+                self.current_start_id = end_id + 1
+                rng = (start_id, end_id, 0)
+            else:
+                return None
+            self._in_flight += 1
+            return rng
+
+    def _finish_range(self, start_id: int, end_id: int):
+        with self._lock:
+            self._in_flight -= 1
+            self.completed_count += end_id - start_id + 1
+            self.last_processed_range = (start_id, end_id)
+
+    def _has_pending(self) -> bool:
+        with self._lock:
+            return bool(self._retry) or self._in_flight > 0
+
+    # 工作线程
+    def _worker(self, idx: int, client):
+        stats = self.key_stats[idx]
+        next_at = 0.0
+        try:
+            while not self._stop_event.is_set():
+                if self.paused:
+                    self._stop_event.wait(0.2)
+                    continue
+                # 失败退避
+                cooldown = stats["cooldownUntil"]
+                if cooldown and cooldown > time.time():
+                    self._stop_event.wait(min(cooldown - time.time(), 0.2))
+                    continue
+                # 按本 key 的配额等待令牌；批量接口未配置限频时每批之间至少间隔 UNLIMITED_PACE_SEC
+                wait = client.wait_time("price_batch") if client.limited("price_batch") else next_at - time.time()
+                if wait > 0:
+                    self._stop_event.wait(min(wait, 0.2))
+                    continue
+
+                rng = self._claim_range()
+                if rng is None:
+                    if self._has_pending():
+                        # 其他 key 的在途区间可能失败回队，稍后再领
+                        self._stop_event.wait(0.2)
+                        continue
+                    break
+                start_id, end_id, attempts = rng
+                t0 = time.time()
+                next_at = t0 + self.UNLIMITED_PACE_SEC
+                try:
+                    n_items, n_rows, n_skipped = self._process_range(client, start_id, end_id)
+                except Exception as e:
+                    with self._lock:
+                        self._in_flight -= 1
+                        stats["errors"] += 1
+                        stats["consecutiveErrors"] += 1
+                        stats["lastError"] = str(e)
+                        stats["healthy"] = stats["consecutiveErrors"] < self.UNHEALTHY_AFTER
+                        backoff = min(self.MAX_COOLDOWN_SEC, 5 * (2 ** (stats["consecutiveErrors"] - 1)))
+                        stats["cooldownUntil"] = time.time() + backoff
+                        if attempts + 1 < self.MAX_ATTEMPTS:
+                            self._retry.append((start_id, end_id, attempts + 1))
+                        else:
+                            self.failed_ranges.append((start_id, end_id))
+                            self.completed_count += end_id - start_id + 1
+                    continue
+                with self._lock:
+                    stats["batches"] += 1
+                    stats["items"] += n_items
+                    stats["rows"] += n_rows
+                    stats["skipped"] += n_skipped
+                    stats["consecutiveErrors"] = 0
+                    stats["healthy"] = True
+                    stats["cooldownUntil"] = None
+                    stats["lastLatencyMs"] = int((time.time() - t0) * 1000)
+                self._finish_range(start_id, end_id)
+        finally:
+            with self._lock:
+                self._alive_workers -= 1
+                last = self._alive_workers <= 0
+                if last:
+                    # 所有工作线程退出：自动结束
+                    self.running = False
+                    self.paused = False
+
+    def _process_range(self, client, start_id: int, end_id: int) -> Tuple[int, int, int]:
+        sess = self.get_session()
+        try:
+            names: List[str] = [
+                mhn for (mhn,) in (
+                    sess.query(Item.market_hash_name)
+                    .filter(Item.id >= start_id, Item.id <= end_id)
+                    .order_by(Item.id.asc())
+                    .all()
+                ) if mhn
+            ]
+        finally:
+            sess.close()
+        if not names:
+            return 0, 0, 0
+
+        resp = client.get_price_batch(names)
+        counters = _write_batch(resp, self._last_seen)
+        return len(names), counters["written"], counters["skipped"]
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._status_locked()
+
+    def _status_locked(self) -> Dict[str, Any]:
+        percent = 0
+        if self.max_id > 0:
+            percent = min(100, int((self.completed_count / self.max_id) * 100))
+        elapsed_min = ((time.time() - self.started_ts) / 60.0) if self.started_ts else 0
+        keys = []
+        total_items = 0
+        total_rows = 0
+        total_skipped = 0
+        for s in self.key_stats:
+            total_items += s["items"]
+            total_rows += s["rows"]
+            total_skipped += s["skipped"]
+            cooldown = s["cooldownUntil"]
+            keys.append({
+                "index": s["index"],
+                "key": s["key"],
+                "healthy": s["healthy"],
+                "batches": s["batches"],
+                "items": s["items"],
+                "rows": s["rows"],
+                "skipped": s["skipped"],
+                "errors": s["errors"],
+                "lastError": s["lastError"],
+                "lastLatencyMs": s["lastLatencyMs"],
+                "cooldownSeconds": max(0, int(cooldown - time.time())) if cooldown else 0,
+                "itemsPerMin": round(s["items"] / elapsed_min, 1) if elapsed_min > 0 else 0,
+            })
+        return {
+            "running": self.running,
+            "paused": self.paused,
+            "state": ("paused" if self.paused else ("running" if self.running else "idle")),
+            "maxId": self.max_id,
+            "completedCount": self.completed_count,
+            "percent": percent,
+            "currentStartId": self.current_start_id,
+            "lastProcessedRange": self.last_processed_range,
+            "batchSize": self.batch_size,
+            "keyCount": len(self.key_stats),
+            "inFlight": self._in_flight,
+            "retryQueue": len(self._retry),
+            "failedRanges": list(self.failed_ranges),
+            "dedup": self.dedup,
+            "rowsWritten": total_rows,
+            "rowsSkipped": total_skipped,
+            "itemsPerMin": round(total_items / elapsed_min, 1) if elapsed_min > 0 else 0,
+            "keys": keys,
+        }
@@ -0,0 +1,195 @@
+import codecs
+import json
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+# 与 price_normalizer.extract_items 一致的条目数组键
+ITEM_LIST_KEYS: Tuple[str, ...] = ("data", "items", "results")
+# 根对象本身是单个条目时的标识键
+SINGLE_ITEM_KEYS: Tuple[str, ...] = ("marketHashName", "market_hash_name")
+
+_WS = " \t\r\n"
+_NUM_CHARS = "0123456789+-.eE"
+
+
+class JSONStreamError(ValueError):
+    """流式解析遇到格式错误或意外结束。"""
+
+
+class _Reader:
+    """增量读取 JSON 文本：缓冲区只保留未消费的部分，单个值用 raw_decode 解析。"""
+
+    def __init__(self, fp, chunk_size: int = 1 << 16):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._json = json.JSONDecoder()
+
+    def _fill(self, min_size: int = 0) -> bool:
+        """再读入一块（至少 min_size 字符）；已到末尾返回 False。"""
+        if self.eof:
+            return False
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        target = len(self.buf) + max(1, min_size)
+        while len(self.buf) < target:
+            data = self.fp.read(max(self.chunk_size, min_size))
+            if not data:
+                self.buf += self._decoder.decode(b"", final=True)
+                self.eof = True
+                break
+            self.buf += self._decoder.decode(data) if isinstance(data, bytes) else data
+        return True
+
+    def peek(self) -> str:
+        """跳过空白，返回下一个字符（末尾返回空串）。"""
+        while True:
+            buf, pos, n = self.buf, self.pos, len(self.buf)
+            while pos < n and buf[pos] in _WS:
+                pos += 1
+            self.pos = pos
+            if pos < n:
+                return buf[pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch: str):
+        c = self.peek()
+        if c != ch:
+            raise JSONStreamError(f"JSON 格式不正确：期望 {ch!r}，实际 {c or 'EOF'!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """读取一个完整的 JSON 值；缓冲区不足时按倍数扩大读入量后重试。"""
+        self.peek()
+        grow = self.chunk_size
+        while True:
+            try:
+                val, end = self._json.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise JSONStreamError(f"JSON 格式不正确：{e.msg}") from None
+                self._fill(grow)
+                grow *= 2
+                continue
+            # 数字可能恰好被缓冲区截断（如 "1." / "1.5e"）：需在缓冲区内看到分隔符才算完整
+            if not self.eof and not isinstance(val, (dict, list, str)):
+                buf, i, n = self.buf, end, len(self.buf)
+                while i < n and buf[i] in _NUM_CHARS:
+                    i += 1
+                if i >= n:
+                    self._fill()
+                    continue
+            self.pos = end
+            return val
+
+    def array(self) -> Iterator[None]:
+        """逐个定位数组元素：每次 yield 时读取位置位于元素开头，调用方须消费该元素。"""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield None
+            c = self.peek()
+            self.pos += 1
+            if c == "]":
+                return
+            if c != ",":
+                raise JSONStreamError(f"JSON 格式不正确：数组中出现 {c or 'EOF'!r}")
+
+    def object(self) -> Iterator[str]:
+        """逐个定位对象成员：yield 键名，此时读取位置位于值开头，调用方须消费该值。"""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise JSONStreamError("JSON 格式不正确：对象键必须是字符串")
+            self.expect(":")
+            yield key
+            c = self.peek()
+            self.pos += 1
+            if c == "}":
+                return
+            if c != ",":
+                raise JSONStreamError(f"JSON 格式不正确：对象中出现 {c or 'EOF'!r}")
+
+
+def iter_json_items(fp, list_keys: Tuple[str, ...] = ITEM_LIST_KEYS, nested_key: str = "responses") -> Iterator[Any]:
+    """从文件或请求流中逐条产出条目，内存占用与单个条目大小相关，与总大小无关。
+
+    支持与 extract_items 相同的形态：根数组；根对象的 data/items/results 数组；
+    { responses: [{ data: [...] }, ...] } 聚合结构；以及单条目对象（原样产出）。
+    根对象中只取第一个出现的条目来源，其余来源跳过。
+    """
+    r = _Reader(fp)
+    c = r.peek()
+    if c == "[":
+        for _ in r.array():
+            yield r.value()
+        return
+    if c != "{":
+        raise JSONStreamError("JSON 格式不正确，应为对象或数组")
+
+    found = False
+    rest: Dict[str, Any] = {}
+    for key in r.object():
+        if not found and key in list_keys and r.peek() == "[":
+            for _ in r.array():
+                found = True
+                yield r.value()
+        elif not found and key == nested_key and r.peek() == "[":
+            for _ in r.array():
+                if r.peek() != "{":
+                    r.value()
+                    continue
+                taken = False
+                for k2 in r.object():
+                    if not taken and k2 in list_keys and r.peek() == "[":
+                        taken = True
+                        for _ in r.array():
+                            found = True
+                            yield r.value()
+                    else:
+                        r.value()
+        else:
+            val = r.value()
+            if not found:
+                rest[key] = val
+    if not found and any(k in rest for k in SINGLE_ITEM_KEYS):
+        # 没有条目数组，根对象本身就是单个条目
+        yield rest
+
+
+def iter_chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """按固定大小分块。"""
+    chunk: List[Any] = []
+    for it in items:
+        chunk.append(it)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def spool_stream(fp, max_memory: int = 8 << 20, chunk_size: int = 1 << 16):
+    """把请求体等一次性流复制到临时文件（小于 max_memory 时留在内存），返回已回到开头的文件对象。
+
+    用于在请求线程内先收完上传内容，再把解析和写库交给写线程。
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    while True:
+        data = fp.read(chunk_size)
+        if not data:
+            break
+        spool.write(data)
+    spool.seek(0)
+    return spool
@@ -0,0 +1,207 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+# 批量接口响应中条目的名称键（与 price_normalizer 一致）
+_NAME_KEYS = ("marketHashName", "market_hash_name")
+# 批量在途请求失败（上游返回失败或结构无法识别）时交给等待者的标记，区别于“上游未返回该名称”的 None
+_FAILED = object()
+
+
+def _item_name(it: Any) -> Optional[str]:
+    if not isinstance(it, dict):
+        return None
+    for k in _NAME_KEYS:
+        v = it.get(k)
+        if v:
+            return str(v).strip()
+    return None
+
+
+class PriceCache:
+    """/api/price/* 代理的 LRU + TTL 缓存，按 (接口, marketHashName) 为键。
+
+    并发的相同请求只触发一次上游调用（single-flight）：后到者等待先到者的 Future。
+    只缓存 success 为真的结果；上游报错或返回失败时不缓存，单条查询的等待者拿到同样的结果或异常，
+    批量查询的等待者则以自己的 loader 重查受影响的名称。
+    """
+
+    def __init__(self, ttl_sec: float = 60.0, max_entries: int = 5000):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "PriceCache":
+        return cls(
+            ttl_sec=float(os.getenv("PRICE_CACHE_TTL_SEC", "60")),
+            max_entries=int(os.getenv("PRICE_CACHE_MAX_ENTRIES", "5000")),
+        )
+
+    # 以下 _locked 方法须在持有 _lock 时调用
+    def _get_locked(self, key: Hashable) -> Tuple[bool, Any]:
+        hit = self._entries.get(key)
+        if hit is None:
+            return False, None
+        expires, value = hit
+        if expires < time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _put_locked(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl_sec, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    @staticmethod
+    def _batch_items(resp: Any, wanted) -> Tuple[bool, Dict[str, Any]]:
+        """解析批量响应：返回 (是否成功, {名称: 条目})，只取 wanted 中的名称。"""
+        data = resp.get("data") if isinstance(resp, dict) else None
+        ok = bool(isinstance(resp, dict) and resp.get("success")) and isinstance(data, list)
+        values = {}
+        if ok:
+            for it in data:
+                n = _item_name(it)
+                if n is not None and n in wanted:
+                    values[n] = it
+        return ok, values
+
+    def _finish(self, flights: Dict[Hashable, Future], values: Dict[Hashable, Any], cacheable: bool,
+                error: Optional[BaseException] = None):
+        """登记结果并唤醒等待者；values 中没有的键以 None 结束。"""
+        with self._lock:
+            for key in flights:
+                self._inflight.pop(key, None)
+                if error is None and cacheable and values.get(key) is not None:
+                    self._put_locked(key, values[key])
+        for key, fut in flights.items():
+            if error is not None:
+                fut.set_exception(error)
+            else:
+                fut.set_result(values.get(key))
+
+    def get(self, endpoint: str, name: str, loader: Callable[[], Any]) -> Any:
+        """单条查询：命中直接返回；已有相同请求在途时等待其结果；否则调用 loader()。"""
+        key = (endpoint, name)
+        with self._lock:
+            found, value = self._get_locked(key)
+            if found:
+                self.hits += 1
+                return value
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                self.upstream_calls += 1
+                mine = Future()
+                self._inflight[key] = mine
+        if fut is not None:
+            return fut.result()
+        try:
+            value = loader()
+        except BaseException as e:
+            self._finish({key: mine}, {}, False, e)
+            raise
+        self._finish({key: mine}, {key: value}, bool(isinstance(value, dict) and value.get("success")))
+        return value
+
+    def get_batch(self, endpoint: str, names: List[str], loader: Callable[[List[str]], Any]) -> Any:
+        """批量查询：命中的名称本地返回，在途的等待，其余去重后合并为一次 loader(misses) 上游调用。
+
+        上游响应形如 {"success": true, "data": [条目...]}，按条目名称逐个缓存；
+        返回与上游相同的结构，data 按请求顺序排列（上游未返回的名称不出现）。
+        等待的在途请求失败时，那些名称再用本次的 loader 重查一次，失败不会带进无关的批次。
+        """
+        ordered = list(dict.fromkeys(n for n in names if n))
+        items: Dict[str, Any] = {}
+        waiting: Dict[str, Future] = {}
+        flights: Dict[Hashable, Future] = {}
+        with self._lock:
+            for n in ordered:
+                key = (endpoint, n)
+                found, value = self._get_locked(key)
+                if found:
+                    self.hits += 1
+                    items[n] = value
+                elif key in self._inflight:
+                    self.coalesced += 1
+                    waiting[n] = self._inflight[key]
+                else:
+                    self.misses += 1
+                    flights[key] = self._inflight[key] = Future()
+            if flights:
+                self.upstream_calls += 1
+
+        resp = None
+        if flights:
+            misses = [n for (_, n) in flights]
+            try:
+                resp = loader(misses)
+            except BaseException as e:
+                self._finish(flights, {}, False, e)
+                raise
+            ok, values = self._batch_items(resp, {n for (_, n) in flights})
+            if ok:
+                self._finish(flights, {(endpoint, n): v for n, v in values.items()}, True)
+            else:
+                self._finish(flights, dict.fromkeys(flights, _FAILED), False)
+                # 上游失败或结构无法识别：原样返回，不拼接缓存结果
+                return resp
+            items.update(values)
+        retry = []
+        for n, fut in waiting.items():
+            try:
+                value = fut.result()
+            except Exception:
+                value = _FAILED
+            if value is _FAILED:
+                retry.append(n)
+            elif value is not None:
+                items[n] = value
+        if retry:
+            # 等待的在途请求失败：这些名称改用本次的 loader 重查（成功的照常缓存），而不是静默丢弃或抛出别人的异常
+            with self._lock:
+                self.upstream_calls += 1
+            retry_resp = loader(retry)
+            ok, values = self._batch_items(retry_resp, set(retry))
+            if not ok:
+                return retry_resp
+            with self._lock:
+                for n, v in values.items():
+                    self._put_locked((endpoint, n), v)
+            items.update(values)
+
+        out = dict(resp) if isinstance(resp, dict) else {"success": True}
+        out["data"] = [items[n] for n in ordered if n in items]
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "ttlSec": self.ttl_sec,
+                "inflight": len(self._inflight),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "upstreamCalls": self.upstream_calls,
+                "evictions": self.evictions,
+                "hitRate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0,
+            }
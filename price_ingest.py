@@ -0,0 +1,500 @@
+import csv
+import io
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from sqlalchemy import BigInteger, Float, insert, func, case, or_, text, table, column, select, literal_column
+from db import (
+    Item, Platform, Price, LatestPrice, PriceRollupHourly, PriceRollupDaily,
+    DIALECT, HOUR_MS, DAY_MS, DAY_OFFSET_MS, hour_bucket, day_bucket, dialect_insert, epoch_ms_sql,
+    refresh_item_min_sell, refresh_item_min_sell_for,
+)
+from price_normalizer import PriceRow, normalize_price_response, _format_beijing_text
+
+
+def resolve_ids(sess, rows: List[PriceRow]) -> List[Dict[str, Any]]:
+    """一次性解析整批行的 item_id 与 platform_id（两条 IN 查询），返回 Price 行字典。"""
+    mhns = list({r.market_hash_name for r in rows})
+    item_map: Dict[str, int] = {}
+    if mhns:
+        item_map = dict(
+            sess.query(Item.market_hash_name, Item.id)
+            .filter(Item.market_hash_name.in_(mhns))
+            .all()
+        )
+    plat_map: Dict[tuple, int] = {}
+    if item_map:
+        plat_rows = (
+            sess.query(Platform.item_id, Platform.name, Platform.id)
+            .filter(Platform.item_id.in_(list(item_map.values())))
+            .all()
+        )
+        plat_map = {(iid, name): pid for iid, name, pid in plat_rows}
+
+    out: List[Dict[str, Any]] = []
+    for r in rows:
+        item_id_val = item_map.get(r.market_hash_name)
+        out.append({
+            "market_hash_name": r.market_hash_name,
+            "platform": r.platform,
+            "platform_item_id": r.platform_item_id,
+            "item_id": item_id_val,
+            "platform_id": plat_map.get((item_id_val, r.platform)) if item_id_val else None,
+            "sell_price": r.sell_price,
+            "bidding_price": r.bidding_price,
+            "sell_count": r.sell_count,
+            "bidding_count": r.bidding_count,
+            "update_time": r.update_time,
+            "update_time_text": _format_beijing_text(r.update_time),
+        })
+    return out
+
+
+def insert_price_rows(sess, rows: List[Dict[str, Any]]) -> int:
+    """以单条 Core INSERT（executemany）写入价格行，返回写入行数。"""
+    if not rows:
+        return 0
+    sess.execute(insert(Price.__table__), rows)
+    return len(rows)
+
+
+# 快照表随 upsert 覆盖的列
+_LATEST_COLUMNS = (
+    "platform_item_id", "item_id", "platform_id", "sell_price", "bidding_price",
+    "sell_count", "bidding_count", "update_time", "update_time_text",
+)
+
+
+def upsert_latest_prices(sess, rows: List[Dict[str, Any]], force: bool = False) -> int:
+    """将整批行 upsert 到 latest_prices（每个 饰品 × 平台 一行）。
+
+    默认仅当新行的 update_time 不早于快照时覆盖（与按 update_time 倒序取最新一致）；
+    force=True 时无条件覆盖（用于覆盖式导入）。随后重算本批饰品的 items.min_sell_price。
+    """
+    if not rows:
+        return 0
+    # 同批内按 (marketHashName, 平台) 去重，保留 update_time 最大者（相同则后者）
+    latest: Dict[tuple, Dict[str, Any]] = {}
+    for r in rows:
+        key = (r["market_hash_name"], r["platform"])
+        prev = latest.get(key)
+        if force or prev is None or (r["update_time"] or -1) >= (prev["update_time"] or -1):
+            latest[key] = r
+    values = [
+        {"market_hash_name": mhn, "platform": plat, **{c: r[c] for c in _LATEST_COLUMNS}}
+        for (mhn, plat), r in latest.items()
+    ]
+    tbl = LatestPrice.__table__
+    stmt = dialect_insert(tbl)
+    set_ = {c: stmt.excluded[c] for c in _LATEST_COLUMNS}
+    set_["created_at"] = func.now()
+    where = None
+    if not force:
+        where = func.coalesce(stmt.excluded.update_time, -1) >= func.coalesce(tbl.c.update_time, -1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[tbl.c.market_hash_name, tbl.c.platform],
+        set_=set_,
+        where=where,
+    )
+    sess.execute(stmt, values)
+    refresh_item_min_sell_for(sess, [mhn for mhn, _ in latest])
+    return len(values)
+
+
+def _merge_min(col, new):
+    return case((or_(col.is_(None), new < col), new), else_=col)
+
+
+def _merge_max(col, new):
+    return case((or_(col.is_(None), new > col), new), else_=col)
+
+
+def _acc(acc: Dict[str, Any], prefix: str, v: Optional[float]):
+    if v is None:
+        return
+    acc[prefix + "_sum"] += v
+    acc[prefix + "_samples"] += 1
+    mn, mx = acc[prefix + "_min"], acc[prefix + "_max"]
+    acc[prefix + "_min"] = v if mn is None or v < mn else mn
+    acc[prefix + "_max"] = v if mx is None or v > mx else mx
+
+
+def _rollup_upsert(model, stmt):
+    """为汇总表 INSERT 加上按 (名称, 平台, 桶) 冲突时累加 sum/samples、合并 min/max 的子句。"""
+    tbl = model.__table__
+    ex = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[tbl.c.market_hash_name, tbl.c.platform, tbl.c.bucket_start],
+        set_={
+            "sell_sum": tbl.c.sell_sum + ex.sell_sum,
+            "sell_samples": tbl.c.sell_samples + ex.sell_samples,
+            "sell_min": _merge_min(tbl.c.sell_min, ex.sell_min),
+            "sell_max": _merge_max(tbl.c.sell_max, ex.sell_max),
+            "bidding_sum": tbl.c.bidding_sum + ex.bidding_sum,
+            "bidding_samples": tbl.c.bidding_samples + ex.bidding_samples,
+            "bidding_min": _merge_min(tbl.c.bidding_min, ex.bidding_min),
+            "bidding_max": _merge_max(tbl.c.bidding_max, ex.bidding_max),
+        },
+    )
+
+
+def rollup_price_rows(sess, rows: List[Dict[str, Any]], now_ms: Optional[int] = None) -> int:
+    """将整批行累加到小时/日汇总表（按 update_time 归桶，缺失时取当前时间），返回涉及的桶数。"""
+    if not rows:
+        return 0
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    total = 0
+    for model, bucket_fn in ((PriceRollupHourly, hour_bucket), (PriceRollupDaily, day_bucket)):
+        groups: Dict[tuple, Dict[str, Any]] = {}
+        for r in rows:
+            if r["sell_price"] is None and r["bidding_price"] is None:
+                continue
+            ts = r["update_time"] if r["update_time"] is not None else now_ms
+            key = (r["market_hash_name"], r["platform"], bucket_fn(ts))
+            acc = groups.get(key)
+            if acc is None:
+                acc = groups[key] = {
+                    "market_hash_name": key[0], "platform": key[1], "bucket_start": key[2],
+                    "sell_sum": 0.0, "sell_samples": 0, "sell_min": None, "sell_max": None,
+                    "bidding_sum": 0.0, "bidding_samples": 0, "bidding_min": None, "bidding_max": None,
+                }
+            _acc(acc, "sell", r["sell_price"])
+            _acc(acc, "bidding", r["bidding_price"])
+        if not groups:
+            continue
+        sess.execute(_rollup_upsert(model, dialect_insert(model.__table__)), list(groups.values()))
+        total += len(groups)
+    return total
+
+
+class LastSeenCache:
+    """(marketHashName, 平台) -> 最近一次写入的 (在售价, 求购价, 在售数, 求购数, update_time)。
+
+    任务启动时从 latest_prices 预热，用于变更写入：
+    - 四个值与 update_time 均未变化：重复抓取，整行跳过；
+    - 值未变但 update_time 前进：不追加 prices 行，仅推进快照时间并计入汇总；
+    - 其余：正常写入。
+    多个工作线程可共用同一实例。
+    """
+
+    def __init__(self, entries: Optional[Dict[tuple, tuple]] = None):
+        self._map: Dict[tuple, tuple] = dict(entries or {})
+        self._lock = threading.Lock()
+
+    @classmethod
+    def warm(cls, sess) -> "LastSeenCache":
+        q = sess.query(
+            LatestPrice.market_hash_name, LatestPrice.platform,
+            LatestPrice.sell_price, LatestPrice.bidding_price,
+            LatestPrice.sell_count, LatestPrice.bidding_count, LatestPrice.update_time,
+        )
+        return cls({(r[0], r[1]): tuple(r[2:]) for r in q.yield_per(5000)})
+
+    def __len__(self) -> int:
+        return len(self._map)
+
+    def split(self, rows: List[PriceRow]) -> Tuple[List[PriceRow], List[PriceRow], int]:
+        """返回 (需写入 prices 的行, 仅推进快照的行, 重复跳过的行数)。"""
+        fresh: List[PriceRow] = []
+        coalesced: List[PriceRow] = []
+        dup = 0
+        with self._lock:
+            get = self._map.get
+            for r in rows:
+                prev = get((r.market_hash_name, r.platform))
+                if prev is None or prev[:4] != (r.sell_price, r.bidding_price, r.sell_count, r.bidding_count):
+                    fresh.append(r)
+                elif r.update_time is not None and (prev[4] is None or r.update_time > prev[4]):
+                    coalesced.append(r)
+                else:
+                    dup += 1
+        return fresh, coalesced, dup
+
+    def remember(self, rows: List[PriceRow]):
+        """事务提交后调用：以本批行刷新记录（回滚时不调用，下次会重新写入）。"""
+        with self._lock:
+            for r in rows:
+                key = (r.market_hash_name, r.platform)
+                prev = self._map.get(key)
+                if prev is not None and r.update_time is not None and prev[4] is not None and r.update_time < prev[4]:
+                    continue
+                self._map[key] = (r.sell_price, r.bidding_price, r.sell_count, r.bidding_count, r.update_time)
+
+
+def ingest_price_rows(sess, rows: List[PriceRow], last_seen: Optional[LastSeenCache] = None,
+                      counters: Optional[Dict[str, int]] = None) -> int:
+    """整批写入已归一化的价格行，并同步最新快照与小时/日汇总，返回写入 prices 的行数；由调用方提交事务。
+
+    传入 last_seen 时仅写入有变化的行（见 LastSeenCache），提交成功后需由调用方 last_seen.remember(rows)。
+    counters 累加 written / skipped。
+    """
+    if not rows:
+        return 0
+    if last_seen is not None:
+        fresh, coalesced, dup = last_seen.split(rows)
+    else:
+        fresh, coalesced, dup = rows, [], 0
+    written = 0
+    if fresh or coalesced:
+        resolved = resolve_ids(sess, fresh + coalesced)
+        written = insert_price_rows(sess, resolved[:len(fresh)])
+        upsert_latest_prices(sess, resolved)
+        rollup_price_rows(sess, resolved)
+    if counters is not None:
+        counters["written"] = counters.get("written", 0) + written
+        counters["skipped"] = counters.get("skipped", 0) + len(coalesced) + dup
+    return written
+
+
+def ingest_price_response(sess, resp) -> int:
+    """解析一次批量接口响应并整批写入 prices，返回写入行数；由调用方提交事务。"""
+    return ingest_price_rows(sess, normalize_price_response(resp))
+
+
+# 覆盖式导入暂存表的列（与 PriceRow 一致，另加 update_time_text）
+_STAGE_COLUMNS = (
+    "market_hash_name", "platform", "platform_item_id", "sell_price", "bidding_price",
+    "sell_count", "bidding_count", "update_time", "update_time_text",
+)
+
+
+def copy_rows(sess, table: str, columns, values: List[Dict[str, Any]]):
+    """PostgreSQL：以 COPY FROM STDIN 把行写入 table（在会话当前事务内），兼容 psycopg2 与 psycopg 3。"""
+    raw = sess.connection().connection.driver_connection
+    cols = ", ".join(columns)
+    cur = raw.cursor()
+    try:
+        if hasattr(cur, "copy_expert"):
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            for v in values:
+                writer.writerow(["\\N" if v[c] is None else v[c] for c in columns])
+            buf.seek(0)
+            cur.copy_expert(f"COPY {table} ({cols}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buf)
+        else:
+            with cur.copy(f"COPY {table} ({cols}) FROM STDIN") as copy:
+                for v in values:
+                    copy.write_row([v[c] for c in columns])
+    finally:
+        cur.close()
+
+
+class StagedPriceImport:
+    """覆盖式价格导入：整份数据先分块写入临时表，apply() 再以集合语句完成全部写入。
+
+    1) 按名称联接 items 解析 item_id；对有 itemId 的新平台批量补建 platforms 记录并解析 platform_id；
+    2) 删除旧价格：解析到平台的按 (item_id, platform_id)，否则按 (marketHashName, 平台)；
+       被删的行先记入第二张临时表，从小时/日汇总表中扣除它们的贡献；
+    3) 一条 INSERT ... SELECT 写入 prices，另一条 upsert 无条件覆盖 latest_prices（同键以后出现者为准），
+       并重算涉及饰品的 items.min_sell_price；
+    4) 按桶分组累加到小时/日汇总表（与 rollup_price_rows 口径一致），再按 prices 重算受影响桶的最值。
+    全部在调用方事务内执行，由调用方提交。PostgreSQL 上临时表以 COPY 装载。
+    """
+
+    TABLE = "_price_import"
+    # 被覆盖的旧价格行（扣减汇总用）
+    OLD_TABLE = "_price_import_old"
+    # 临时表列类型：SQLite 的 INTEGER PRIMARY KEY 即自增行号；PostgreSQL 需 BIGSERIAL / DOUBLE PRECISION / BIGINT
+    _TYPES = {
+        "sqlite": {"seq": "INTEGER PRIMARY KEY", "real": "REAL", "bigint": "INTEGER"},
+        "postgresql": {"seq": "BIGSERIAL PRIMARY KEY", "real": "DOUBLE PRECISION", "bigint": "BIGINT"},
+    }
+
+    def __init__(self, sess):
+        self.sess = sess
+        self.staged = 0
+        cols = ", ".join(_STAGE_COLUMNS)
+        self._insert_sql = text(
+            f"INSERT INTO {self.TABLE} ({cols}) VALUES ({', '.join(':' + c for c in _STAGE_COLUMNS)})"
+        )
+        ty = self._TYPES.get(DIALECT, self._TYPES["sqlite"])
+        sess.execute(text(f"DROP TABLE IF EXISTS {self.TABLE}"))
+        sess.execute(text(
+            f"""
+            CREATE TEMP TABLE {self.TABLE} (
+                seq {ty["seq"]},
+                market_hash_name TEXT NOT NULL, platform TEXT NOT NULL, platform_item_id TEXT,
+                sell_price {ty["real"]}, bidding_price {ty["real"]}, sell_count INTEGER, bidding_count INTEGER,
+                update_time {ty["bigint"]}, update_time_text TEXT,
+                item_id INTEGER, platform_id INTEGER
+            )
+            """
+        ))
+
+    def stage(self, rows: List[PriceRow]) -> int:
+        if not rows:
+            return 0
+        values = [{**r._asdict(), "update_time_text": _format_beijing_text(r.update_time)} for r in rows]
+        if DIALECT == "postgresql":
+            copy_rows(self.sess, self.TABLE, _STAGE_COLUMNS, values)
+        else:
+            self.sess.execute(self._insert_sql, values)
+        self.staged += len(values)
+        return len(values)
+
+    def apply(self) -> Dict[str, int]:
+        """执行替换，返回 {"overwritten", "inserted", "platforms_created", "rollup_buckets"}。"""
+        sess, t = self.sess, self.TABLE
+        out = {"overwritten": 0, "inserted": 0, "platforms_created": 0, "rollup_buckets": 0}
+        if not self.staged:
+            sess.execute(text(f"DROP TABLE {t}"))
+            return out
+        sess.execute(text(
+            f"UPDATE {t} SET item_id = items.id FROM items WHERE items.market_hash_name = {t}.market_hash_name"
+        ))
+        # 同一 饰品 × 平台 取最先出现的 itemId；已存在的平台记录不改动
+        out["platforms_created"] = sess.execute(text(
+            f"""
+            INSERT INTO platforms (item_id, name, platform_item_id)
+            SELECT item_id, platform, platform_item_id FROM {t}
+            WHERE item_id IS NOT NULL AND COALESCE(platform_item_id, '') <> ''
+            ORDER BY seq
+            ON CONFLICT DO NOTHING
+            """
+        )).rowcount or 0
+        sess.execute(text(
+            f"""
+            UPDATE {t} SET platform_id = platforms.id FROM platforms
+            WHERE platforms.item_id = {t}.item_id AND platforms.name = {t}.platform
+            """
+        ))
+        old = self.OLD_TABLE
+        sess.execute(text(f"DROP TABLE IF EXISTS {old}"))
+        sess.execute(text(
+            f"""
+            CREATE TEMP TABLE {old} AS
+            SELECT id, market_hash_name, platform, sell_price, bidding_price,
+                   COALESCE(update_time, {epoch_ms_sql("created_at")}) AS ts
+            FROM prices WHERE (item_id, platform_id) IN (
+                SELECT item_id, platform_id FROM {t} WHERE platform_id IS NOT NULL
+            )
+            UNION
+            SELECT id, market_hash_name, platform, sell_price, bidding_price,
+                   COALESCE(update_time, {epoch_ms_sql("created_at")}) AS ts
+            FROM prices WHERE (market_hash_name, platform) IN (
+                SELECT market_hash_name, platform FROM {t} WHERE platform_id IS NULL
+            )
+            """
+        ))
+        out["overwritten"] = sess.execute(text(
+            f"DELETE FROM prices WHERE id IN (SELECT id FROM {old})"
+        )).rowcount or 0
+        cols = ", ".join(_STAGE_COLUMNS + ("item_id", "platform_id"))
+        out["inserted"] = sess.execute(text(
+            f"INSERT INTO prices ({cols}) SELECT {cols} FROM {t} ORDER BY seq"
+        )).rowcount or 0
+        # 同键只取最后出现的一行（PostgreSQL 不允许同一条 upsert 两次更新同一行）
+        updates = ", ".join(f"{c} = excluded.{c}" for c in _LATEST_COLUMNS)
+        sess.execute(text(
+            f"""
+            INSERT INTO latest_prices ({cols}) SELECT {cols} FROM {t}
+            WHERE seq IN (SELECT MAX(seq) FROM {t} GROUP BY market_hash_name, platform)
+            ON CONFLICT (market_hash_name, platform) DO UPDATE SET {updates}, created_at = CURRENT_TIMESTAMP
+            """
+        ))
+        refresh_item_min_sell(sess, f"market_hash_name IN (SELECT market_hash_name FROM {t})")
+        self._unroll()
+        out["rollup_buckets"] = self._rollup()
+        self._refresh_extremes()
+        sess.execute(text(f"DROP TABLE {t}"))
+        sess.execute(text(f"DROP TABLE {old}"))
+        return out
+
+    # 汇总表及其桶宽、以 ts 列（毫秒）表示的分桶表达式（与 hour_bucket / day_bucket 相同）
+    _ROLLUP_BUCKETS = (
+        ("price_rollups_hourly", HOUR_MS, f"(ts / {HOUR_MS}) * {HOUR_MS}"),
+        ("price_rollups_daily", DAY_MS, f"((ts + {DAY_OFFSET_MS}) / {DAY_MS}) * {DAY_MS} - {DAY_OFFSET_MS}"),
+    )
+
+    def _unroll(self):
+        """从汇总表扣除被覆盖旧行的 sum / samples（旧行无 update_time 时按 created_at 归桶）。"""
+        old = self.OLD_TABLE
+        for rollup, _, bucket in self._ROLLUP_BUCKETS:
+            self.sess.execute(text(
+                f"""
+                UPDATE {rollup} SET
+                    sell_sum = {rollup}.sell_sum - d.sell_sum,
+                    sell_samples = {rollup}.sell_samples - d.sell_samples,
+                    bidding_sum = {rollup}.bidding_sum - d.bidding_sum,
+                    bidding_samples = {rollup}.bidding_samples - d.bidding_samples
+                FROM (
+                    SELECT market_hash_name, platform, {bucket} AS bucket_start,
+                           COALESCE(SUM(sell_price), 0) AS sell_sum, COUNT(sell_price) AS sell_samples,
+                           COALESCE(SUM(bidding_price), 0) AS bidding_sum, COUNT(bidding_price) AS bidding_samples
+                    FROM {old}
+                    GROUP BY market_hash_name, platform, {bucket}
+                ) d
+                WHERE {rollup}.market_hash_name = d.market_hash_name AND {rollup}.platform = d.platform
+                  AND {rollup}.bucket_start = d.bucket_start
+                """
+            ))
+
+    def _refresh_extremes(self):
+        """扣减过的桶按 prices 中现存的行重算 min / max（已降采样掉的行不再计入），样本清零的桶删除。"""
+        old = self.OLD_TABLE
+        ts = f"COALESCE(p.update_time, {epoch_ms_sql('p.created_at')})"
+        for rollup, width, bucket in self._ROLLUP_BUCKETS:
+            def extreme(fn, col):
+                return (
+                    f"(SELECT {fn}(p.{col}) FROM prices p WHERE p.market_hash_name = {rollup}.market_hash_name "
+                    f"AND p.platform = {rollup}.platform AND {ts} >= {rollup}.bucket_start "
+                    f"AND {ts} < {rollup}.bucket_start + {width})"
+                )
+            touched = (
+                f"(market_hash_name, platform, bucket_start) IN "
+                f"(SELECT market_hash_name, platform, {bucket} FROM {old})"
+            )
+            self.sess.execute(text(
+                f"""
+                UPDATE {rollup} SET
+                    sell_min = {extreme("MIN", "sell_price")}, sell_max = {extreme("MAX", "sell_price")},
+                    bidding_min = {extreme("MIN", "bidding_price")}, bidding_max = {extreme("MAX", "bidding_price")}
+                WHERE {touched}
+                """
+            ))
+            self.sess.execute(text(
+                f"DELETE FROM {rollup} WHERE sell_samples <= 0 AND bidding_samples <= 0 AND {touched}"
+            ))
+
+    def _rollup(self, now_ms: Optional[int] = None) -> int:
+        """暂存行按桶分组后一次 INSERT ... SELECT 累加到小时/日汇总表，返回涉及的桶数。"""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        st = table(
+            self.TABLE, column("market_hash_name"), column("platform"),
+            column("sell_price", Float), column("bidding_price", Float), column("update_time", BigInteger),
+        )
+        # 常量内联而非绑定参数，分桶表达式在子查询里算出、外层按标签分组（与 hour_bucket / day_bucket 相同）
+        def lit(v):
+            return literal_column(str(int(v)), BigInteger)
+
+        ts = func.coalesce(st.c.update_time, lit(now_ms))
+        buckets = (
+            (PriceRollupHourly, (ts // lit(HOUR_MS)) * lit(HOUR_MS)),
+            (PriceRollupDaily, ((ts + lit(DAY_OFFSET_MS)) // lit(DAY_MS)) * lit(DAY_MS) - lit(DAY_OFFSET_MS)),
+        )
+        total = 0
+        for model, bucket in buckets:
+            src = (
+                select(st.c.market_hash_name, st.c.platform, st.c.sell_price, st.c.bidding_price,
+                       bucket.label("bucket_start"))
+                .where(or_(st.c.sell_price.isnot(None), st.c.bidding_price.isnot(None)))
+                .subquery()
+            )
+            agg = (
+                select(
+                    src.c.market_hash_name, src.c.platform, src.c.bucket_start,
+                    func.coalesce(func.sum(src.c.sell_price), 0), func.count(src.c.sell_price),
+                    func.min(src.c.sell_price), func.max(src.c.sell_price),
+                    func.coalesce(func.sum(src.c.bidding_price), 0), func.count(src.c.bidding_price),
+                    func.min(src.c.bidding_price), func.max(src.c.bidding_price),
+                )
+                .group_by(src.c.market_hash_name, src.c.platform, src.c.bucket_start)
+            )
+            stmt = dialect_insert(model.__table__).from_select([
+                "market_hash_name", "platform", "bucket_start",
+                "sell_sum", "sell_samples", "sell_min", "sell_max",
+                "bidding_sum", "bidding_samples", "bidding_min", "bidding_max",
+            ], agg)
+            total += self.sess.execute(_rollup_upsert(model, stmt)).rowcount or 0
+        return total
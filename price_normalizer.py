@@ -0,0 +1,246 @@
+from datetime import datetime, timezone, timedelta
+from operator import itemgetter
+from typing import Optional, List, Dict, Any, NamedTuple, Iterable
+
+
+def canonical_platform_name(name: str) -> str:
+    p = (name or "").strip().upper()
+    if p == "C5":
+        return "C5GAME"
+    if p == "HALO":
+        return "HALOSKINS"
+    return p
+
+
+def _to_float(x):
+    try:
+        return float(x)
+    except Exception:
+        return None
+
+
+def _to_int(x):
+    try:
+        return int(x)
+    except Exception:
+        return None
+
+
+def _format_beijing_text(ms: Optional[int]) -> Optional[str]:
+    try:
+        if ms is None:
+            return None
+        dt = datetime.fromtimestamp(ms / 1000, tz=timezone(timedelta(hours=8)))
+        return dt.strftime('%Y-%m-%d %H:%M:%S')
+    except Exception:
+        return None
+
+
+class PriceRow(NamedTuple):
+    """归一化后的单个平台价格行（update_time 统一为毫秒）。"""
+    market_hash_name: str
+    platform: str
+    platform_item_id: Optional[str]
+    sell_price: Optional[float]
+    bidding_price: Optional[float]
+    sell_count: Optional[int]
+    bidding_count: Optional[int]
+    update_time: Optional[int]
+
+
+# 条目级候选键（按优先级）
+MHN_KEYS = ("marketHashName", "market_hash_name")
+PLATFORM_LIST_KEYS = ("platforms", "platformList", "prices", "dataList")
+
+# 平台行字段候选键（按优先级），顺序与 PriceRow 中除 market_hash_name 外的字段一致
+PLATFORM_FIELD_KEYS = (
+    ("platform", "name", "plat"),
+    ("itemId", "platformItemId", "platform_item_id"),
+    ("sell_price", "sellPrice", "sell", "price"),
+    ("bidding_price", "biddingPrice", "buy", "buy_price"),
+    ("sell_count", "sellCount"),
+    ("bidding_count", "biddingCount"),
+    ("update_time", "updateTime"),
+)
+
+# 按平台行键集合缓存已编译的键映射（None 表示该形态须走通用路径）
+_compiled_cache: Dict[frozenset, Any] = {}
+_COMPILED_CACHE_MAX = 256
+
+
+def _first_present(d: Dict[str, Any], keys: Iterable[str]) -> Optional[str]:
+    for k in keys:
+        if k in d:
+            return k
+    return None
+
+
+def _compile_platform_shape(sample: Dict[str, Any]):
+    """根据样本平台行选出各字段实际使用的键，返回一次调用即可取出 7 个字段的取值函数。
+
+    只对键集合完全相同的行有效（调用方按 frozenset(行.keys()) 比对）。某字段同时出现
+    多个候选键时，“第一个非空值”取决于每行的值而非键集合，返回 None 交由通用路径处理。
+    """
+    sig = frozenset(sample.keys())
+    if sig in _compiled_cache:
+        return _compiled_cache[sig]
+    keys: List[str] = []
+    slots: List[int] = []
+    ambiguous = False
+    for idx, candidates in enumerate(PLATFORM_FIELD_KEYS):
+        present = [k for k in candidates if k in sample]
+        if len(present) > 1:
+            ambiguous = True
+        if present:
+            keys.append(present[0])
+            slots.append(idx)
+    n_fields = len(PLATFORM_FIELD_KEYS)
+    if ambiguous or not keys:
+        compiled = None
+    elif len(keys) == n_fields:
+        compiled = itemgetter(*keys)
+    else:
+        # 部分字段缺失：取出已有字段后按下标展开，缺失字段补 None
+        getter = itemgetter(*keys) if len(keys) > 1 else (lambda d, k=keys[0]: (d[k],))
+        slot_list = tuple(slots)
+
+        def compiled(d, getter=getter, slot_list=slot_list):
+            vals = [None] * n_fields
+            for slot, v in zip(slot_list, getter(d)):
+                vals[slot] = v
+            return vals
+    if len(_compiled_cache) < _COMPILED_CACHE_MAX:
+        _compiled_cache[sig] = compiled
+    return compiled
+
+
+def _slow_fields(p: Dict[str, Any]) -> List[Any]:
+    """通用路径：逐字段按候选键取第一个非空值（兼容异构行）。"""
+    out: List[Any] = []
+    for candidates in PLATFORM_FIELD_KEYS:
+        val = None
+        for k in candidates:
+            v = p.get(k)
+            if v is not None and v != "":
+                val = v
+                break
+        out.append(val)
+    return out
+
+
+def extract_items(payload) -> List[Dict[str, Any]]:
+    """从接口响应或导入负载中取出条目列表。
+
+    支持：根数组；data/items/results 根键；{ responses: [...] } 聚合结构；单条目对象。
+    """
+    if isinstance(payload, list):
+        return payload
+    if not isinstance(payload, dict):
+        return []
+    responses = payload.get("responses")
+    if isinstance(responses, list) and responses:
+        items: List[Dict[str, Any]] = []
+        for resp in responses:
+            if not isinstance(resp, dict):
+                continue
+            for key in ("data", "items", "results"):
+                val = resp.get(key)
+                if isinstance(val, list):
+                    items.extend(val)
+                    break
+        if items:
+            return items
+    for key in ("data", "items", "results"):
+        val = payload.get(key)
+        if isinstance(val, list):
+            return val
+    if _first_present(payload, MHN_KEYS) and _first_present(payload, PLATFORM_LIST_KEYS):
+        return [payload]
+    return []
+
+
+def normalize_price_items(items: Iterable[Dict[str, Any]], counters: Optional[Dict[str, int]] = None) -> List[PriceRow]:
+    """将条目列表归一化为 PriceRow 列表。
+
+    平台行按键集合编译出 itemgetter，键集合相同的后续行直接复用；键集合变化时按新形态
+    重新取，候选键重复等无法静态确定取值的形态回退到通用路径（逐字段取第一个非空值）。
+    counters 若提供，则累加 items/platforms/skipped 计数。
+    """
+    rows: List[PriceRow] = []
+    append = rows.append
+    new_row = tuple.__new__
+    canon_cache: Dict[Any, str] = {}
+    mhn_key = plats_key = None
+    getter = sig = None
+    n_items = n_skipped = 0
+
+    for it in (items or []):
+        if not isinstance(it, dict):
+            n_skipped += 1
+            continue
+        if mhn_key is None or mhn_key not in it:
+            mhn_key = _first_present(it, MHN_KEYS)
+        mhn = (it.get(mhn_key) or "").strip() if mhn_key else ""
+        if not mhn:
+            n_skipped += 1
+            continue
+        n_items += 1
+        if plats_key is None or not it.get(plats_key):
+            plats_key = _first_present(it, PLATFORM_LIST_KEYS)
+        plats = (it.get(plats_key) if plats_key else None) or []
+        if isinstance(plats, dict):
+            plats = [plats]
+        if not plats:
+            continue
+
+        picked = []
+        for p in plats:
+            if not isinstance(p, dict):
+                n_skipped += 1
+                continue
+            # 键集合与已编译形态一致时走 itemgetter，否则按本行形态重新取（已编译的形态有缓存）
+            if sig is None or p.keys() != sig:
+                sig = frozenset(p.keys())
+                getter = _compile_platform_shape(p)
+            picked.append(getter(p) if getter is not None else _slow_fields(p))
+
+        for plat_raw, pid, sell, buy, sc, bc, ut in picked:
+            if plat_raw.__class__ is not str:
+                # 列表/字典等不可哈希或非字符串的平台名无法识别
+                n_skipped += 1
+                continue
+            plat_name = canon_cache.get(plat_raw)
+            if plat_name is None:
+                plat_name = canon_cache[plat_raw] = canonical_platform_name(plat_raw)
+            if not plat_name:
+                n_skipped += 1
+                continue
+            # 常见类型直接透传，仅在类型不符时走带异常保护的转换
+            if ut is not None:
+                if ut.__class__ is not int:
+                    ut = _to_int(ut)
+                # 统一为毫秒时间戳：若为秒（10位）则乘以 1000
+                if ut is not None and ut < 1000000000000:
+                    ut = ut * 1000
+            append(new_row(PriceRow, (
+                mhn,
+                plat_name,
+                (pid or None) if pid.__class__ is str else (str(pid) if pid is not None else None),
+                sell if sell is None or sell.__class__ is float else _to_float(sell),
+                buy if buy is None or buy.__class__ is float else _to_float(buy),
+                sc if sc is None or sc.__class__ is int else _to_int(sc),
+                bc if bc is None or bc.__class__ is int else _to_int(bc),
+                ut,
+            )))
+
+    n_plats = len(rows)
+    if counters is not None:
+        counters["items"] = counters.get("items", 0) + n_items
+        counters["platforms"] = counters.get("platforms", 0) + n_plats
+        counters["skipped"] = counters.get("skipped", 0) + n_skipped
+    return rows
+
+
+def normalize_price_response(resp, counters: Optional[Dict[str, int]] = None) -> List[PriceRow]:
+    """解析一次接口响应（或导入负载）为 PriceRow 列表。"""
+    return normalize_price_items(extract_items(resp), counters)
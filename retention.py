@@ -0,0 +1,466 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+from sqlalchemy import text
+
+from db import (
+    engine, HOUR_MS, DAY_MS, DAY_OFFSET_MS, IS_SQLITE, PRICES_PARTITIONED,
+    epoch_ms_sql, ensure_price_partitions, price_partitions, hour_bucket, day_bucket, get_state, set_state,
+)
+from write_queue import ingest_writer
+
+# prices 行的时间：优先 update_time（毫秒），旧记录退回 created_at（UTC）
+TS_EXPR = f"COALESCE(update_time, {epoch_ms_sql('created_at')})"
+# TS_EXPR ∈ [:lo, :hi) 的可走索引写法（update_time 索引；为空的行再按 created_at 过滤）
+WINDOW_SQL = (
+    f"((update_time >= :lo AND update_time < :hi) OR (update_time IS NULL "
+    f"AND {epoch_ms_sql('created_at')} >= :lo AND {epoch_ms_sql('created_at')} < :hi))"
+)
+# 北京时间月份，用于归档分库（仅 SQLite）
+MONTH_EXPR = f"strftime('%Y%m', ({TS_EXPR}) / 1000, 'unixepoch', '+8 hours')"
+
+_PRICE_COLUMNS = (
+    "id, market_hash_name, platform, platform_item_id, item_id, platform_id, "
+    "sell_price, bidding_price, sell_count, bidding_count, update_time, update_time_text, created_at"
+)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+class RetentionPolicy:
+    """prices 表保留策略（天数为 0 表示关闭该层）。
+
+    - raw_ttl_days：超过后降采样为每 饰品 × 平台 × 小时 保留最后一条；
+    - hourly_ttl_days：超过后进一步降采样为每（北京时间）天保留最后一条；
+    - archive_after_days：超过后按月移入 data/archive/prices_YYYYMM.db 并从主库删除；
+    - rollup_hourly_ttl_days：小时汇总表只保留这么多天（均值接口只读最近一天的小时桶，更早的走日汇总）。
+    均值统计由小时/日汇总表提供，不受降采样影响。
+    """
+
+    def __init__(self, raw_ttl_days: int = 14, hourly_ttl_days: int = 90, archive_after_days: int = 0,
+                 interval_sec: int = 3600, archive_dir: str = "data/archive", rollup_hourly_ttl_days: int = 7):
+        self.raw_ttl_days = max(0, int(raw_ttl_days))
+        self.hourly_ttl_days = max(0, int(hourly_ttl_days))
+        self.archive_after_days = max(0, int(archive_after_days))
+        self.rollup_hourly_ttl_days = max(0, int(rollup_hourly_ttl_days))
+        self.interval_sec = max(60, int(interval_sec))
+        self.archive_dir = archive_dir
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        return cls(
+            raw_ttl_days=_env_int("PRICE_RAW_TTL_DAYS", 14),
+            hourly_ttl_days=_env_int("PRICE_HOURLY_TTL_DAYS", 90),
+            archive_after_days=_env_int("PRICE_ARCHIVE_AFTER_DAYS", 0),
+            interval_sec=_env_int("PRICE_RETENTION_INTERVAL_SEC", 3600),
+            archive_dir=os.getenv("PRICE_ARCHIVE_DIR", "data/archive"),
+            rollup_hourly_ttl_days=_env_int("PRICE_ROLLUP_HOURLY_TTL_DAYS", 7),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rawTtlDays": self.raw_ttl_days,
+            "hourlyTtlDays": self.hourly_ttl_days,
+            "archiveAfterDays": self.archive_after_days,
+            "intervalSec": self.interval_sec,
+            "archiveDir": self.archive_dir,
+            "rollupHourlyTtlDays": self.rollup_hourly_ttl_days,
+        }
+
+
+def _execute_write(sql: str, params: Dict[str, Any]) -> int:
+    """经写线程执行一条写语句，返回影响行数。"""
+    return ingest_writer.run(lambda sess: sess.execute(text(sql), params).rowcount or 0)
+
+
+def _set_states(values: Dict[str, int]):
+    """经写线程在一个事务内更新多个 maintenance_state 水位线。"""
+    def task(sess):
+        conn = sess.connection()
+        for key, value in values.items():
+            set_state(conn, key, value)
+    ingest_writer.run(task)
+
+
+def downsample_prices(mhns: List[str], raw_cutoff: int, hourly_cutoff: Optional[int], since: Optional[int] = None) -> int:
+    """对一组饰品降采样：raw_cutoff 之前按小时（hourly_cutoff 之前按天）每桶只保留最新一条，返回删除行数。
+
+    since 给出时只处理该时间之后的行（须与所用桶的起点对齐，否则跨界的桶会留下两条）。
+    """
+    if not mhns:
+        return 0
+    hour_expr = f"(({TS_EXPR}) / {HOUR_MS}) * {HOUR_MS}"
+    day_expr = f"((({TS_EXPR}) + {DAY_OFFSET_MS}) / {DAY_MS}) * {DAY_MS} - {DAY_OFFSET_MS}"
+    if hourly_cutoff is not None:
+        bucket_expr = f"CASE WHEN ({TS_EXPR}) < :hourly_cutoff THEN {day_expr} ELSE {hour_expr} END"
+    else:
+        bucket_expr = hour_expr
+    params: Dict[str, Any] = {"raw_cutoff": raw_cutoff, "hourly_cutoff": hourly_cutoff, "since": since}
+    since_sql = f" AND ({TS_EXPR}) >= :since" if since is not None else ""
+    names = []
+    for i, m in enumerate(mhns):
+        params[f"m{i}"] = m
+        names.append(f":m{i}")
+    sql = f"""
+        DELETE FROM prices WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY market_hash_name, platform, bucket
+                    ORDER BY update_time DESC NULLS LAST, id DESC
+                ) AS rn
+                FROM (
+                    SELECT id, market_hash_name, platform, update_time, {bucket_expr} AS bucket
+                    FROM prices
+                    WHERE market_hash_name IN ({", ".join(names)}) AND ({TS_EXPR}) < :raw_cutoff{since_sql}
+                ) b
+            ) ranked
+            WHERE rn > 1
+        )
+    """
+    return _execute_write(sql, params)
+
+
+def archive_prices_range(archive_dir: str, lo_id: int, hi_id: int, cutoff: int) -> int:
+    """将 id ∈ [lo_id, hi_id] 且早于 cutoff 的价格行按月移入归档库，返回移动行数。
+
+    复制在独立连接上进行（只写归档库文件），主库的删除经写线程执行；
+    删除失败时下轮重新复制（INSERT OR IGNORE 跳过已复制的行）再删。
+    """
+    with engine.connect() as conn:
+        months = [
+            r[0] for r in conn.execute(text(
+                f"SELECT DISTINCT {MONTH_EXPR} FROM prices WHERE id BETWEEN :lo AND :hi AND ({TS_EXPR}) < :cutoff"
+            ), {"lo": lo_id, "hi": hi_id, "cutoff": cutoff}).fetchall() if r[0]
+        ]
+    moved = 0
+    Path(archive_dir).mkdir(parents=True, exist_ok=True)
+    for month in months:
+        path = str(Path(archive_dir) / f"prices_{month}.db")
+        with engine.connect() as conn:
+            # ATTACH/DETACH 不能在事务内执行：挂载后单独提交，再在同一连接上复制
+            conn.exec_driver_sql("ATTACH DATABASE ? AS arc", (path,))
+            conn.commit()
+            try:
+                conn.exec_driver_sql(
+                    "CREATE TABLE IF NOT EXISTS arc.prices AS SELECT * FROM main.prices WHERE 0"
+                )
+                conn.exec_driver_sql("CREATE UNIQUE INDEX IF NOT EXISTS arc.uq_arc_prices_id ON prices (id)")
+                cond = f"id BETWEEN :lo AND :hi AND ({TS_EXPR}) < :cutoff AND {MONTH_EXPR} = :month"
+                params = {"lo": lo_id, "hi": hi_id, "cutoff": cutoff, "month": month}
+                conn.execute(text(
+                    f"INSERT OR IGNORE INTO arc.prices ({_PRICE_COLUMNS}) "
+                    f"SELECT {_PRICE_COLUMNS} FROM main.prices WHERE {cond}"
+                ), params)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.exec_driver_sql("DETACH DATABASE arc")
+                conn.commit()
+        moved += _execute_write(f"DELETE FROM prices WHERE {cond}", params)
+    return moved
+
+
+def detach_price_partitions(cutoff: int) -> int:
+    """PostgreSQL：把上界不晚于 cutoff 的月分区从 prices 上摘下（保留为独立表，即归档），返回摘下的行数。
+
+    同时补建未来月份的分区，长期运行的进程不会落入默认分区。
+    """
+    def prepare(sess):
+        conn = sess.connection()
+        ensure_price_partitions(conn)
+        return [p["name"] for p in price_partitions(conn) if p["upperMs"] <= cutoff]
+
+    def detach(name):
+        def task(sess):
+            n = sess.execute(text(f"SELECT COUNT(*) FROM {name}")).scalar_one()
+            sess.execute(text(f"ALTER TABLE prices DETACH PARTITION {name}"))
+            return n
+        return task
+
+    return sum(ingest_writer.run(detach(name)) for name in ingest_writer.run(prepare))
+
+
+def auto_vacuum_mode() -> str:
+    if not IS_SQLITE:
+        return "unsupported"
+    with engine.connect() as conn:
+        mode = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+    return {0: "none", 1: "full", 2: "incremental"}.get(int(mode or 0), str(mode))
+
+
+def enable_incremental_vacuum():
+    """将已有库切换为 auto_vacuum=INCREMENTAL（需一次完整 VACUUM，期间会阻塞写入）。
+
+    VACUUM 不能在事务内执行，不经写线程。
+    """
+    if not IS_SQLITE:
+        raise RuntimeError("增量 VACUUM 仅适用于 SQLite")
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+
+
+class RetentionRunner:
+    """后台保留策略执行器：按周期降采样、归档旧价格行、清理过期小时汇总，并以小步增量 VACUUM 归还空闲页。
+
+    每一步都是经写线程提交的独立短任务，步与步之间让出写线程，避免阻塞入库任务
+    （增量 VACUUM 与 WAL checkpoint 不能在事务内执行，在独立连接上进行）。
+    降采样与归档在 maintenance_state 中记录已处理到的截止时间与 prices 最大 id（水位线），
+    之后每轮只扫描两次截止时间之间的行，以及上轮之后新写入但时间已落在已处理区间的行（补录的历史数据）。
+    """
+
+    MHN_CHUNK = 100            # 每次降采样的饰品数
+    ID_CHUNK = 20000           # 归档扫描的 id 步长
+    VACUUM_PAGES = 2000        # 每步增量 VACUUM 的页数
+    PRUNE_CHUNK = 5000         # 每步删除的小时汇总行数
+    PAUSE_SEC = 0.05           # 步与步之间的让出时间
+
+    def __init__(self, policy: Optional[RetentionPolicy] = None):
+        self.policy = policy or RetentionPolicy.from_env()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._lock = threading.Lock()
+
+        # 状态字段
+        self.running: bool = False
+        self.busy: bool = False
+        self.phase: Optional[str] = None
+        self.last_run_ts: Optional[float] = None
+        self.last_duration_sec: Optional[float] = None
+        self.next_run_ts: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_result: Dict[str, int] = {}
+        self.totals: Dict[str, int] = {"downsampled": 0, "archived": 0, "rollupsPruned": 0, "vacuumedPages": 0}
+
+    # 公开控制方法
+    def start(self) -> Dict[str, Any]:
+        with self._lock:
+            if self.running:
+                return self._status_locked()
+            self._stop_event.clear()
+            self.running = True
+            self.next_run_ts = time.time()
+            self._thread = threading.Thread(target=self._loop, name="RetentionRunner", daemon=True)
+            self._thread.start()
+            return self._status_locked()
+
+    def stop(self) -> Dict[str, Any]:
+        self._stop_event.set()
+        self._wake_event.set()
+        with self._lock:
+            t = self._thread
+        if t and t.is_alive() and t is not threading.current_thread():
+            t.join(timeout=5.0)
+        with self._lock:
+            self.running = False
+            self._thread = None
+            self.next_run_ts = None
+        return self.status()
+
+    def trigger(self) -> Dict[str, Any]:
+        """立即执行一轮（未启动时先启动）。"""
+        if not self.running:
+            return self.start()
+        self._wake_event.set()
+        return self.status()
+
+    # 主循环
+    def _loop(self):
+        while not self._stop_event.is_set():
+            self.run_once()
+            with self._lock:
+                self.next_run_ts = time.time() + self.policy.interval_sec
+            self._wake_event.wait(self.policy.interval_sec)
+            self._wake_event.clear()
+
+    def run_once(self) -> Dict[str, int]:
+        result = {"downsampled": 0, "archived": 0, "rollupsPruned": 0, "vacuumedPages": 0}
+        t0 = time.time()
+        with self._lock:
+            self.busy = True
+            self.last_error = None
+        try:
+            result["downsampled"] = self._downsample()
+            result["archived"] = self._archive()
+            result["rollupsPruned"] = self._prune_rollups()
+            result["vacuumedPages"] = self._vacuum()
+        except Exception as e:
+            with self._lock:
+                self.last_error = str(e)
+        finally:
+            with self._lock:
+                self.busy = False
+                self.phase = None
+                self.last_run_ts = time.time()
+                self.last_duration_sec = round(time.time() - t0, 2)
+                self.last_result = result
+                for k, v in result.items():
+                    self.totals[k] += v
+        return result
+
+    def _set_phase(self, phase: str):
+        with self._lock:
+            self.phase = phase
+
+    def _names_in_window(self, lo: int, hi: int) -> List[str]:
+        if lo >= hi:
+            return []
+        with engine.connect() as conn:
+            return [r[0] for r in conn.execute(
+                text(f"SELECT DISTINCT market_hash_name FROM prices WHERE {WINDOW_SQL}"), {"lo": lo, "hi": hi}
+            ).fetchall()]
+
+    def _late_names(self, id_mark: int, before: int) -> List[str]:
+        """上轮之后写入（id > id_mark）、时间却早于 before 的行所属饰品。"""
+        with engine.connect() as conn:
+            return [r[0] for r in conn.execute(text(
+                f"SELECT DISTINCT market_hash_name FROM prices WHERE id > :m AND ({TS_EXPR}) < :before"
+            ), {"m": id_mark, "before": before}).fetchall()]
+
+    def _downsample_names(self, mhns: List[str], raw_cutoff: int, hourly_cutoff: Optional[int],
+                          since: Optional[int] = None) -> int:
+        deleted = 0
+        for i in range(0, len(mhns), self.MHN_CHUNK):
+            if self._stop_event.is_set():
+                break
+            deleted += downsample_prices(mhns[i:i + self.MHN_CHUNK], raw_cutoff, hourly_cutoff, since)
+            self._stop_event.wait(self.PAUSE_SEC)
+        return deleted
+
+    def _downsample(self) -> int:
+        p = self.policy
+        if not p.raw_ttl_days:
+            return 0
+        self._set_phase("downsample")
+        now_ms = int(time.time() * 1000)
+        raw_cutoff = now_ms - p.raw_ttl_days * DAY_MS
+        hourly_cutoff = now_ms - max(p.hourly_ttl_days, p.raw_ttl_days) * DAY_MS if p.hourly_ttl_days else None
+        with engine.connect() as conn:
+            raw_until = get_state(conn, "retention.raw_until")
+            hourly_until = get_state(conn, "retention.hourly_until")
+            id_mark = get_state(conn, "retention.id_mark")
+            max_id = conn.execute(text("SELECT MAX(id) FROM prices")).scalar() or 0
+        # 上轮截止时间向下对齐到桶起点：跨越截止时间的桶里已有的保留行要一起参与比较
+        raw_lo = hour_bucket(raw_until)
+        deleted = self._downsample_names(self._names_in_window(raw_lo, raw_cutoff), raw_cutoff, hourly_cutoff, raw_lo)
+        if hourly_cutoff is not None:
+            day_lo = day_bucket(hourly_until)
+            deleted += self._downsample_names(
+                self._names_in_window(day_lo, hourly_cutoff), hourly_cutoff, hourly_cutoff, day_lo)
+        if id_mark:
+            deleted += self._downsample_names(self._late_names(id_mark, raw_lo), raw_cutoff, hourly_cutoff)
+        if not self._stop_event.is_set():
+            marks = {"retention.raw_until": max(raw_until, raw_cutoff), "retention.id_mark": max_id}
+            if hourly_cutoff is not None:
+                marks["retention.hourly_until"] = max(hourly_until, hourly_cutoff)
+            _set_states(marks)
+        return deleted
+
+    def _archive(self) -> int:
+        p = self.policy
+        if not p.archive_after_days:
+            return 0
+        self._set_phase("archive")
+        cutoff = int(time.time() * 1000) - p.archive_after_days * DAY_MS
+        if PRICES_PARTITIONED:
+            return detach_price_partitions(cutoff)
+        with engine.connect() as conn:
+            until = get_state(conn, "retention.archive_until")
+            id_mark = get_state(conn, "retention.archive_id_mark")
+            max_id = conn.execute(text("SELECT MAX(id) FROM prices")).scalar() or 0
+            # 只扫描待归档行所在的 id 区间：本轮新越过截止时间的行，加上上轮之后补录的更早的行
+            spans = [conn.execute(
+                text(f"SELECT MIN(id), MAX(id) FROM prices WHERE {WINDOW_SQL}"), {"lo": until, "hi": cutoff}
+            ).first()]
+            if id_mark:
+                spans.append(conn.execute(text(
+                    f"SELECT MIN(id), MAX(id) FROM prices WHERE id > :m AND ({TS_EXPR}) < :cutoff"
+                ), {"m": id_mark, "cutoff": min(until, cutoff)}).first())
+        spans = [(int(lo), int(hi)) for lo, hi in spans if lo is not None]
+        moved = 0
+        if spans:
+            lo, hi = min(s[0] for s in spans), max(s[1] for s in spans)
+            for start in range(lo, hi + 1, self.ID_CHUNK):
+                if self._stop_event.is_set():
+                    break
+                moved += archive_prices_range(p.archive_dir, start, start + self.ID_CHUNK - 1, cutoff)
+                self._stop_event.wait(self.PAUSE_SEC)
+        if not self._stop_event.is_set():
+            _set_states({"retention.archive_until": max(until, cutoff), "retention.archive_id_mark": max_id})
+        return moved
+
+    def _prune_rollups(self) -> int:
+        """分块删除早于 rollup_hourly_ttl_days 的小时汇总（经 bucket_start 索引定位）。"""
+        p = self.policy
+        if not p.rollup_hourly_ttl_days:
+            return 0
+        self._set_phase("prune_rollups")
+        cutoff = hour_bucket(int(time.time() * 1000) - p.rollup_hourly_ttl_days * DAY_MS)
+        pruned = 0
+        while not self._stop_event.is_set():
+            n = _execute_write(
+                """
+                DELETE FROM price_rollups_hourly WHERE id IN (
+                    SELECT id FROM price_rollups_hourly WHERE bucket_start < :cutoff LIMIT :n
+                )
+                """,
+                {"cutoff": cutoff, "n": self.PRUNE_CHUNK},
+            )
+            pruned += n
+            if n < self.PRUNE_CHUNK:
+                break
+            self._stop_event.wait(self.PAUSE_SEC)
+        return pruned
+
+    def _vacuum(self) -> int:
+        """auto_vacuum=INCREMENTAL 时分步归还空闲页，最后截断 WAL。"""
+        if auto_vacuum_mode() != "incremental":
+            return 0
+        self._set_phase("vacuum")
+        freed = 0
+        while not self._stop_event.is_set():
+            with engine.connect() as conn:
+                free = int(conn.exec_driver_sql("PRAGMA freelist_count").scalar() or 0)
+                if free <= 0:
+                    break
+                step = min(free, self.VACUUM_PAGES)
+                # sqlite3 的 execute 对该 PRAGMA 只推进一步（释放一页），需用 executescript 执行到底
+                conn.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({step});")
+                freed += step
+            self._stop_event.wait(self.PAUSE_SEC)
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        return freed
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._status_locked()
+
+    def _status_locked(self) -> Dict[str, Any]:
+        next_sec = None
+        if self.running and self.next_run_ts:
+            next_sec = max(0, int(self.next_run_ts - time.time()))
+        return {
+            "running": self.running,
+            "busy": self.busy,
+            "phase": self.phase,
+            "state": ("busy" if self.busy else ("running" if self.running else "idle")),
+            "policy": self.policy.to_dict(),
+            "lastRunAt": self.last_run_ts,
+            "lastDurationSec": self.last_duration_sec,
+            "nextRunSeconds": next_sec,
+            "lastResult": dict(self.last_result),
+            "totals": dict(self.totals),
+            "lastError": self.last_error,
+        }
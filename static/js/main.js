@@ -222,7 +222,9 @@ async function doBatchByIdRange() {
     const processed = data.processedNames || 0;
     const inserted = data.insertedRows || 0;
     const saved = data.saved || '';
-    alert(`批量完成：处理 ${processed} 个名称，入库 ${inserted} 行，导出文件：${saved}`);
+    const pending = (data.pendingChunks || []).length;
+    const more = pending ? `；${pending} 批超出当前额度，约 ${data.retryAfter} 秒后可重新提交` : '';
+    alert(`批量完成：处理 ${processed} 个名称，入库 ${inserted} 行，导出文件：${saved}${more}`);
   } catch (e) {
     pre.textContent = '失败: ' + e.message;
   }
@@ -265,9 +267,8 @@ window.addEventListener("DOMContentLoaded", () => {
   if (btnResume) btnResume.addEventListener("click", jobResume);
   if (btnStop) btnStop.addEventListener("click", jobStop);
 
-  // 初始拉取一次状态，并每秒轮询
-  refreshJobStatus();
-  setInterval(refreshJobStatus, 1000);
+  // 订阅任务状态推送（不支持 SSE 时退回每秒轮询）
+  subscribeJobStatus();
 });
 
 // 导入价格到数据库（覆盖旧数据）
@@ -328,7 +329,8 @@ function renderJobUI(state) {
   }
   const total = state.maxId || 0;
   const completed = state.completedCount || 0;
-  if (progTextEl) progTextEl.textContent = `${completed}/${total} (${percent}%)`;
+  const rowsInfo = typeof state.rowsWritten === 'number' ? ` · 写入 ${state.rowsWritten} 行 / 跳过未变化 ${state.rowsSkipped || 0} 行` : '';
+  if (progTextEl) progTextEl.textContent = `${completed}/${total} (${percent}%)${rowsInfo}`;
   const rng = state.lastProcessedRange ? `${state.lastProcessedRange[0]}-${state.lastProcessedRange[1]}` : "-";
   if (rangeEl) rangeEl.textContent = rng;
 
@@ -345,6 +347,32 @@ function renderJobUI(state) {
   if (btnStop) btnStop.disabled = !running;
 }
 
+// 服务端仅在状态变化时推送变化字段，合并到 jobState；倒计时在本地按秒递减
+const jobState = {};
+let jobDeadline = null;
+
+function subscribeJobStatus() {
+  if (!window.EventSource) {
+    refreshJobStatus();
+    setInterval(refreshJobStatus, 1000);
+    return;
+  }
+  const es = new EventSource('/api/admin/job/events');
+  es.addEventListener('status', (e) => {
+    const delta = JSON.parse(e.data);
+    Object.assign(jobState, delta);
+    if ('nextRunSeconds' in delta) {
+      jobDeadline = typeof delta.nextRunSeconds === 'number' ? Date.now() + delta.nextRunSeconds * 1000 : null;
+    }
+    renderJobUI(jobState);
+  });
+  setInterval(() => {
+    if (!jobState.running || jobDeadline === null) return;
+    jobState.nextRunSeconds = Math.max(0, Math.round((jobDeadline - Date.now()) / 1000));
+    renderJobUI(jobState);
+  }, 1000);
+}
+
 async function refreshJobStatus() {
   try {
     const data = await fetchJSON('/api/admin/job/status');
@@ -362,7 +390,9 @@ async function jobStart() {
       const v = parseInt(String(input.value).trim(), 10);
       if (Number.isFinite(v) && v > 0) startId = v;
     }
-    const payload = { startId, batchSize: 100 };
+    const modeEl = document.getElementById('jobScheduleMode');
+    const scheduleMode = modeEl ? modeEl.value : 'fixed';
+    const payload = { startId, batchSize: 100, scheduleMode };
     const data = await fetchJSON('/api/admin/job/start', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(payload) });
     renderJobUI(data);
   } catch (e) {
@@ -0,0 +1,193 @@
+import os
+import asyncio
+import threading
+from typing import Optional, Dict, Tuple, List, Any
+
+import aiohttp
+
+from steamdt_client import SteamDTClient, RateLimitError, RATE_LIMITS, capped_wait, shared_bucket
+
+
+class AsyncSteamDTClient:
+    """SteamDTClient 的 asyncio 版本：复用连接（keep-alive 连接池），
+    以信号量限制同时在途的请求数，并与同步客户端共用同一 key 的令牌桶。"""
+
+    BASE_URL = SteamDTClient.BASE_URL
+    RATE_LIMITS: Dict[str, Optional[Tuple[int, float]]] = RATE_LIMITS
+    MAX_WAIT: Dict[str, float] = SteamDTClient.MAX_WAIT
+
+    def __init__(self, api_key: str | None = None, max_concurrency: int = 4, rate_limit: bool = True,
+                 base_url: str | None = None, max_wait: Optional[float] = None):
+        self.api_key = api_key or os.getenv("STEAMDT_API_KEY")
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.rate_limit = rate_limit
+        # 各接口等待令牌的上限（同 SteamDTClient.max_wait）
+        self.max_wait = max_wait
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    def _ensure_key(self):
+        if not self.api_key:
+            raise RuntimeError("未配置 STEAMDT_API_KEY，请在环境变量中设置后重试。")
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # 会话与信号量需在所属事件循环内创建
+        if self._session is None or self._session.closed:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(headers=headers, connector=connector)
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    def _bucket(self, endpoint: str, api_key: str | None = None):
+        if not self.rate_limit:
+            return None
+        return shared_bucket(api_key or self.api_key, endpoint, self.RATE_LIMITS)
+
+    async def _throttle(self, endpoint: str, api_key: str | None = None):
+        b = self._bucket(endpoint, api_key)
+        if b is None:
+            return
+        if not await b.acquire_async(timeout=capped_wait(self.MAX_WAIT.get(endpoint), self.max_wait)):
+            raise RateLimitError(endpoint, b.wait_time())
+
+    def wait_time(self, endpoint: str, api_key: str | None = None) -> float:
+        """距离该接口下一个可用令牌的秒数（不消耗令牌）。"""
+        b = self._bucket(endpoint, api_key)
+        return b.wait_time() if b is not None else 0.0
+
+    def assign_keys(self, n: int, endpoint: str, api_keys: Optional[List[str]] = None) -> List[Optional[str]]:
+        """按各 key 当前可用的令牌数，把前若干个请求轮流分配到 key 上（不消耗令牌）。
+
+        返回长度不超过 n 的 key 列表，第 i 项即第 i 个请求所用的 key；接口不限频时全部分配。
+        超出当前额度的请求由调用方稍后再发，而不是在请求线程里排队等令牌。
+        """
+        keys = [k for k in (api_keys or []) if k] or [self.api_key]
+        budget = {}
+        for k in keys:
+            b = self._bucket(endpoint, k)
+            budget[k] = None if b is None else b.available()
+        out: List[Optional[str]] = []
+        while len(out) < n:
+            free = [k for k in keys if budget[k] is None or budget[k] > 0]
+            if not free:
+                break
+            for k in free[:n - len(out)]:
+                out.append(k)
+                if budget[k] is not None:
+                    budget[k] -= 1
+        return out
+
+    async def _request(self, method: str, path: str, endpoint: str, timeout: float,
+                       api_key: str | None = None, **kwargs):
+        """api_key 给出时以该 key 发起请求并占用该 key 的令牌桶（会话默认 key 之外的 KeyPool key）。"""
+        if api_key and api_key != self.api_key:
+            kwargs["headers"] = {**kwargs.get("headers", {}), "Authorization": f"Bearer {api_key}"}
+        else:
+            self._ensure_key()
+        session = await self._get_session()
+        await self._throttle(endpoint, api_key)
+        async with self._sem:
+            async with session.request(method, f"{self.base_url}{path}",
+                                       timeout=aiohttp.ClientTimeout(total=timeout), **kwargs) as resp:
+                resp.raise_for_status()
+                return await resp.json(content_type=None)
+
+    async def get_base_info(self):
+        """GET /open/cs2/v1/base (每日 1 次)"""
+        return await self._request("GET", "/open/cs2/v1/base", "base", 30)
+
+    async def get_price_single(self, market_hash_name: str):
+        """GET /open/cs2/v1/price/single?marketHashName=xxx (每分钟 60 次)"""
+        return await self._request("GET", "/open/cs2/v1/price/single", "price_single", 30,
+                                   params={"marketHashName": market_hash_name})
+
+    async def get_price_batch(self, market_hash_names: list[str], api_key: str | None = None):
+        """POST /open/cs2/v1/price/batch  Body: {"marketHashNames": ["..."]} (1-100)"""
+        return await self._request("POST", "/open/cs2/v1/price/batch", "price_batch", 60, api_key=api_key,
+                                   json={"marketHashNames": market_hash_names})
+
+    async def get_price_avg(self, market_hash_name: str):
+        """GET /open/cs2/v1/price/avg?marketHashName=xxx"""
+        return await self._request("GET", "/open/cs2/v1/price/avg", "price_avg", 30,
+                                   params={"marketHashName": market_hash_name})
+
+    async def get_price_batch_many(self, chunks: List[List[str]], api_keys: Optional[List[str]] = None) -> List[Any]:
+        """并发请求多个批次（在途数受 max_concurrency 限制），结果按输入顺序返回。
+
+        api_keys 给出时各批次轮流分配到这些 key 上，各用各的令牌桶；与 chunks 等长时即逐批指定 key
+        （见 assign_keys）。
+        单个批次失败（如等待令牌超过 MAX_WAIT 抛出 RateLimitError）不影响其他批次：
+        该位置返回异常对象而不是响应，调用方需逐个判断。
+        """
+        keys = [k for k in (api_keys or []) if k] or [self.api_key]
+        return await asyncio.gather(
+            *(self.get_price_batch(c, api_key=keys[i % len(keys)]) for i, c in enumerate(chunks)),
+            return_exceptions=True,
+        )
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class SyncSteamDTClient:
+    """AsyncSteamDTClient 的同步外观：在后台线程中运行独立事件循环，
+    供现有线程任务与 Flask 视图直接调用（方法签名与 SteamDTClient 一致）。"""
+
+    def __init__(self, api_key: str | None = None, max_concurrency: int = 4, rate_limit: bool = True,
+                 base_url: str | None = None, max_wait: Optional[float] = None):
+        self._client = AsyncSteamDTClient(api_key=api_key, max_concurrency=max_concurrency,
+                                          rate_limit=rate_limit, base_url=base_url, max_wait=max_wait)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def api_key(self) -> Optional[str]:
+        return self._client.api_key
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="SteamDTAsyncLoop", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    def wait_time(self, endpoint: str, api_key: str | None = None) -> float:
+        return self._client.wait_time(endpoint, api_key)
+
+    def assign_keys(self, n: int, endpoint: str, api_keys: Optional[List[str]] = None) -> List[Optional[str]]:
+        return self._client.assign_keys(n, endpoint, api_keys)
+
+    def get_base_info(self):
+        return self._run(self._client.get_base_info())
+
+    def get_price_single(self, market_hash_name: str):
+        return self._run(self._client.get_price_single(market_hash_name))
+
+    def get_price_batch(self, market_hash_names: list[str], api_key: str | None = None):
+        return self._run(self._client.get_price_batch(market_hash_names, api_key=api_key))
+
+    def get_price_avg(self, market_hash_name: str):
+        return self._run(self._client.get_price_avg(market_hash_name))
+
+    def get_price_batch_many(self, chunks: List[List[str]], api_keys: Optional[List[str]] = None) -> List[Any]:
+        return self._run(self._client.get_price_batch_many(chunks, api_keys))
+
+    def close(self):
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._client.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=2.0)
@@ -1,12 +1,165 @@
 import os
+import asyncio
+import threading
+import time
+from typing import Optional, Dict, Tuple
+
 import requests
 
 
+class RateLimitError(RuntimeError):
+    """在允许的等待时间内未能取得令牌（例如基础信息接口当日额度已用完）。"""
+
+    def __init__(self, endpoint: str, retry_after: float):
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+        super().__init__(f"接口 {endpoint} 触发限频，请在 {int(retry_after) + 1} 秒后重试。")
+
+
+class TokenBucket:
+    """线程安全的令牌桶：capacity 个令牌，每 period 秒补满。"""
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity = float(max(1, capacity))
+        self.rate = self.capacity / float(period)  # 每秒补充的令牌数
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """距离可取得令牌还需等待的秒数（不消耗令牌）。"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= tokens:
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+    def available(self) -> int:
+        """当前可立即取得的整令牌数（不消耗令牌）。"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return int(self.tokens)
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """尝试取令牌：成功返回 0，否则返回需要等待的秒数。"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, timeout: Optional[float] = None, stop_event: Optional[threading.Event] = None) -> bool:
+        """阻塞直到取得令牌；超时或 stop_event 被设置时返回 False。"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return True
+            if deadline is not None:
+                remain = deadline - time.monotonic()
+                if remain < wait:
+                    return False
+            if stop_event is not None:
+                if stop_event.wait(min(wait, 0.2)):
+                    return False
+            else:
+                time.sleep(wait)
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> bool:
+        """acquire 的协程版本，等待期间让出事件循环。"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return True
+            if deadline is not None and deadline - time.monotonic() < wait:
+                return False
+            await asyncio.sleep(wait)
+
+
+def _rate_from_env(endpoint: str, default: Optional[Tuple[int, float]]) -> Optional[Tuple[int, float]]:
+    """读取 STEAMDT_RATE_<ENDPOINT>，格式 "次数/周期秒"（如 "2/60"）；缺省或格式错误时用默认值（None 为不限频）。"""
+    raw = os.getenv(f"STEAMDT_RATE_{endpoint.upper()}")
+    if not raw:
+        return default
+    try:
+        count, period = raw.split("/", 1)
+        count, period = int(count), float(period)
+    except ValueError:
+        return default
+    if count < 1 or period <= 0:
+        return default
+    return count, period
+
+
+# 各接口限频：(次数, 周期秒)。同一 API key 的同一接口共享一个令牌桶。
+# 默认值来源：
+#   base / price_single 为 SteamDT 开放平台文档标注的额度（每日 1 次 / 每分钟 60 次，
+#   见 https://doc.steamdt.com/278832832e0 与 https://doc.steamdt.com/6369437m0）；
+#   price_batch 文档（https://doc.steamdt.com/278832831e0）未标注额度，默认不在客户端限频
+#   （None），后台任务按各自的间隔调度；price_avg 未标注，按单条查询取每分钟 60 次。
+# 账号额度不同时可用环境变量 STEAMDT_RATE_BASE / STEAMDT_RATE_PRICE_SINGLE /
+# STEAMDT_RATE_PRICE_BATCH / STEAMDT_RATE_PRICE_AVG 覆盖（如 STEAMDT_RATE_PRICE_BATCH=1/60）。
+RATE_LIMITS: Dict[str, Optional[Tuple[int, float]]] = {
+    endpoint: _rate_from_env(endpoint, default)
+    for endpoint, default in {
+        "base": (1, 86400),
+        "price_single": (60, 60),
+        "price_batch": None,
+        "price_avg": (60, 60),
+    }.items()
+}
+
+_buckets: Dict[Tuple[str, str], TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def shared_bucket(api_key: str | None, endpoint: str,
+                  limits: Dict[str, Optional[Tuple[int, float]]] = RATE_LIMITS) -> Optional[TokenBucket]:
+    """返回 (api_key, endpoint) 对应的进程内共享令牌桶（同步与异步客户端共用）；该接口不限频时返回 None。"""
+    if limits.get(endpoint) is None:
+        return None
+    key = (api_key or "", endpoint)
+    with _buckets_lock:
+        b = _buckets.get(key)
+        if b is None:
+            capacity, period = limits[endpoint]
+            b = _buckets[key] = TokenBucket(capacity, period)
+        return b
+
+
+def capped_wait(endpoint_wait: Optional[float], cap: Optional[float]) -> Optional[float]:
+    """接口默认等待与调用方上限取较小者（None 表示不限）。"""
+    if cap is None:
+        return endpoint_wait
+    return cap if endpoint_wait is None else min(endpoint_wait, cap)
+
+
 class SteamDTClient:
     BASE_URL = "https://open.steamdt.com"
 
-    def __init__(self, api_key: str | None = None):
+    RATE_LIMITS: Dict[str, Optional[Tuple[int, float]]] = RATE_LIMITS
+    # 调用方最长阻塞等待（秒）；超过则抛出 RateLimitError。基础信息每日一次，不等待。
+    MAX_WAIT: Dict[str, float] = {
+        "base": 0,
+        "price_single": 60,
+        "price_batch": 120,
+        "price_avg": 60,
+    }
+
+    def __init__(self, api_key: str | None = None, rate_limit: bool = True, base_url: str | None = None,
+                 max_wait: Optional[float] = None):
         self.api_key = api_key or os.getenv("STEAMDT_API_KEY")
+        self.rate_limit = rate_limit
+        # 各接口等待令牌的上限：请求处理线程用短等待，取不到令牌由视图返回 429 而不是占住工作线程
+        self.max_wait = max_wait
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
         self.session = requests.Session()
         if self.api_key:
             self.session.headers.update({
@@ -17,13 +170,34 @@ class SteamDTClient:
         if not self.api_key:
             raise RuntimeError("未配置 STEAMDT_API_KEY，请在环境变量中设置后重试。")
 
+    def bucket(self, endpoint: str) -> Optional[TokenBucket]:
+        """返回 (api_key, endpoint) 对应的共享令牌桶；该接口不限频时为 None。"""
+        return shared_bucket(self.api_key, endpoint, self.RATE_LIMITS)
+
+    def limited(self, endpoint: str) -> bool:
+        """该接口是否在客户端限频（不限频时后台任务按自身间隔调度）。"""
+        return self.rate_limit and self.RATE_LIMITS.get(endpoint) is not None
+
+    def wait_time(self, endpoint: str) -> float:
+        """距离该接口下一个可用令牌的秒数（不消耗令牌）。"""
+        b = self.bucket(endpoint) if self.rate_limit else None
+        return b.wait_time() if b is not None else 0.0
+
+    def _throttle(self, endpoint: str):
+        b = self.bucket(endpoint) if self.rate_limit else None
+        if b is None:
+            return
+        if not b.acquire(timeout=capped_wait(self.MAX_WAIT.get(endpoint), self.max_wait)):
+            raise RateLimitError(endpoint, b.wait_time())
+
     def get_base_info(self):
         """GET /open/cs2/v1/base (每日 1 次)
         返回包含 name, marketHashName, platformList[{ name, itemId }]
         文档: https://doc.steamdt.com/278832832e0
         """
         self._ensure_key()
-        url = f"{self.BASE_URL}/open/cs2/v1/base"
+        self._throttle("base")
+        url = f"{self.base_url}/open/cs2/v1/base"
         resp = self.session.get(url, timeout=30)
         resp.raise_for_status()
         return resp.json()
@@ -34,7 +208,8 @@ class SteamDTClient:
         文档汇总: https://doc.steamdt.com/6369437m0
         """
         self._ensure_key()
-        url = f"{self.BASE_URL}/open/cs2/v1/price/single"
+        self._throttle("price_single")
+        url = f"{self.base_url}/open/cs2/v1/price/single"
         params = {"marketHashName": market_hash_name}
         resp = self.session.get(url, params=params, timeout=30)
         resp.raise_for_status()
@@ -46,7 +221,8 @@ class SteamDTClient:
         文档: https://doc.steamdt.com/278832831e0
         """
         self._ensure_key()
-        url = f"{self.BASE_URL}/open/cs2/v1/price/batch"
+        self._throttle("price_batch")
+        url = f"{self.base_url}/open/cs2/v1/price/batch"
         json_body = {"marketHashNames": market_hash_names}
         resp = self.session.post(url, json=json_body, timeout=60)
         resp.raise_for_status()
@@ -58,8 +234,40 @@ class SteamDTClient:
         文档: https://doc.steamdt.com/319748133e0
         """
         self._ensure_key()
-        url = f"{self.BASE_URL}/open/cs2/v1/price/avg"
+        self._throttle("price_avg")
+        url = f"{self.base_url}/open/cs2/v1/price/avg"
         params = {"marketHashName": market_hash_name}
         resp = self.session.get(url, params=params, timeout=30)
         resp.raise_for_status()
-        return resp.json()
\ No newline at end of file
+        return resp.json()
+
+
+class KeyPool:
+    """N 把 API key 对应的 SteamDTClient 集合，每把 key 各自独立限频。"""
+
+    def __init__(self, clients: list["SteamDTClient"]):
+        self.clients = [c for c in clients if c is not None and c.api_key]
+
+    @classmethod
+    def from_env(cls, prefix: str = "STEAMDT_API_KEY_", max_keys: int = 64) -> "KeyPool":
+        """从 STEAMDT_API_KEY_1..N 读取（遇到第一个缺失编号停止）；_1/_2 兼容 _A/_B。"""
+        fallback = {1: "STEAMDT_API_KEY_A", 2: "STEAMDT_API_KEY_B"}
+        keys: list[str] = []
+        for i in range(1, max_keys + 1):
+            key = os.getenv(f"{prefix}{i}") or (os.getenv(fallback[i]) if i in fallback else None)
+            if not key:
+                break
+            if key not in keys:
+                keys.append(key)
+        return cls([SteamDTClient(api_key=k) for k in keys])
+
+    def __len__(self) -> int:
+        return len(self.clients)
+
+    def __iter__(self):
+        return iter(self.clients)
+
+    @staticmethod
+    def mask(api_key: str | None) -> str:
+        k = api_key or ""
+        return (k[:4] + "***" + k[-4:]) if len(k) > 8 else "***"
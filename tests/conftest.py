@@ -0,0 +1,32 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# db.py 在导入时建引擎并创建 ./data：测试统一在临时目录中运行，使用独立的 SQLite 文件
+ROOT = Path(__file__).resolve().parent.parent
+_TMP = tempfile.mkdtemp(prefix="steamdt-tests-")
+os.chdir(_TMP)
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(_TMP, "test.db"))
+os.environ.setdefault("PRICE_JOB_AUTO_RESUME", "0")
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def db():
+    """建表并执行迁移（整个测试会话共用一个临时库）。"""
+    import db as db_module
+    db_module.init_db()
+    return db_module
+
+
+@pytest.fixture(scope="session")
+def client(db):
+    from app import create_app
+    app = create_app()
+    app.config["TESTING"] = True
+    return app.test_client()
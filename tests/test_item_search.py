@@ -0,0 +1,135 @@
+import pytest
+from sqlalchemy import text
+
+from item_search import decode_cursor, encode_cursor
+from price_normalizer import PriceRow
+from price_ingest import ingest_price_rows
+
+PREFIX = "Cursor Paging |"
+
+
+def test_cursor_round_trip():
+    for key in ([42], ["AK-47 | Redline (Field-Tested)"], [12.5, 7], ["名称 \"引号\"", 3]):
+        cur = encode_cursor("min_price", "desc", key)
+        assert "=" not in cur and "/" not in cur and "+" not in cur
+        assert decode_cursor(cur, "min_price", "desc") == key
+
+
+def test_cursor_rejects_other_sort_and_garbage():
+    cur = encode_cursor("id", "asc", [1])
+    with pytest.raises(ValueError):
+        decode_cursor(cur, "id", "desc")
+    with pytest.raises(ValueError):
+        decode_cursor(cur, "default", "asc")
+    for bad in ("", "!!!", encode_cursor("id", "asc", [1])[:-3], "eyJzIjoiaWQifQ"):
+        with pytest.raises(ValueError):
+            decode_cursor(bad, "id", "asc")
+
+
+@pytest.fixture(scope="module")
+def catalogue(db):
+    with db.SessionLocal() as sess:
+        items = [db.Item(name=f"{PREFIX} {i:02d}", market_hash_name=f"{PREFIX} {i:02d}") for i in range(23)]
+        sess.add_all(items)
+        sess.commit()
+        # 价格有并列、也有无价条目，覆盖 (价格, id) 复合游标
+        ingest_price_rows(sess, [
+            PriceRow(it.market_hash_name, "BUFF", None, float(i % 5 + 1), None, None, None, 1_700_000_000_000)
+            for i, it in enumerate(items) if i % 4
+        ])
+        sess.commit()
+        return [it.market_hash_name for it in items]
+
+
+def _pages(client, **params):
+    names, cursor, pages = [], None, 0
+    while True:
+        args = {"q": PREFIX, "limit": 5, **params}
+        if cursor:
+            args["cursor"] = cursor
+        body = client.get("/api/admin/items", query_string=args).get_json()
+        assert body["success"], body
+        names += [d["marketHashName"] for d in body["data"]]
+        pages += 1
+        cursor = body["nextCursor"]
+        if not cursor:
+            return names, pages
+
+
+@pytest.mark.parametrize("sort_by,order", [("", "asc"), ("id", "asc"), ("id", "desc"),
+                                           ("minPrice", "asc"), ("minPrice", "desc")])
+def test_keyset_pages_match_single_query(client, catalogue, sort_by, order):
+    full = client.get("/api/admin/items", query_string={"q": PREFIX, "limit": 200, "sortBy": sort_by,
+                                                         "order": order}).get_json()
+    expected = [d["marketHashName"] for d in full["data"]]
+    assert sorted(expected) == sorted(catalogue)
+    names, pages = _pages(client, sortBy=sort_by, order=order)
+    assert names == expected
+    assert pages == 5
+
+
+def test_cursor_from_other_sort_is_rejected(client, catalogue):
+    body = client.get("/api/admin/items", query_string={"q": PREFIX, "limit": 5, "sortBy": "id"}).get_json()
+    resp = client.get("/api/admin/items", query_string={"q": PREFIX, "limit": 5, "sortBy": "minPrice",
+                                                         "cursor": body["nextCursor"]})
+    assert resp.status_code == 400
+
+
+def test_admin_item_writes_go_through_writer(client):
+    from write_queue import ingest_writer
+    name = "Admin | Writer Item"
+    before = ingest_writer.tasks
+    body = {"marketHashName": name, "name": name, "platformList": [{"name": "c5", "itemId": "7"}]}
+    resp = client.post("/api/admin/item", json=body)
+    assert resp.get_json()["item"]["platformList"] == [{"name": "C5GAME", "itemId": "7"}]
+    assert client.post("/api/admin/item", json=body).status_code == 409
+    assert client.delete("/api/admin/item", query_string={"marketHashName": name}).get_json()["success"]
+    assert client.delete("/api/admin/item", query_string={"marketHashName": name}).status_code == 404
+    # 其他后台写入（启动时的孤儿行补齐）也可能计入
+    assert ingest_writer.tasks - before >= 4
+
+
+def test_min_sell_price_follows_latest_prices(db, client):
+    name = "Min Price | Tracked"
+    with db.SessionLocal() as sess:
+        ingest_price_rows(sess, [PriceRow(name, "BUFF", None, 9.0, None, None, None, 1_700_000_000_000)])
+        sess.commit()
+    # 入目录前已有快照：建条目时补上最低价
+    client.post("/api/admin/item", json={"marketHashName": name, "name": name})
+    with db.SessionLocal() as sess:
+        ingest_price_rows(sess, [
+            PriceRow(name, "STEAM", None, 7.0, None, None, None, 1_700_000_000_000),
+            PriceRow(name, "C5GAME", None, 0.0, None, None, None, 1_700_000_000_000),
+        ])
+        sess.commit()
+        assert sess.query(db.Item.min_sell_price).filter(db.Item.market_hash_name == name).scalar() == 7.0
+        ingest_price_rows(sess, [PriceRow(name, "STEAM", None, None, 3.0, None, None, 1_700_000_001_000)])
+        sess.commit()
+        assert sess.query(db.Item.min_sell_price).filter(db.Item.market_hash_name == name).scalar() == 9.0
+        # 迁移回填与增量维护一致
+        sess.execute(text("UPDATE items SET min_sell_price = NULL"))
+        db.migrate_item_min_sell(sess.connection())
+        assert sess.query(db.Item.min_sell_price).filter(db.Item.market_hash_name == name).scalar() == 9.0
+        sess.commit()
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_min_price_offset_crosses_into_unpriced(client, catalogue, order):
+    args = {"q": PREFIX, "sortBy": "minPrice", "order": order}
+    full = [d["marketHashName"] for d in client.get("/api/admin/items", query_string={**args, "limit": 200})
+            .get_json()["data"]]
+    # 无价条目（每 4 个中的第 1 个）按 id 升序排在最后
+    assert full[-6:] == [catalogue[i] for i in range(0, 23, 4)]
+    for offset in (3, 17, 20):
+        page = client.get("/api/admin/items", query_string={**args, "limit": 5, "offset": offset}).get_json()
+        assert [d["marketHashName"] for d in page["data"]] == full[offset:offset + 5]
+
+
+def test_min_price_pages_read_in_index_order(db):
+    with db.engine.connect() as conn:
+        for op, direction in ((">", "ASC"), ("<", "DESC")):
+            plan = " ".join(r[3] for r in conn.execute(text(
+                f"EXPLAIN QUERY PLAN SELECT id FROM items WHERE min_sell_price IS NOT NULL "
+                f"AND (min_sell_price, id) {op} (5.0, 10) "
+                f"ORDER BY min_sell_price {direction}, id {direction} LIMIT 6")))
+            assert "idx_items_min_sell_price" in plan and "TEMP B-TREE" not in plan
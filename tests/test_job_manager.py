@@ -0,0 +1,189 @@
+import threading
+import time
+
+import pytest
+
+import job_manager
+from job_manager import DualApiSequentialJob, MultiKeyParallelJob, PriceBatchJob
+from steamdt_client import KeyPool
+
+
+class FakeClient:
+    api_key = "fake-key"
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_price_batch(self, names):
+        self.calls += 1
+        return {"success": True, "data": []}
+
+    def wait_time(self, endpoint):
+        return 0.0
+
+    def limited(self, endpoint):
+        return False
+
+
+class SlowLedger:
+    """运行记录的替身：open / set_status 在 gate 打开前阻塞，模拟写线程上排队的往返。"""
+
+    def __init__(self, unfinished=None):
+        self.gate = threading.Event()
+        self.statuses = []
+        self._unfinished = unfinished
+
+    def unfinished(self):
+        if isinstance(self._unfinished, BaseException):
+            raise self._unfinished
+        return self._unfinished
+
+    def open(self, *args):
+        self.gate.wait(5)
+        return 1
+
+    def reopen(self, run_id, max_id):
+        self.gate.wait(5)
+
+    def set_status(self, run_id, status):
+        self.gate.wait(5)
+        self.statuses.append((run_id, status))
+
+    def checkpoint(self, *args, **kwargs):
+        pass
+
+    def checkpoint_now(self, *args):
+        pass
+
+    def record_error(self, *args):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def items(db):
+    """批次为 1 时库里需有多件饰品，任务才不会在首批后跑完退出。"""
+    with db.SessionLocal() as sess:
+        if sess.query(db.Item).count() < 3:
+            sess.add_all(db.Item(name=f"Job | {i}", market_hash_name=f"Job | {i}") for i in range(3))
+            sess.commit()
+
+
+def _job(db):
+    job = PriceBatchJob(client=FakeClient(), get_session=db.SessionLocal, batch_size=1, interval_sec=3600)
+    job.runs = SlowLedger()
+    return job
+
+
+def _paused_run():
+    return {"id": 1, "status": "paused", "nextStartId": 2, "batchSize": 1, "intervalSec": 3600,
+            "scheduleMode": "fixed", "dedup": False}
+
+
+def _in_thread(fn):
+    t = threading.Thread(target=fn, daemon=True)
+    t.start()
+    return t
+
+
+def _assert_status_responsive(job):
+    t0 = time.monotonic()
+    status = job.status()
+    assert time.monotonic() - t0 < 0.5
+    return status
+
+
+def test_ledger_writes_happen_outside_the_job_lock(db):
+    job = _job(db)
+    starter = _in_thread(job.start)
+    time.sleep(0.05)
+    assert _assert_status_responsive(job)["running"]
+    job.runs.gate.set()
+    starter.join(5)
+    job.runs.gate.clear()
+
+    pauser = _in_thread(job.pause)
+    time.sleep(0.05)
+    assert _assert_status_responsive(job)["paused"]
+    resumer = _in_thread(job.resume)
+    time.sleep(0.05)
+    assert not _assert_status_responsive(job)["paused"]
+    job.runs.gate.set()
+    pauser.join(5)
+    resumer.join(5)
+    # 写入按状态切换的先后落库，最终记录与内存状态一致
+    assert job.runs.statuses[-1] == (1, "running")
+
+    job.stop()
+    assert job.runs.statuses[-1] == (1, "stopped")
+    assert not job.status()["running"]
+
+
+def test_stop_during_start_abandons_the_run(db):
+    job = _job(db)
+    starter = _in_thread(job.start)
+    time.sleep(0.05)
+    job.stop()
+    job.runs.gate.set()
+    starter.join(5)
+    status = job.status()
+    assert not status["running"] and status["runId"] is None
+    assert job._thread is None
+    assert job.runs.statuses == [(1, "stopped")]
+
+
+def test_start_while_running_returns_status(db):
+    job = _job(db)
+    job.runs.gate.set()
+    job.start()
+    try:
+        assert job.start()["running"]
+    finally:
+        job.stop()
+
+
+@pytest.mark.parametrize("make", [
+    lambda db: DualApiSequentialJob(FakeClient(), FakeClient(), db.SessionLocal, batch_size=1, interval_sec=3600),
+    lambda db: MultiKeyParallelJob(KeyPool([FakeClient()]), db.SessionLocal, batch_size=1),
+])
+def test_last_seen_warm_happens_outside_the_job_lock(db, monkeypatch, make):
+    gate = threading.Event()
+
+    def slow_warm(sess):
+        gate.wait(5)
+        return None
+    monkeypatch.setattr(job_manager.LastSeenCache, "warm", slow_warm)
+    job = make(db)
+    starter = _in_thread(job.start)
+    time.sleep(0.05)
+    assert not _assert_status_responsive(job)["running"]
+    gate.set()
+    starter.join(5)
+    try:
+        assert job.status()["running"]
+    finally:
+        job.stop()
+
+
+def test_resume_paused_run_starts_paused(db):
+    job = _job(db)
+    job.runs = SlowLedger(unfinished=_paused_run())
+    job.runs.gate.set()
+    try:
+        status = job.resume_from_checkpoint()
+        assert status["running"] and status["paused"] and status["currentStartId"] == 2
+        time.sleep(0.3)
+        # 线程自始暂停：续跑不会先抓一批
+        assert job.client.calls == 0
+        assert job.runs.statuses == [(1, "paused")]
+    finally:
+        job.stop()
+
+
+def test_resume_failure_is_reported_in_status(db):
+    job = _job(db)
+    job.runs = SlowLedger(unfinished=RuntimeError("database is locked"))
+    with pytest.raises(RuntimeError):
+        job.resume_from_checkpoint()
+    status = job.status()
+    assert not status["running"]
+    assert status["lastError"] == "续跑失败：database is locked"
@@ -0,0 +1,124 @@
+import io
+import json
+
+import pytest
+
+from json_stream import JSONStreamError, _Reader, iter_chunks, iter_json_items, spool_stream
+from price_normalizer import extract_items
+
+
+class Trickle:
+    """每次 read 最多返回 step 个字节，模拟分块到达的请求体（块边界可落在任意字符中间）。"""
+
+    def __init__(self, data: bytes, step: int):
+        self.buf = io.BytesIO(data)
+        self.step = step
+
+    def read(self, size=-1):
+        return self.buf.read(self.step if size is None or size < 0 else min(size, self.step))
+
+
+STEPS = (1, 2, 3, 7, 64, 1 << 16)
+
+
+def _items(payload, step, prefix=b""):
+    raw = prefix + (payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+    return list(iter_json_items(Trickle(raw, step)))
+
+
+ITEM = {
+    "marketHashName": 'AK-47 | "Redline" \\ (Field-Tested) 中文 é 🎯',
+    "platformList": [{"name": "BUFF", "itemId": "1"}, {"name": "C5", "itemId": "2"}],
+    "sellPrice": 1.5e3,
+    "biddingPrice": -0.25,
+    "meta": {"data": [1, [2, {"items": []}]], "note": "a,b]}{\n\t"},
+}
+ITEMS = [ITEM, {**ITEM, "marketHashName": "Second"}, {"marketHashName": "Third", "platformList": []}]
+
+PAYLOADS = [
+    ITEMS,
+    [],
+    {"success": True, "data": ITEMS},
+    {"items": ITEMS, "total": 3},
+    {"code": 0, "msg": "ok", "results": ITEMS},
+    {"responses": [{"data": ITEMS[:1]}, "skip", {"items": ITEMS[1:]}, {"results": []}]},
+    {"data": []},
+    ITEM,
+    {"success": False, "msg": "nothing"},
+]
+
+
+@pytest.mark.parametrize("step", STEPS)
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_matches_extract_items_at_any_chunk_boundary(payload, step):
+    assert _items(payload, step) == extract_items(payload)
+
+
+@pytest.mark.parametrize("step", (1, 5))
+def test_escapes_bom_and_text_streams(step):
+    raw = json.dumps({"data": ITEMS}).encode("ascii")  # \uXXXX 转义（含代理对）
+    assert _items(raw, step, prefix=b"\xef\xbb\xbf") == ITEMS
+    assert list(iter_json_items(io.StringIO(json.dumps(ITEMS, ensure_ascii=False)))) == ITEMS
+
+
+def test_numbers_split_by_chunk_boundary():
+    for text in ("1.5e3", "-0.25", "12345678901234567890", "3E-2"):
+        r = _Reader(Trickle(f"[{text}, 0]".encode(), 2), chunk_size=1)
+        values = []
+        for _ in r.array():
+            values.append(r.value())
+        assert values == [json.loads(text), 0]
+
+
+def test_first_item_source_wins():
+    payload = {"data": [{"marketHashName": "A"}], "items": [{"marketHashName": "B"}], "marketHashName": "C"}
+    assert _items(payload, 3) == [{"marketHashName": "A"}]
+    # 只有 marketHashName 的根对象按单条目产出
+    assert _items({"marketHashName": "C", "x": [1]}, 3) == [{"marketHashName": "C", "x": [1]}]
+
+
+@pytest.mark.parametrize("raw", [
+    b"",
+    b"   ",
+    b'"just a string"',
+    b"42",
+    b'[{"a": 1}',
+    b'[{"a": 1} {"b": 2}]',
+    b"[1,]",
+    b'{"data": [1 2]}',
+    b'{"data": [1, 2]',
+    b'{"data" [1]}',
+    b'{1: [1]}',
+    b'{"data": [{"a": "unterminated}]}',
+    b'{"data": [tru]}',
+])
+@pytest.mark.parametrize("step", (1, 64))
+def test_malformed_input_raises(raw, step):
+    with pytest.raises(JSONStreamError):
+        list(iter_json_items(Trickle(raw, step)))
+
+
+def test_items_before_the_error_are_yielded():
+    it = iter_json_items(Trickle(b'{"data": [{"a": 1}, {"b": 2}, oops]}', 4))
+    assert next(it) == {"a": 1} and next(it) == {"b": 2}
+    with pytest.raises(JSONStreamError):
+        next(it)
+
+
+def test_iter_chunks():
+    assert list(iter_chunks(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(iter_chunks(range(6), 3)) == [[0, 1, 2], [3, 4, 5]]
+    assert list(iter_chunks([], 3)) == []
+    # 接受生成器，只遍历一次
+    assert list(iter_chunks(iter_json_items(io.BytesIO(json.dumps(ITEMS).encode())), 2)) == [ITEMS[:2], ITEMS[2:]]
+
+
+@pytest.mark.parametrize("size,rolled", [(100, False), (5000, True)])
+def test_spool_stream(size, rolled):
+    raw = bytes(range(256)) * (size // 256 + 1)
+    spool = spool_stream(Trickle(raw, 97), max_memory=1024, chunk_size=64)
+    try:
+        assert spool._rolled is rolled
+        assert spool.read() == raw
+    finally:
+        spool.close()
@@ -0,0 +1,118 @@
+from sqlalchemy import inspect, text
+
+from price_normalizer import PriceRow
+from price_ingest import ingest_price_rows
+
+
+def _tables(db):
+    with db.engine.connect() as conn:
+        return set(inspect(conn).get_table_names())
+
+
+def _ledger(db):
+    with db.engine.connect() as conn:
+        return {r[0] for r in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def test_migration_and_ledger_commit_together(db, monkeypatch):
+    def ok(conn):
+        conn.execute(text("CREATE TABLE _mig_ok (x INTEGER)"))
+
+    def broken(conn):
+        conn.execute(text("CREATE TABLE _mig_broken (x INTEGER)"))
+        conn.execute(text("INSERT INTO _mig_broken VALUES (1)"))
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(db, "MIGRATIONS", (("9001_ok", ok), ("9002_broken", broken)))
+    results = []
+    db.run_migrations(results)
+    assert [(r["version"], r["applied"]) for r in results] == [("9001_ok", True), ("9002_broken", False)]
+    assert "9001_ok" in _ledger(db) and "9002_broken" not in _ledger(db)
+    assert "_mig_ok" in _tables(db)
+    # 失败迁移中的 DDL 随事务回滚
+    assert "_mig_broken" not in _tables(db)
+
+    results = []
+    db.run_migrations(results)
+    assert [r["version"] for r in results] == ["9002_broken"]
+
+
+def test_orphan_backfill_skips_rows_already_scanned(db):
+    name = "Orphan | Later Catalogued"
+    with db._orphan_lock:  # 等启动时的后台回填结束
+        with db.SessionLocal() as sess:
+            ingest_price_rows(sess, [PriceRow(name, "BUFF", None, 1.0, None, None, None, 1_700_000_000_000)])
+            sess.commit()
+        db.backfill_orphan_prices(pause=0)
+        with db.engine.connect() as conn:
+            mark = db.get_state(conn, "orphan.item_id.scanned_id")
+            assert mark > 0
+            # 目标表不变时，下次只会扫描 mark 之后的行
+            assert conn.execute(text(
+                "SELECT MIN(id) FROM prices WHERE item_id IS NULL AND id > :m"), {"m": mark}).scalar() is None
+
+        with db.SessionLocal() as sess:
+            sess.add(db.Item(name=name, market_hash_name=name))
+            sess.commit()
+        assert db.backfill_orphan_prices(pause=0) >= 1
+        with db.engine.connect() as conn:
+            assert conn.execute(text(
+                "SELECT COUNT(*) FROM prices WHERE market_hash_name = :n AND item_id IS NULL"), {"n": name}).scalar() == 0
+
+
+def _platforms(conn, item_id):
+    return [tuple(r) for r in conn.execute(text(
+        "SELECT p.id, p.name, p.platform_item_id, pc.name FROM platforms p "
+        "LEFT JOIN platform_codes pc ON pc.id = p.code_id WHERE p.item_id = :i ORDER BY p.id"
+    ), {"i": item_id})]
+
+
+def test_platform_normalization_migration_is_idempotent(db):
+    name = "Platforms | Mixed Case"
+    seed = [("c5", ""), ("C5GAME", "55"), ("halo", "h1"), ("Buff", ""), ("buff ", "b1"), ("Steam", None)]
+    with db.engine.begin() as conn:
+        item_id = conn.execute(text(
+            "INSERT INTO items (name, market_hash_name) VALUES (:n, :n) RETURNING id"), {"n": name}).scalar_one()
+        ids = {}
+        for pname, pid in seed:
+            ids[pname] = conn.execute(text(
+                "INSERT INTO platforms (item_id, name, platform_item_id) VALUES (:i, :n, :p) RETURNING id"
+            ), {"i": item_id, "n": pname, "p": pid}).scalar_one()
+        # 价格行引用即将被合并的重复记录
+        for table in ("prices", "latest_prices"):
+            for pname in ("C5GAME", "buff "):
+                conn.execute(text(
+                    f"INSERT INTO {table} (market_hash_name, platform, item_id, platform_id, sell_price, created_at) "
+                    f"VALUES (:m, :p, :i, :pid, 1.0, CURRENT_TIMESTAMP)"
+                ), {"m": name, "p": pname.strip().upper(), "i": item_id, "pid": ids[pname]})
+        # 迁移前的库没有 code_id
+        conn.execute(text("UPDATE platforms SET code_id = NULL WHERE item_id = :i"), {"i": item_id})
+
+    with db.engine.begin() as conn:
+        db.migrate_platform_codes(conn)
+        after = _platforms(conn, item_id)
+        refs = {tuple(r) for table in ("prices", "latest_prices") for r in conn.execute(text(
+            f"SELECT platform, platform_id FROM {table} WHERE market_hash_name = :m"), {"m": name})}
+    # 别名与大小写归并到规范名，保留 id 最小的一条并补齐 itemId
+    assert after == [
+        (ids["c5"], "C5GAME", "55", "C5GAME"),
+        (ids["halo"], "HALOSKINS", "h1", "HALOSKINS"),
+        (ids["Buff"], "BUFF", "b1", "BUFF"),
+        (ids["Steam"], "STEAM", None, "STEAM"),
+    ]
+    assert refs == {("C5GAME", ids["c5"]), ("BUFF", ids["Buff"])}
+
+    with db.engine.begin() as conn:
+        assert db.normalize_platforms(conn) == {"normalized": 0, "merged": 0}
+        db.migrate_platform_codes(conn)
+        assert _platforms(conn, item_id) == after
+
+    # 迁移后建立的触发器按规范名维护 code_id
+    with db.engine.begin() as conn:
+        conn.execute(text("UPDATE platforms SET name = 'halo' WHERE id = :id"), {"id": ids["Steam"]})
+        new_id = conn.execute(text(
+            "INSERT INTO platforms (item_id, name) VALUES (:i, 'c5 ') RETURNING id"), {"i": item_id}).scalar_one()
+        codes = dict(conn.execute(text(
+            "SELECT p.id, pc.name FROM platforms p JOIN platform_codes pc ON pc.id = p.code_id "
+            "WHERE p.id IN (:a, :b)"), {"a": ids["Steam"], "b": new_id}).all())
+    assert codes == {ids["Steam"]: "HALOSKINS", new_id: "C5GAME"}
@@ -0,0 +1,237 @@
+"""PostgreSQL 专用路径：分区 prices、COPY 导入、plpgsql 平台编码触发器、pg_trgm 索引与分区摘除。
+
+db.py 在导入时按 DATABASE_URL 建引擎，本测试会话用的是 SQLite，因此每个用例在子进程中
+连接由 pgserver 启动的临时 PostgreSQL 执行；未安装 pgserver / psycopg2 时整体跳过。
+"""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+pgserver = pytest.importorskip("pgserver")
+pytest.importorskip("psycopg2")
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_PRELUDE = """
+import json, time
+from datetime import datetime, timezone
+from sqlalchemy import text
+import db
+from db import engine, SessionLocal
+
+def rows(sql, **params):
+    with engine.connect() as conn:
+        return [list(r) for r in conn.execute(text(sql), params).fetchall()]
+
+def done(**out):
+    print(json.dumps(out, default=str))
+"""
+
+
+@pytest.fixture(scope="module")
+def pg(tmp_path_factory):
+    """启动临时 PostgreSQL、建一个空库并执行 init_db，返回在子进程中运行代码的函数。"""
+    base = tmp_path_factory.mktemp("pg")
+    server = pgserver.get_server(str(base / "data"), cleanup_mode="stop")
+    server.psql("CREATE DATABASE steamdt_test;")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"postgresql+psycopg2://postgres@/steamdt_test?host={base / 'data'}",
+        PRICE_JOB_AUTO_RESUME="0",
+        PYTHONPATH=str(ROOT),
+    )
+
+    def run(code: str) -> dict:
+        proc = subprocess.run(
+            [sys.executable, "-c", _PRELUDE + textwrap.dedent(code)],
+            env=env, cwd=str(base), capture_output=True, text=True, timeout=120,
+        )
+        assert proc.returncode == 0, proc.stderr
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+    run.report = run("""
+        report = db.init_db()
+        trgm = bool(rows("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"))
+        done(migrations=report["migrations"], trgm=trgm)
+    """)
+    yield run
+    server.cleanup()
+
+
+def test_init_db_partitions_prices(pg):
+    out = pg("""
+        pk = rows('''
+            SELECT a.attname FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = 'prices'::regclass AND i.indisprimary ORDER BY a.attname
+        ''')
+        strategy = rows("SELECT partstrat FROM pg_partitioned_table WHERE partrelid = 'prices'::regclass")
+        with engine.begin() as conn:
+            created_again = db.ensure_price_partitions(conn)
+            parts = db.price_partitions(conn)
+        now = datetime.now(timezone.utc)
+        done(pk=[r[0] for r in pk], strategy=strategy, created_again=created_again,
+             parts=[p["name"] for p in parts], current=f"prices_y{now.year}m{now.month:02d}",
+             tables=rows("SELECT tablename FROM pg_tables WHERE tablename = 'prices_default'"))
+    """)
+    assert out["pk"] == ["created_at", "id"]
+    assert out["strategy"] == [["r"]]
+    assert out["created_again"] == []
+    assert out["parts"][0] == out["current"] and len(out["parts"]) == 13
+    assert out["tables"] == [["prices_default"]]
+    failed = [m for m in pg.report["migrations"] if not m["applied"]]
+    assert [m["version"] for m in failed] == ([] if pg.report["trgm"] else ["0006_items_fts"])
+
+
+def test_staged_import_copies_rows_and_rollups(pg):
+    out = pg("""
+        from price_normalizer import PriceRow
+        from price_ingest import StagedPriceImport, ingest_price_rows
+
+        t0 = 1_700_000_000_000
+        def batch(name):
+            return [
+                PriceRow(name, "BUFF", "1", 10.0, 9.0, 1, 1, t0),
+                PriceRow(name, "BUFF", "1", 12.0, None, 1, 1, t0 + 60_000),
+                PriceRow(name, "BUFF", "1", 11.0, 8.0, 1, 1, t0 + 2 * 3600_000),
+                PriceRow(name, "STEAM", "", None, 7.5, None, None, t0),
+            ]
+        staged_name = 'Copy | "Quoted", comma'
+        with SessionLocal() as sess:
+            sess.add(db.Item(name=staged_name, market_hash_name=staged_name))
+            sess.commit()
+            ingest_price_rows(sess, batch("Copy | Incremental"))
+            sess.commit()
+        for _ in range(2):
+            with SessionLocal() as sess:
+                staged = StagedPriceImport(sess)
+                staged.stage(batch(staged_name))
+                result = staged.apply()
+                sess.commit()
+
+        def rollups(table, name):
+            return rows(f'''
+                SELECT platform, bucket_start, sell_sum, sell_samples, sell_min, sell_max,
+                       bidding_sum, bidding_samples, bidding_min, bidding_max
+                FROM {table} WHERE market_hash_name = :n ORDER BY platform, bucket_start
+            ''', n=name)
+        done(
+            result=result,
+            prices=rows('''
+                SELECT platform, platform_item_id, sell_price, sell_count, update_time_text,
+                       item_id IS NOT NULL, platform_id IS NOT NULL, tableoid::regclass::text
+                FROM prices WHERE market_hash_name = :n ORDER BY id
+            ''', n=staged_name),
+            latest=rows("SELECT platform, sell_price FROM latest_prices WHERE market_hash_name = :n "
+                        "ORDER BY platform", n=staged_name),
+            min_sell=rows("SELECT min_sell_price FROM items WHERE market_hash_name = :n", n=staged_name),
+            hourly=[rollups("price_rollups_hourly", n) for n in ("Copy | Incremental", staged_name)],
+            daily=[rollups("price_rollups_daily", n) for n in ("Copy | Incremental", staged_name)],
+            current=f"prices_y{datetime.now(timezone.utc):%Y}m{datetime.now(timezone.utc):%m}",
+        )
+    """)
+    assert out["result"]["inserted"] == 4 and out["result"]["overwritten"] == 4
+    assert out["result"]["platforms_created"] == 0
+    prices = out["prices"]
+    assert [p[:4] for p in prices] == [
+        ["BUFF", "1", 10.0, 1], ["BUFF", "1", 12.0, 1], ["BUFF", "1", 11.0, 1], ["STEAM", "", None, None],
+    ]
+    assert prices[0][4] == "2023-11-15 06:13:20"
+    assert all(p[5] for p in prices) and [p[6] for p in prices] == [True, True, True, False]
+    assert {p[7] for p in prices} == {out["current"]}
+    assert out["latest"] == [["BUFF", 11.0], ["STEAM", None]]
+    assert out["min_sell"] == [[11.0]]
+    # 第二次导入先扣除被覆盖行的贡献：汇总与一次增量入库相同
+    for inc, staged in (out["hourly"], out["daily"]):
+        assert inc and staged == inc
+
+
+def test_platform_code_trigger(pg):
+    out = pg("""
+        with SessionLocal() as sess:
+            item = db.Item(name="Trigger | Item", market_hash_name="Trigger | Item")
+            sess.add(item)
+            sess.flush()
+            p = db.Platform(item_id=item.id, name="c5", platform_item_id="9")
+            sess.add(p)
+            sess.commit()
+            pid = p.id
+        before = rows("SELECT pc.name FROM platforms p JOIN platform_codes pc ON pc.id = p.code_id "
+                      "WHERE p.id = :id", id=pid)
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE platforms SET name = 'halo' WHERE id = :id"), {"id": pid})
+        after = rows("SELECT pc.name FROM platforms p JOIN platform_codes pc ON pc.id = p.code_id "
+                     "WHERE p.id = :id", id=pid)
+        done(before=before, after=after)
+    """)
+    assert out["before"] == [["C5GAME"]]
+    assert out["after"] == [["HALOSKINS"]]
+
+
+def test_trgm_index_serves_ilike(pg):
+    if not pg.report["trgm"]:
+        pytest.skip("pg_trgm 扩展不可用")
+    out = pg("""
+        idx = rows("SELECT indexname FROM pg_indexes WHERE tablename = 'items' AND indexname LIKE '%trgm' "
+                   "ORDER BY indexname")
+        with engine.begin() as conn:
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+            plan = [r[0] for r in conn.execute(text(
+                "EXPLAIN SELECT id FROM items WHERE market_hash_name ILIKE '%Quoted%'")).fetchall()]
+        done(idx=[r[0] for r in idx], plan=plan)
+    """)
+    assert out["idx"] == ["idx_items_mhn_trgm", "idx_items_name_trgm"]
+    assert any("idx_items_mhn_trgm" in line for line in out["plan"])
+
+
+def test_detach_old_partitions(pg):
+    out = pg("""
+        from retention import detach_price_partitions
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE prices_y2020m01 PARTITION OF prices FOR VALUES FROM ('2020-01-01') TO ('2020-02-01')"))
+            conn.execute(text(
+                "INSERT INTO prices (market_hash_name, platform, sell_price, update_time, created_at) "
+                "VALUES ('Detach | Old', 'BUFF', 1.0, 1579046400000, '2020-01-15')"))
+        moved = detach_price_partitions(int(time.time() * 1000))
+        with engine.connect() as conn:
+            parts = [p["name"] for p in db.price_partitions(conn)]
+        done(moved=moved, parts=parts,
+             attached=rows("SELECT COUNT(*) FROM prices WHERE market_hash_name = 'Detach | Old'"),
+             archived=rows("SELECT market_hash_name FROM prices_y2020m01"))
+    """)
+    assert out["moved"] == 1
+    assert "prices_y2020m01" not in out["parts"] and len(out["parts"]) == 13
+    assert out["attached"] == [[0]]
+    assert out["archived"] == [["Detach | Old"]]
+
+
+def test_retention_downsample(pg):
+    out = pg("""
+        from db import HOUR_MS, hour_bucket
+        from price_normalizer import PriceRow
+        from price_ingest import ingest_price_rows
+        from retention import RetentionPolicy, RetentionRunner
+
+        now = int(time.time() * 1000)
+        old = hour_bucket(now - 36 * HOUR_MS)
+        with SessionLocal() as sess:
+            ingest_price_rows(sess, [PriceRow("Retention | PG", "BUFF", None, float(i), None, None, None, old + i)
+                                     for i in range(1, 4)])
+            sess.commit()
+        runner = RetentionRunner(RetentionPolicy(raw_ttl_days=1, hourly_ttl_days=0, rollup_hourly_ttl_days=1))
+        result = runner.run_once()
+        with engine.connect() as conn:
+            mark = db.get_state(conn, "retention.id_mark")
+        done(result=result, error=runner.last_error, mark=mark, old=old,
+             left=rows("SELECT update_time FROM prices WHERE market_hash_name = 'Retention | PG'"))
+    """)
+    assert out["error"] is None
+    assert out["result"]["downsampled"] >= 2
+    assert out["left"] == [[out["old"] + 3]]
+    assert out["mark"] > 0
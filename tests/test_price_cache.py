@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+from price_cache import PriceCache
+
+
+def _ok(names):
+    return {"success": True, "data": [{"marketHashName": n, "sellPrice": len(n)} for n in names]}
+
+
+class Loader:
+    """记录调用的批量 loader；gate 给出时先阻塞，用来制造在途请求。"""
+
+    def __init__(self, result=_ok, gate=None):
+        self.result = result
+        self.gate = gate
+        self.calls = []
+        self.entered = threading.Event()
+
+    def __call__(self, names):
+        self.calls.append(list(names))
+        self.entered.set()
+        if self.gate is not None:
+            assert self.gate.wait(5)
+        return self.result(names)
+
+
+def _names(resp):
+    return [it["marketHashName"] for it in resp["data"]]
+
+
+def _in_thread(fn, *args):
+    out = {}
+
+    def run():
+        try:
+            out["value"] = fn(*args)
+        except Exception as e:
+            out["error"] = e
+    t = threading.Thread(target=run)
+    t.start()
+    return t, out
+
+
+def _coalesced(cache, first, second, names_a, names_b):
+    """first 的请求在途时发起 second（与之有重叠名称），等 second 挂上等待后再放行 first。"""
+    ta, a = _in_thread(cache.get_batch, "batch", names_a, first)
+    assert first.entered.wait(5)
+    tb, b = _in_thread(cache.get_batch, "batch", names_b, second)
+    deadline = time.monotonic() + 5
+    while cache.stats()["coalesced"] < len(set(names_a) & set(names_b)) and time.monotonic() < deadline:
+        time.sleep(0.005)
+    first.gate.set()
+    ta.join(5)
+    tb.join(5)
+    return a, b
+
+
+def test_batch_hits_misses_and_absent_names():
+    cache = PriceCache(ttl_sec=60)
+    loader = Loader(lambda names: _ok([n for n in names if n != "Unknown"]))
+    assert _names(cache.get_batch("batch", ["A", "Unknown", "B", "A"], loader)) == ["A", "B"]
+    assert _names(cache.get_batch("batch", ["B", "C", "A"], loader)) == ["B", "C", "A"]
+    assert loader.calls == [["A", "Unknown", "B"], ["C"]]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["upstreamCalls"]) == (2, 4, 2)
+
+
+def test_waiter_reuses_successful_flight():
+    cache = PriceCache()
+    first, second = Loader(gate=threading.Event()), Loader()
+    a, b = _coalesced(cache, first, second, ["A", "B"], ["B", "C"])
+    assert _names(a["value"]) == ["A", "B"]
+    assert _names(b["value"]) == ["B", "C"]
+    assert second.calls == [["C"]]
+
+
+def test_waiter_reloads_names_when_flight_fails():
+    cache = PriceCache()
+    first = Loader(lambda names: {"success": False, "errorMsg": "limited"}, gate=threading.Event())
+    second = Loader()
+    a, b = _coalesced(cache, first, second, ["A", "B"], ["B", "C"])
+    assert a["value"] == {"success": False, "errorMsg": "limited"}
+    assert b["value"]["success"] is True and _names(b["value"]) == ["B", "C"]
+    assert second.calls == [["C"], ["B"]]
+    # 重查的结果照常缓存
+    assert _names(cache.get_batch("batch", ["B"], Loader())) == ["B"]
+
+
+def test_flight_exception_does_not_leak_into_other_batch():
+    cache = PriceCache()
+
+    def boom(names):
+        raise ConnectionError("upstream down")
+    first, second = Loader(boom, gate=threading.Event()), Loader()
+    a, b = _coalesced(cache, first, second, ["A", "B"], ["B"])
+    assert isinstance(a["error"], ConnectionError)
+    assert "error" not in b and _names(b["value"]) == ["B"]
+    assert second.calls == [["B"]]
+    assert cache.stats()["inflight"] == 0
+
+
+def test_single_get_caches_only_success():
+    cache = PriceCache()
+    calls = []
+
+    def fail():
+        calls.append(1)
+        return {"success": False}
+    assert cache.get("single", "A", fail) == {"success": False}
+    assert cache.get("single", "A", lambda: {"success": True, "data": 1}) == {"success": True, "data": 1}
+    assert cache.get("single", "A", fail) == {"success": True, "data": 1}
+    assert calls == [1]
+    with pytest.raises(ValueError):
+        cache.get("single", "B", lambda: (_ for _ in ()).throw(ValueError("bad")))
+    assert cache.stats()["inflight"] == 0
@@ -0,0 +1,192 @@
+from sqlalchemy import select
+
+from price_normalizer import PriceRow
+from price_ingest import LastSeenCache, StagedPriceImport, ingest_price_rows
+
+
+def _rollups(db, model, name):
+    with db.SessionLocal() as sess:
+        rows = sess.execute(
+            select(model.platform, model.bucket_start, model.sell_sum, model.sell_samples, model.sell_min,
+                   model.sell_max, model.bidding_sum, model.bidding_samples, model.bidding_min, model.bidding_max)
+            .where(model.market_hash_name == name)
+            .order_by(model.platform, model.bucket_start)
+        ).all()
+    return [tuple(r) for r in rows]
+
+
+def _rows(name, t0):
+    return [
+        PriceRow(name, "BUFF", "1", 10.0, 9.0, 1, 1, t0),
+        PriceRow(name, "BUFF", "1", 12.0, None, 1, 1, t0 + 60_000),
+        PriceRow(name, "BUFF", "1", 11.0, 8.0, 1, 1, t0 + 2 * 3600_000),
+        PriceRow(name, "STEAM", None, None, 7.5, 1, 1, t0),
+        PriceRow(name, "STEAM", None, None, None, 1, 1, t0),
+    ]
+
+
+def test_staged_import_updates_rollups_like_incremental_ingest(db):
+    t0 = 1_700_000_000_000
+    with db.SessionLocal() as sess:
+        ingest_price_rows(sess, _rows("Rollup | Incremental", t0))
+        sess.commit()
+    with db.SessionLocal() as sess:
+        staged = StagedPriceImport(sess)
+        staged.stage(_rows("Rollup | Staged", t0))
+        result = staged.apply()
+        sess.commit()
+    assert result["inserted"] == 5
+    assert result["rollup_buckets"] > 0
+    for model in (db.PriceRollupHourly, db.PriceRollupDaily):
+        expected = _rollups(db, model, "Rollup | Incremental")
+        assert expected
+        assert _rollups(db, model, "Rollup | Staged") == expected
+
+
+def _import(db, rows):
+    with db.SessionLocal() as sess:
+        staged = StagedPriceImport(sess)
+        staged.stage(rows)
+        result = staged.apply()
+        sess.commit()
+    return result
+
+
+def test_staged_reimport_replaces_rollup_contributions(db):
+    t0 = 1_700_000_000_000
+    name = "Rollup | Twice"
+    with db.SessionLocal() as sess:
+        ingest_price_rows(sess, [PriceRow(name, "STEAM", None, 3.0, None, None, None, t0)])
+        sess.commit()
+    steam = [r for r in _rollups(db, db.PriceRollupHourly, name) if r[0] == "STEAM"]
+    for _ in range(2):
+        _import(db, [PriceRow(name, "BUFF", None, 5.0, None, None, None, t0),
+                     PriceRow(name, "BUFF", None, 6.0, 4.0, None, None, t0 + 60_000)])
+    hourly = _rollups(db, db.PriceRollupHourly, name)
+    assert [r for r in hourly if r[0] == "STEAM"] == steam
+    [(_, _, sell_sum, samples, mn, mx, bid_sum, bid_samples, bid_min, bid_max)] = [r for r in hourly if r[0] == "BUFF"]
+    assert (sell_sum, samples, mn, mx) == (11.0, 2, 5.0, 6.0)
+    assert (bid_sum, bid_samples, bid_min, bid_max) == (4.0, 1, 4.0, 4.0)
+
+    # 换成另一小时的数据：旧桶整行消失，日桶只剩新行
+    _import(db, [PriceRow(name, "BUFF", None, 7.0, None, None, None, t0 + 2 * 3600_000)])
+    buff = [r for r in _rollups(db, db.PriceRollupHourly, name) if r[0] == "BUFF"]
+    assert [(r[1], r[2], r[3], r[4], r[5], r[7]) for r in buff] == [
+        (db.hour_bucket(t0 + 2 * 3600_000), 7.0, 1, 7.0, 7.0, 0)]
+    daily = [r for r in _rollups(db, db.PriceRollupDaily, name) if r[0] == "BUFF"]
+    assert [(r[2], r[3], r[4], r[5], r[7], r[8]) for r in daily] == [(7.0, 1, 7.0, 7.0, 0, None)]
+
+
+def _prices(db, name):
+    with db.SessionLocal() as sess:
+        return [
+            (r.platform, r.sell_price, r.update_time, r.item_id is not None, r.platform_id is not None)
+            for r in sess.query(db.Price).filter(db.Price.market_hash_name == name).order_by(db.Price.id)
+        ]
+
+
+def _latest(db, name):
+    with db.SessionLocal() as sess:
+        return {r.platform: (r.sell_price, r.update_time)
+                for r in sess.query(db.LatestPrice).filter(db.LatestPrice.market_hash_name == name)}
+
+
+def test_staged_apply_replaces_only_imported_platforms(db):
+    t0 = 1_700_000_000_000
+    name, control = "Staged | Replace", "Staged | Replace Control"
+    with db.SessionLocal() as sess:
+        item = db.Item(name=name, market_hash_name=name)
+        sess.add(item)
+        sess.flush()
+        sess.add(db.Platform(item_id=item.id, name="BUFF", platform_item_id="1"))
+        sess.commit()
+        ingest_price_rows(sess, [
+            PriceRow(name, "BUFF", "1", 10.0, None, None, None, t0),
+            PriceRow(name, "BUFF", "1", 11.0, None, None, None, t0 + 60_000),
+            PriceRow(name, "STEAM", None, 20.0, None, None, None, t0),
+        ])
+        sess.commit()
+
+    new_rows = [
+        PriceRow(name, "BUFF", "1", 12.0, None, None, None, t0 + 120_000),
+        PriceRow(name, "BUFF", "1", 13.0, None, None, None, t0 + 30_000),
+        PriceRow(name, "C5GAME", "9", 5.0, None, None, None, t0),
+    ]
+    result = _import(db, new_rows)
+    assert result["overwritten"] == 2 and result["inserted"] == 3 and result["platforms_created"] == 1
+    # 旧 BUFF 行被替换，未导入的 STEAM 行保留；新平台补建记录后解析到 platform_id
+    assert _prices(db, name) == [
+        ("STEAM", 20.0, t0, True, False),
+        ("BUFF", 12.0, t0 + 120_000, True, True),
+        ("BUFF", 13.0, t0 + 30_000, True, True),
+        ("C5GAME", 5.0, t0, True, True),
+    ]
+    # 快照无条件覆盖：同键取最后出现的一行
+    assert _latest(db, name) == {"BUFF": (13.0, t0 + 30_000), "STEAM": (20.0, t0), "C5GAME": (5.0, t0)}
+
+    # 汇总与只写入最终数据的增量入库一致
+    with db.SessionLocal() as sess:
+        ingest_price_rows(sess, [PriceRow(control, "STEAM", None, 20.0, None, None, None, t0)]
+                          + [r._replace(market_hash_name=control) for r in new_rows])
+        sess.commit()
+    for model in (db.PriceRollupHourly, db.PriceRollupDaily):
+        assert _rollups(db, model, name) == _rollups(db, model, control)
+
+
+def test_staged_apply_replaces_unknown_names_by_platform_name(db):
+    t0 = 1_700_000_000_000
+    name, control = "Staged | Not Catalogued", "Staged | Not Catalogued Control"
+    rows = [PriceRow(name, "BUFF", "7", 4.0, 3.0, None, None, t0),
+            PriceRow(name, "BUFF", "7", 6.0, None, None, None, t0 + 3600_000)]
+    first = _import(db, rows)
+    second = _import(db, rows)
+    assert (first["overwritten"], first["inserted"]) == (0, 2)
+    assert (second["overwritten"], second["inserted"]) == (2, 2)
+    # 不在目录中的饰品不补建平台，按 (marketHashName, 平台) 替换
+    assert first["platforms_created"] == second["platforms_created"] == 0
+    assert _prices(db, name) == [("BUFF", 4.0, t0, False, False), ("BUFF", 6.0, t0 + 3600_000, False, False)]
+
+    with db.SessionLocal() as sess:
+        ingest_price_rows(sess, [r._replace(market_hash_name=control) for r in rows])
+        sess.commit()
+    for model in (db.PriceRollupHourly, db.PriceRollupDaily):
+        assert _rollups(db, model, name) == _rollups(db, model, control)
+
+
+def test_last_seen_cache_splits_changed_advanced_and_duplicate_rows():
+    cache = LastSeenCache({("A", "BUFF"): (1.0, 2.0, 3, 4, 1000)})
+    changed = PriceRow("A", "BUFF", None, 1.5, 2.0, 3, 4, 1000)
+    advanced = PriceRow("A", "BUFF", None, 1.0, 2.0, 3, 4, 2000)
+    duplicate = PriceRow("A", "BUFF", None, 1.0, 2.0, 3, 4, 1000)
+    new_key = PriceRow("B", "BUFF", None, 1.0, 2.0, 3, 4, 1000)
+    fresh, coalesced, dup = cache.split([changed, advanced, duplicate, new_key])
+    assert fresh == [changed, new_key]
+    assert coalesced == [advanced]
+    assert dup == 1
+
+
+def test_last_seen_cache_remember_ignores_older_rows():
+    cache = LastSeenCache()
+    cache.remember([PriceRow("A", "BUFF", None, 1.0, None, None, None, 2000)])
+    cache.remember([PriceRow("A", "BUFF", None, 9.0, None, None, None, 1000)])
+    fresh, _, dup = cache.split([PriceRow("A", "BUFF", None, 1.0, None, None, None, 2000)])
+    assert (fresh, dup) == ([], 1)
+
+
+def test_ingest_with_last_seen_writes_only_changes(db):
+    name = "LastSeen | Dedup"
+    t0 = 1_700_000_000_000
+    rows = [PriceRow(name, "BUFF", None, 1.0, None, 1, None, t0), PriceRow(name, "C5GAME", None, 2.0, None, 1, None, t0)]
+    cache = LastSeenCache()
+    counters = {}
+    for batch in (rows, rows, [rows[0]._replace(update_time=t0 + 1000), rows[1]._replace(sell_price=2.5)]):
+        with db.SessionLocal() as sess:
+            ingest_price_rows(sess, batch, cache, counters)
+            sess.commit()
+        cache.remember(batch)
+    assert counters == {"written": 3, "skipped": 3}
+    with db.SessionLocal() as sess:
+        assert sess.query(db.Price).filter(db.Price.market_hash_name == name).count() == 3
+        latest = {r.platform: (r.sell_price, r.update_time)
+                  for r in sess.query(db.LatestPrice).filter(db.LatestPrice.market_hash_name == name)}
+    assert latest == {"BUFF": (1.0, t0 + 1000), "C5GAME": (2.5, t0)}
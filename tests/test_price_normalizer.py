@@ -0,0 +1,83 @@
+from price_normalizer import PriceRow, normalize_price_items, normalize_price_response
+
+
+def _row(name, platform, sell=None, **extra):
+    r = {"platform": platform, "itemId": "1", "sellPrice": sell, "biddingPrice": 1.0,
+         "sellCount": 2, "biddingCount": 3, "updateTime": 1700000000}
+    r.update(extra)
+    return r
+
+
+def test_common_shape():
+    resp = {"success": True, "data": [
+        {"marketHashName": "AK", "dataList": [_row("AK", "c5", 10.0), _row("AK", "BUFF", 11)]},
+    ]}
+    counters = {}
+    rows = normalize_price_response(resp, counters)
+    assert rows == [
+        PriceRow("AK", "C5GAME", "1", 10.0, 1.0, 2, 3, 1700000000000),
+        PriceRow("AK", "BUFF", "1", 11.0, 1.0, 2, 3, 1700000000000),
+    ]
+    assert counters == {"items": 1, "platforms": 2, "skipped": 0}
+
+
+def test_later_rows_with_extra_keys_keep_their_values():
+    items = [
+        {"marketHashName": "A", "platforms": [{"platform": "BUFF", "sellPrice": 1.5}]},
+        {"marketHashName": "B", "platforms": [
+            {"platform": "YOUPIN", "sellPrice": 2.5, "biddingPrice": 2.0, "sellCount": 7, "updateTime": 1700000000},
+        ]},
+    ]
+    rows = normalize_price_items(items)
+    assert rows[0] == PriceRow("A", "BUFF", None, 1.5, None, None, None, None)
+    assert rows[1] == PriceRow("B", "YOUPIN", None, 2.5, 2.0, 7, None, 1700000000000)
+
+
+def test_heterogeneous_rows_in_one_list():
+    plats = [
+        {"platform": "BUFF", "sellPrice": 1.0},
+        {"name": "STEAM", "sell_price": 2.0, "buy": 1.5},
+        {"platform": "C5", "sellPrice": 3.0},
+    ]
+    rows = normalize_price_items([{"market_hash_name": "X", "platformList": plats}])
+    assert [(r.platform, r.sell_price, r.bidding_price) for r in rows] == [
+        ("BUFF", 1.0, None), ("STEAM", 2.0, 1.5), ("C5GAME", 3.0, None),
+    ]
+
+
+def test_first_non_empty_candidate_wins():
+    plats = [
+        {"platform": "BUFF", "sell_price": None, "sellPrice": 3.0},
+        {"platform": "", "name": "STEAM", "sell_price": "", "price": 4},
+    ]
+    rows = normalize_price_items([{"marketHashName": "X", "platforms": plats}])
+    assert [(r.platform, r.sell_price) for r in rows] == [("BUFF", 3.0), ("STEAM", 4.0)]
+
+
+def test_bad_platform_values_are_skipped():
+    plats = [
+        {"platform": ["BUFF"], "sellPrice": 1.0},
+        {"platform": {"n": 1}, "sellPrice": 1.0},
+        {"platform": None, "sellPrice": 1.0},
+        "not-a-row",
+        {"platform": "BUFF", "sellPrice": 1.0},
+    ]
+    counters = {}
+    rows = normalize_price_items([{"marketHashName": "X", "platforms": plats}], counters)
+    assert [r.platform for r in rows] == ["BUFF"]
+    assert counters == {"items": 1, "platforms": 1, "skipped": 4}
+
+
+def test_items_without_name_are_skipped():
+    counters = {}
+    rows = normalize_price_items([{"platforms": [_row("", "BUFF", 1.0)]}, "x", {"marketHashName": " "}], counters)
+    assert rows == []
+    assert counters["skipped"] == 3
+
+
+def test_payload_shapes():
+    item = {"marketHashName": "A", "platforms": {"platform": "BUFF", "sellPrice": "5"}}
+    assert normalize_price_response(item)[0].sell_price == 5.0
+    assert len(normalize_price_response([item, item])) == 2
+    assert len(normalize_price_response({"responses": [{"data": [item]}, {"items": [item]}]})) == 2
+    assert normalize_price_response({"success": False, "errorMsg": "x"}) == []
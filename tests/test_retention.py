@@ -0,0 +1,86 @@
+import time
+
+from sqlalchemy import text
+
+from db import DAY_MS, HOUR_MS, day_bucket, hour_bucket
+from price_normalizer import PriceRow
+from price_ingest import ingest_price_rows
+from retention import RetentionPolicy, RetentionRunner
+
+
+def _insert(db, name, times):
+    with db.SessionLocal() as sess:
+        ingest_price_rows(sess, [PriceRow(name, "BUFF", None, float(i + 1), None, None, None, t)
+                                 for i, t in enumerate(times)])
+        sess.commit()
+
+
+def _times(db, name):
+    with db.engine.connect() as conn:
+        return sorted(r[0] for r in conn.execute(
+            text("SELECT update_time FROM prices WHERE market_hash_name = :n"), {"n": name}))
+
+
+def _state(db, key):
+    with db.engine.connect() as conn:
+        return db.get_state(conn, key)
+
+
+def test_downsample_watermark_and_late_rows(db):
+    name = "Retention | Downsample"
+    now = int(time.time() * 1000)
+    hour_old = hour_bucket(now - 36 * HOUR_MS)            # 原始层已过期：按小时保留一条
+    day_old = day_bucket(now - 10 * DAY_MS) + HOUR_MS     # 小时层也已过期：按天保留一条
+    recent = now - HOUR_MS
+    _insert(db, name, [hour_old + 1000, hour_old + 2000, hour_old + 3000,
+                       day_old, day_old + HOUR_MS, day_old + 2 * HOUR_MS, recent, recent + 1])
+    runner = RetentionRunner(RetentionPolicy(raw_ttl_days=1, hourly_ttl_days=2, rollup_hourly_ttl_days=0))
+    runner.run_once()
+    assert runner.last_error is None
+    assert _times(db, name) == [day_old + 2 * HOUR_MS, hour_old + 3000, recent, recent + 1]
+    raw_until = _state(db, "retention.raw_until")
+    assert now - DAY_MS <= raw_until <= int(time.time() * 1000) - DAY_MS
+    assert _state(db, "retention.id_mark") > 0
+
+    # 补录的历史数据（时间落在已处理区间之前）由 id 水位线找到
+    _insert(db, name, [day_old + 3 * HOUR_MS, day_old + 30 * 60 * 1000])
+    runner.run_once()
+    assert runner.last_error is None
+    assert _times(db, name) == [day_old + 3 * HOUR_MS, hour_old + 3000, recent, recent + 1]
+
+    # 没有新数据时本轮不会再找到候选饰品
+    assert runner._names_in_window(hour_bucket(_state(db, "retention.raw_until")), raw_until) == []
+
+
+def test_prune_hourly_rollups(db):
+    name = "Retention | Rollups"
+    now = int(time.time() * 1000)
+    _insert(db, name, [now - 3 * DAY_MS, now - 2 * HOUR_MS])
+    runner = RetentionRunner(RetentionPolicy(raw_ttl_days=0, rollup_hourly_ttl_days=1))
+    result = runner.run_once()
+    assert result["rollupsPruned"] >= 1
+    with db.engine.connect() as conn:
+        hourly = conn.execute(text(
+            "SELECT bucket_start FROM price_rollups_hourly WHERE market_hash_name = :n"), {"n": name}).fetchall()
+        daily = conn.execute(text(
+            "SELECT COUNT(*) FROM price_rollups_daily WHERE market_hash_name = :n"), {"n": name}).scalar()
+    assert [r[0] for r in hourly] == [hour_bucket(now - 2 * HOUR_MS)]
+    assert daily >= 1
+
+
+def test_archive_uses_watermark(db, tmp_path):
+    name = "Retention | Archive"
+    now = int(time.time() * 1000)
+    _insert(db, name, [now - 10 * DAY_MS, now - HOUR_MS])
+    runner = RetentionRunner(RetentionPolicy(raw_ttl_days=0, archive_after_days=5, rollup_hourly_ttl_days=0,
+                                             archive_dir=str(tmp_path)))
+    runner.run_once()
+    assert runner.last_error is None
+    assert _times(db, name) == [now - HOUR_MS]
+    assert _state(db, "retention.archive_until") >= now - 5 * DAY_MS
+
+    _insert(db, name, [now - 20 * DAY_MS])
+    result = runner.run_once()
+    assert result["archived"] == 1
+    assert _times(db, name) == [now - HOUR_MS]
+    assert list(tmp_path.glob("prices_*.db"))
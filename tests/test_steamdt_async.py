@@ -0,0 +1,93 @@
+import time
+
+import steamdt_client
+from benchmarks.stub_server import stub_server
+from steamdt_client import RateLimitError
+from steamdt_async import SyncSteamDTClient
+
+
+def _client(base_url, key):
+    c = SyncSteamDTClient(api_key=key, max_concurrency=4, base_url=base_url)
+    # 每 key 每分钟 1 次、不等待：第二个落到同一 key 的批次立即失败
+    c._client.RATE_LIMITS = {"price_batch": (1, 60)}
+    c._client.MAX_WAIT = {"price_batch": 0}
+    return c
+
+
+def _chunks(n):
+    return [[f"Item {c}-{i}" for i in range(3)] for c in range(n)]
+
+
+def test_rate_limited_chunks_do_not_discard_the_others():
+    with stub_server(latency=0) as base_url:
+        c = _client(base_url, "fanout-single")
+        try:
+            results = c.get_price_batch_many(_chunks(3))
+        finally:
+            c.close()
+    ok = [r for r in results if not isinstance(r, BaseException)]
+    failed = [r for r in results if isinstance(r, BaseException)]
+    assert len(ok) == 1 and len(failed) == 2
+    assert all(isinstance(e, RateLimitError) for e in failed)
+    assert [it["marketHashName"] for it in ok[0]["data"]][0].startswith("Item ")
+
+
+def test_chunks_spread_across_keys():
+    keys = [f"fanout-pool-{i}" for i in range(4)]
+    with stub_server(latency=0) as base_url:
+        c = _client(base_url, keys[0])
+        try:
+            results = c.get_price_batch_many(_chunks(4), api_keys=keys)
+        finally:
+            c.close()
+    assert not any(isinstance(r, BaseException) for r in results)
+    assert [r["data"][0]["marketHashName"] for r in results] == [f"Item {i}-0" for i in range(4)]
+
+
+def _batch_app(monkeypatch, base_url, key):
+    """指向模拟服务的独立应用（客户端在 create_app 中按 STEAMDT_API_KEY 创建）。"""
+    import steamdt_async
+    from app import create_app
+    monkeypatch.setattr(steamdt_async.AsyncSteamDTClient, "BASE_URL", base_url)
+    monkeypatch.setenv("STEAMDT_API_KEY", key)
+    app = create_app()
+    app.config["TESTING"] = True
+    return app.test_client()
+
+
+def _seed_items(db, prefix, n):
+    with db.SessionLocal() as sess:
+        items = [db.Item(name=f"{prefix} {i:03d}", market_hash_name=f"{prefix} {i:03d}") for i in range(n)]
+        sess.add_all(items)
+        sess.commit()
+        return f"{items[0].id}-{items[-1].id}"
+
+
+def test_batch_by_id_sends_every_chunk_with_default_limits(db, monkeypatch):
+    id_range = _seed_items(db, "ById | Default", 250)
+    with stub_server(latency=0.05) as base_url:
+        client = _batch_app(monkeypatch, base_url, "by-id-default")
+        t0 = time.monotonic()
+        data = client.post("/api/admin/price/batch_by_id", json={"idRange": id_range}).get_json()
+    assert time.monotonic() - t0 < 10
+    assert data["success"] is True, data
+    assert data["processedNames"] == 250 and data["insertedRows"] > 0
+    assert data["failedChunks"] == [] and data["pendingChunks"] == [] and not data["partial"]
+
+
+def test_batch_by_id_defers_chunks_beyond_quota(db, monkeypatch):
+    monkeypatch.setitem(steamdt_client.RATE_LIMITS, "price_batch", (2, 60))
+    id_range = _seed_items(db, "ById | Quota", 250)
+    with stub_server(latency=0) as base_url:
+        client = _batch_app(monkeypatch, base_url, "by-id-quota")
+        t0 = time.monotonic()
+        data = client.post("/api/admin/price/batch_by_id", json={"idRange": id_range}).get_json()
+        assert time.monotonic() - t0 < 5
+        assert data["success"] is True and data["partial"] is True
+        assert data["processedNames"] == 200 and data["failedChunks"] == []
+        assert [c["index"] for c in data["pendingChunks"]] == [2] and len(data["pendingChunks"][0]["names"]) == 50
+        assert data["retryAfter"] > 0
+        # 额度用完：不等待令牌，直接 429
+        resp = client.post("/api/admin/price/batch_by_id", json={"idRange": id_range})
+    assert resp.status_code == 429 and int(resp.headers["Retry-After"]) > 0
+    assert len(resp.get_json()["pendingChunks"]) == 3
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+
+import steamdt_client
+from steamdt_client import SteamDTClient, RateLimitError, TokenBucket, shared_bucket
+
+
+def test_capacity_then_wait():
+    b = TokenBucket(2, 0.2)
+    assert b.try_acquire() == 0
+    assert b.try_acquire() == 0
+    wait = b.try_acquire()
+    assert 0 < wait <= 0.1
+    time.sleep(wait + 0.01)
+    assert b.try_acquire() == 0
+
+
+def test_refill_never_exceeds_capacity():
+    b = TokenBucket(3, 0.03)
+    time.sleep(0.1)
+    assert b.wait_time() == 0
+    for _ in range(3):
+        assert b.try_acquire() == 0
+    assert b.try_acquire() > 0
+
+
+def test_acquire_timeout_and_stop_event():
+    b = TokenBucket(1, 60)
+    assert b.acquire(timeout=0)
+    assert not b.acquire(timeout=0.05)
+    stop = threading.Event()
+    stop.set()
+    assert not b.acquire(stop_event=stop)
+
+
+def test_acquire_async_waits_for_refill():
+    b = TokenBucket(1, 0.05)
+    assert b.try_acquire() == 0
+    t0 = time.monotonic()
+    assert asyncio.run(b.acquire_async(timeout=1))
+    assert time.monotonic() - t0 >= 0.03
+    assert not asyncio.run(b.acquire_async(timeout=0))
+
+
+def test_shared_bucket_per_key_and_endpoint():
+    a = shared_bucket("k-test-1", "price_single")
+    assert shared_bucket("k-test-1", "price_single") is a
+    assert shared_bucket("k-test-2", "price_single") is not a
+    assert shared_bucket("k-test-1", "price_avg") is not a
+
+
+def test_client_raises_when_wait_exceeds_max():
+    client = SteamDTClient(api_key="k-test-base")
+    client._throttle("base")
+    try:
+        client._throttle("base")
+    except RateLimitError as e:
+        assert e.endpoint == "base" and e.retry_after > 0
+    else:
+        raise AssertionError("expected RateLimitError")
+
+
+def test_rate_from_env(monkeypatch):
+    monkeypatch.setenv("STEAMDT_RATE_PRICE_BATCH", "3/30")
+    assert steamdt_client._rate_from_env("price_batch", (1, 60)) == (3, 30.0)
+    for bad in ("x", "0/60", "2/0", "2"):
+        monkeypatch.setenv("STEAMDT_RATE_PRICE_BATCH", bad)
+        assert steamdt_client._rate_from_env("price_batch", (1, 60)) == (1, 60)
+
+
+def test_price_batch_unlimited_by_default():
+    # 文档未给出批量接口额度：默认不在客户端限频
+    assert steamdt_client.RATE_LIMITS["price_batch"] is None
+    limits = {"price_batch": None}
+    assert shared_bucket("k-test-unlimited", "price_batch", limits) is None
+    client = SteamDTClient(api_key="k-test-unlimited")
+    client.RATE_LIMITS = limits
+    assert not client.limited("price_batch")
+    assert client.wait_time("price_batch") == 0
+    for _ in range(5):
+        client._throttle("price_batch")
+
+
+def test_request_client_fails_fast():
+    limits = {"price_single": (1, 60)}
+    job_client = SteamDTClient(api_key="k-test-fast")
+    proxy = SteamDTClient(api_key="k-test-fast", max_wait=0.05)
+    job_client.RATE_LIMITS = proxy.RATE_LIMITS = limits
+    job_client._throttle("price_single")
+    t0 = time.monotonic()
+    try:
+        proxy._throttle("price_single")
+    except RateLimitError as e:
+        assert e.retry_after > 50
+    else:
+        raise AssertionError("expected RateLimitError")
+    assert time.monotonic() - t0 < 1
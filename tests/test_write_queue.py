@@ -0,0 +1,141 @@
+import threading
+
+import pytest
+
+from write_queue import WriteQueue
+
+
+class FakeSession:
+    """记录提交的最小会话；写入先进 pending，commit 后才进 committed。"""
+
+    def __init__(self, fail_rollback=False):
+        self.pending = []
+        self.committed = []
+        self.fail_rollback = fail_rollback
+        self.closed = False
+
+    def commit(self):
+        self.committed.extend(self.pending)
+        self.pending.clear()
+
+    def rollback(self):
+        self.pending.clear()
+        if self.fail_rollback:
+            raise RuntimeError("connection lost")
+
+    def close(self):
+        self.closed = True
+
+
+def _writer(sessions, **kw):
+    def factory():
+        s = sessions.pop(0)
+        if isinstance(s, BaseException):
+            raise s
+        return s
+    return WriteQueue(session_factory=factory, **kw)
+
+
+def _blocked(q):
+    """占住写线程，返回放行用的 Event。"""
+    gate = threading.Event()
+    started = threading.Event()
+
+    def hold(sess):
+        started.set()
+        gate.wait(5)
+    fut = q.submit(hold)
+    assert started.wait(5)
+    return gate, fut
+
+
+def _put(value, fail=False):
+    def task(sess):
+        sess.pending.append(value)
+        if fail:
+            raise ValueError(value)
+        return value
+    return task
+
+
+def test_failed_task_in_group_is_retried_alone():
+    sess = FakeSession()
+    q = _writer([sess])
+    try:
+        gate, _ = _blocked(q)
+        futs = [q.submit(_put(1)), q.submit(_put(2, fail=True)), q.submit(_put(3))]
+        gate.set()
+        assert futs[0].result(5) == 1 and futs[2].result(5) == 3
+        with pytest.raises(ValueError):
+            futs[1].result(5)
+        assert sorted(sess.committed) == [1, 3]
+        assert q.retries == 1
+    finally:
+        q.stop()
+
+
+def test_broken_session_fails_group_but_writer_survives():
+    bad, good = FakeSession(fail_rollback=True), FakeSession()
+    q = _writer([bad, good])
+    try:
+        with pytest.raises(RuntimeError, match="connection lost"):
+            q.run(_put(1, fail=True), timeout=5)
+        assert bad.closed
+        assert q.run(_put(2), timeout=5) == 2
+        assert good.committed == [2] and bad.committed == []
+        assert q.running
+    finally:
+        q.stop()
+
+
+def test_session_factory_error_fails_task_then_recovers():
+    sess = FakeSession()
+    q = _writer([OSError("database is locked"), sess])
+    try:
+        with pytest.raises(OSError):
+            q.run(_put(1), timeout=5)
+        assert q.run(_put(2), timeout=5) == 2
+        assert sess.committed == [2]
+    finally:
+        q.stop()
+
+
+def test_run_timeout_cancels_queued_task():
+    sess = FakeSession()
+    q = _writer([sess], run_timeout=0.1)
+    try:
+        gate, _ = _blocked(q)
+        with pytest.raises(TimeoutError, match="已取消"):
+            q.run(_put(1))
+        gate.set()
+        assert q.run(_put(2), timeout=5) == 2
+        assert sess.committed == [2]
+    finally:
+        q.stop()
+
+
+def test_pending_tasks_fail_when_writer_exits():
+    sess = FakeSession()
+    q = _writer([sess], max_group=1)
+    gate, _ = _blocked(q)
+
+    def die(sess):
+        raise SystemExit
+    dying = q.submit(die)
+    left = q.submit(_put(1))
+    gate.set()
+    with pytest.raises(SystemExit):
+        dying.result(5)
+    with pytest.raises(RuntimeError, match="写线程已退出"):
+        left.result(5)
+    q._thread.join(5)
+    assert not q.running and sess.committed == []
+
+
+def test_submit_from_writer_thread_is_rejected():
+    q = _writer([FakeSession()])
+    try:
+        with pytest.raises(RuntimeError, match="写任务内"):
+            q.run(lambda sess: q.submit(_put(1)), timeout=5)
+    finally:
+        q.stop()
@@ -0,0 +1,214 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from db import SessionLocal
+
+_STOP = object()
+
+
+class WriteQueue:
+    """单写线程：从有界队列取出写任务，多个任务合并为一个事务提交（group commit）。
+
+    运行期对主库的写入（价格与目录导入、任务批次与运行记录、管理接口增删、保留策略、孤儿行补齐）都经
+    ingest_writer 提交。以下几处不能或不必经写线程，在独立连接上进行：
+    - init_db 启动阶段的建表、PRAGMA、分区与迁移（早于任何写任务，且须逐个迁移单独提交）；
+    - 归档时向归档库复制行（ATTACH 不能在事务内执行；只写归档库文件，主库的删除仍经写线程）；
+    - VACUUM / 增量 VACUUM / WAL checkpoint（不能在事务内执行）。
+
+    任务是 fn(sess) -> 结果 的函数，在写线程的 Session 中执行、不自行提交；
+    submit() 返回 Future，事务提交后才给出结果（ack 即已落盘）。
+    合并事务中有任务抛错时整组回滚，再逐个单独重试，只有出错的任务收到异常——任务须可安全重跑。
+    队列满时 submit() 阻塞，形成对生产方的背压。
+
+    任务串行执行：一次大的导入（覆盖式价格导入、目录导入）执行期间，价格任务的批次、检查点与运行记录
+    写入都在队列里等待。run() 默认最多等待 run_timeout 秒，超时抛出 TimeoutError（尚未开始的任务随之取消，
+    已在执行的任务仍会完成）；导入接口以更长的 IMPORT_WAIT_SEC 等待。
+    写线程不会因单个任务或会话出错而退出；若仍意外退出，队列中未执行的任务都会收到异常，下次提交时重启。
+    """
+
+    def __init__(self, session_factory: Callable[[], Any] = SessionLocal, maxsize: int = 256, max_group: int = 32,
+                 run_timeout: Optional[float] = 120.0):
+        self.session_factory = session_factory
+        self.max_group = max(1, int(max_group))
+        self.run_timeout = run_timeout if run_timeout and run_timeout > 0 else None
+        self._q: "queue.Queue" = queue.Queue(maxsize=max(1, int(maxsize)))
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # 统计
+        self.tasks = 0
+        self.commits = 0
+        self.retries = 0
+        self.errors = 0
+        self.max_group_seen = 0
+        self.busy_ms = 0
+
+    @property
+    def running(self) -> bool:
+        t = self._thread
+        return bool(t and t.is_alive())
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._thread = threading.Thread(target=self._loop, name="WriteQueue", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """处理完已入队的任务后停止写线程。"""
+        with self._lock:
+            t = self._thread
+        if not t or not t.is_alive():
+            return
+        self._q.put(_STOP)
+        t.join(timeout=timeout)
+
+    def submit(self, fn: Callable[[Any], Any], timeout: Optional[float] = None) -> Future:
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("写任务内不能再提交写任务")
+        if not self.running:
+            self.start()
+        fut: Future = Future()
+        self._q.put((fn, fut), timeout=timeout)
+        return fut
+
+    def run(self, fn: Callable[[Any], Any], timeout: Optional[float] = None) -> Any:
+        """提交并等待结果（阻塞到所在事务提交）；timeout 缺省为 run_timeout，0 表示不限。"""
+        wait = self.run_timeout if timeout is None else (timeout if timeout > 0 else None)
+        fut = self.submit(fn, timeout=wait)
+        try:
+            return fut.result(wait)
+        except FutureTimeout:
+            started = not fut.cancel()
+            raise TimeoutError(
+                f"写队列等待超过 {wait:g} 秒" + ("（任务已在执行，结果以数据库为准）" if started else "，任务已取消")
+            ) from None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self._q.qsize(),
+            "maxQueue": self._q.maxsize,
+            "maxGroup": self.max_group,
+            "tasks": self.tasks,
+            "commits": self.commits,
+            "retries": self.retries,
+            "errors": self.errors,
+            "maxGroupSeen": self.max_group_seen,
+            "avgGroup": round(self.tasks / self.commits, 2) if self.commits else 0,
+            "busyMs": self.busy_ms,
+        }
+
+    def _take_group(self) -> Tuple[List[Tuple[Callable, Future]], bool]:
+        first = self._q.get()
+        if first is _STOP:
+            return [], True
+        group = [first]
+        stop = False
+        while len(group) < self.max_group:
+            try:
+                nxt = self._q.get_nowait()
+            except queue.Empty:
+                break
+            if nxt is _STOP:
+                stop = True
+                break
+            group.append(nxt)
+        return group, stop
+
+    def _loop(self):
+        sess = None
+        try:
+            while True:
+                group, stop = self._take_group()
+                group = [(fn, fut) for fn, fut in group if fut.set_running_or_notify_cancel()]
+                if group:
+                    t0 = time.perf_counter()
+                    try:
+                        if sess is None:
+                            sess = self.session_factory()
+                        self._run_group(sess, group)
+                    except BaseException as e:
+                        # 会话不可用等意外：本组未完成的任务收到异常，丢弃会话后继续处理后续任务
+                        self.errors += 1
+                        for _, fut in group:
+                            if not fut.done():
+                                fut.set_exception(e)
+                        sess = self._discard(sess)
+                        if not isinstance(e, Exception):
+                            raise
+                    self.busy_ms += int((time.perf_counter() - t0) * 1000)
+                if stop:
+                    return
+        finally:
+            self._discard(sess)
+            self._fail_pending(RuntimeError("写线程已退出，任务未执行"))
+
+    @staticmethod
+    def _discard(sess) -> None:
+        if sess is None:
+            return None
+        for step in (sess.rollback, sess.close):
+            try:
+                step()
+            except Exception:
+                pass
+        return None
+
+    def _fail_pending(self, error: BaseException):
+        """写线程退出时让队列中剩余的任务立即失败，而不是让提交方一直等待。"""
+        while True:
+            try:
+                item = self._q.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(error)
+
+    def _run_group(self, sess, group: List[Tuple[Callable, Future]]):
+        self.max_group_seen = max(self.max_group_seen, len(group))
+        if len(group) == 1:
+            self._run_one(sess, group[0])
+            return
+        try:
+            results = [fn(sess) for fn, _ in group]
+            sess.commit()
+        except Exception:
+            sess.rollback()
+            # 整组回滚后逐个重试，只让出错的任务收到异常
+            self.retries += 1
+            for item in group:
+                self._run_one(sess, item)
+            return
+        self.commits += 1
+        self.tasks += len(group)
+        for (_, fut), res in zip(group, results):
+            fut.set_result(res)
+
+    def _run_one(self, sess, item: Tuple[Callable, Future]):
+        fn, fut = item
+        try:
+            res = fn(sess)
+            sess.commit()
+        except Exception as e:
+            sess.rollback()
+            self.errors += 1
+            fut.set_exception(e)
+            return
+        self.commits += 1
+        self.tasks += 1
+        fut.set_result(res)
+
+
+# 全局写队列：价格任务、批量入库与导入接口的写入都经由它串行提交
+ingest_writer = WriteQueue(
+    maxsize=int(os.getenv("DB_WRITE_QUEUE_SIZE", "256")),
+    max_group=int(os.getenv("DB_WRITE_GROUP_MAX", "32")),
+    run_timeout=float(os.getenv("DB_WRITE_TIMEOUT_SEC", "120")),
+)
+# 导入接口等待整份导入提交的上限（0 表示不限）
+IMPORT_WAIT_SEC = float(os.getenv("DB_IMPORT_TIMEOUT_SEC", "3600"))